@@ -3,9 +3,10 @@ Tracking Tool Web Application
 A Flask application for tracking and processing Excel file data.
 """
 import os
+import time
 import secrets
 from datetime import datetime, timedelta
-from flask import Flask, render_template, redirect, url_for, flash, request, jsonify, session, send_from_directory, abort
+from flask import Flask, Response, current_app, make_response, render_template, redirect, url_for, flash, request, jsonify, session, send_from_directory, abort, stream_with_context
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from werkzeug.utils import secure_filename
 from flask_wtf.csrf import CSRFProtect
@@ -17,13 +18,27 @@ import pandas as pd
 import logging
 from werkzeug.security import generate_password_hash
 from functools import wraps
+from markupsafe import Markup
+from sqlalchemy.exc import OperationalError
 
 from models import db, migrate
 from models.user import User
 from models.tracking import UploadedFile, TrackingData
 from forms import LoginForm, RegistrationForm, ChangePasswordForm, UploadFileForm
 from config import config
-from utils import allowed_file, save_uploaded_file, validate_excel_file, process_excel_file
+from utils import allowed_file, save_uploaded_file, validate_excel_file, macro_rewriter
+from services.tracking_service import TrackingService, TRACKING_API_FIELDS, TRACKING_API_FILTERS, TRACKING_API_FLAGS
+from services.job_service import JobService
+from services.retention_service import RetentionService
+from services.partitioning import maintain_partitions
+from services.snapshot import remove_snapshot
+from services.payload import ensure_payload, payload_response, remove_payload
+from services.fragment_cache import fragment_cache
+from services.search import ensure_search_index
+from services.db_pool import MeteredQueuePool, pool_stats
+from services.replica import init_replica
+from services.http_cache import template_digest, upload_etag, query_variant, not_modified, cache_headers
+from models.session import REPLICA_BIND, make_read_only
 
 # Create scheduler instance only when needed
 def get_scheduler():
@@ -48,8 +63,29 @@ def create_app(config_name='default'):
     # Ensure upload folder exists
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
+    # Load ad-server macro rules for tag conversion
+    macro_rewriter.configure(app.config.get('MACRO_RULES_FILE'))
+    
+    # Bound the rendered fragments kept by this process
+    fragment_cache.configure(app.config['FRAGMENT_CACHE_MAX_BYTES'])
+    
+    # Meter connection checkouts of sized pools so saturation shows in /api/admin/db-pool
+    engine_options = app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    if 'pool_size' in engine_options:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(engine_options, poolclass=MeteredQueuePool)
+        MeteredQueuePool.wait_warning = app.config['DB_POOL_WAIT_WARNING_MS'] / 1000
+    
+    # Release version in the ETags of cached views, changed by deploys that change the templates
+    if not app.config.get('RELEASE_VERSION'):
+        app.config['RELEASE_VERSION'] = template_digest(os.path.join(app.root_path, app.template_folder))
+    
+    # Send the reads of GET requests to the read replica when one is configured
+    init_replica(app)
+    
     # Initialize extensions
     db.init_app(app)
+    # The replica only serves reads: keep it out of db.create_all() and db.drop_all()
+    db.metadatas.pop(REPLICA_BIND, None)
     migrate.init_app(app, db)
     csrf = CSRFProtect(app)
     
@@ -78,6 +114,36 @@ def create_app(config_name='default'):
                             except Exception as e:
                                 app.logger.error(f"Error deleting file {filename}: {e}")
         
+        if app.config['UPLOAD_RETENTION_HOURS'] > 0:
+            @scheduler.task('interval', id='purge_expired_uploads', hours=1, misfire_grace_time=900)
+            def purge_expired_uploads():
+                """Task to delete expired uploads and their tracking data from the database."""
+                with app.app_context():
+                    try:
+                        if app.config['TRACKING_PARTITIONS']:
+                            maintain_partitions(
+                                app.config['UPLOAD_RETENTION_HOURS'],
+                                app.config['TRACKING_PARTITIONS_AHEAD'],
+                                app.config['RETENTION_BATCH_SIZE']
+                            )
+                        else:
+                            RetentionService.purge_expired(
+                                app.config['UPLOAD_RETENTION_HOURS'], app.config['RETENTION_BATCH_SIZE']
+                            )
+                    except Exception as e:
+                        app.logger.error(f"Error purging expired uploads: {e}")
+        
+        if app.config['INGEST_ASYNC']:
+            @scheduler.task('interval', id='recover_ingest_jobs', seconds=app.config['INGEST_JOB_TIMEOUT'],
+                            next_run_time=datetime.now(), misfire_grace_time=900)
+            def recover_ingest_jobs():
+                """Task to resume ingestion jobs interrupted by a restart or a crashed worker."""
+                with app.app_context():
+                    try:
+                        JobService.recover()
+                    except Exception as e:
+                        app.logger.error(f"Error recovering ingestion jobs: {e}")
+        
         try:
             scheduler.start()
         except Exception as e:
@@ -93,6 +159,9 @@ def create_app(config_name='default'):
         default_limits=["200 per day", "50 per hour"],
         storage_uri="memory://"
     )
+    # Flask-Limiter only registers itself when enabled and its route
+    # decorators hold a weak proxy, so keep the instance alive on the app
+    app.extensions.setdefault('limiter', set()).add(limiter)
     
     # Initialize Flask-Login
     login_manager = LoginManager()
@@ -119,6 +188,9 @@ def create_app(config_name='default'):
     with app.app_context():
         db.create_all()
         create_admin_user(app)
+        
+        # Prepare the tracking data search index and remember the strategy it supports
+        app.extensions['tracking_search'] = ensure_search_index()
     
     return app
 
@@ -191,6 +263,42 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Add a decorator for read-only routes
+def read_statement_timeout(f):
+    """
+    Limit each database statement of a read view to READ_STATEMENT_TIMEOUT_MS.
+    
+    Only PostgreSQL supports statement timeouts. The setting is local to the
+    request transaction, so pooled connections are returned unchanged.
+    Cancelled statements are answered with 503.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        timeout = current_app.config['READ_STATEMENT_TIMEOUT_MS']
+        if timeout <= 0 or db.engine.dialect.name != 'postgresql':
+            return f(*args, **kwargs)
+        
+        # A SELECT, so that it runs on the replica when the reads are sent there
+        db.session.execute(db.select(db.func.set_config('statement_timeout', f'{timeout}ms', True)))
+        try:
+            return f(*args, **kwargs)
+        except OperationalError as e:
+            # 57014 is query_canceled
+            if getattr(e.orig, 'pgcode', None) != '57014':
+                raise
+            db.session.rollback()
+            current_app.logger.warning(f"Statement timeout in {request.path}: {e.orig}")
+            if request.path.startswith('/api/'):
+                return jsonify({'error': 'Query timed out'}), 503
+            abort(503)
+    return decorated_function
+
+# Add a decorator for views that only read from the database
+def read_only(f):
+    """Mark a view to be served with a read-only session; apply it below the other decorators."""
+    f.read_only = True
+    return f
+
 def register_routes(app, limiter):
     """
     Register all routes for the application.
@@ -199,6 +307,19 @@ def register_routes(app, limiter):
         app (Flask): Flask application instance
         limiter (Limiter): Rate limiter instance
     """
+    @app.before_request
+    def begin_read_only_request():
+        """Use a read-only session for the views marked read_only, before they load the user."""
+        view = app.view_functions.get(request.endpoint)
+        if getattr(view, 'read_only', False):
+            make_read_only(db.session())
+    
+    @app.teardown_request
+    def end_read_only_request(exception=None):
+        """Restore the session, which outlives the request when the app context is shared."""
+        if db.session().info.get('read_only'):
+            make_read_only(db.session(), False)
+    
     # Authentication routes
     @app.route('/login', methods=['GET', 'POST'])
     @limiter.limit("5 per minute")
@@ -327,6 +448,57 @@ def register_routes(app, limiter):
         
         return redirect(url_for('admin_users'))
     
+    @app.route('/admin/files', methods=['GET'])
+    @login_required
+    @admin_required
+    def admin_files():
+        """Admin page to manage uploaded files, newest first, one page at a time."""
+        files = db.paginate(
+            db.select(UploadedFile)
+            .options(db.joinedload(UploadedFile.summary), db.joinedload(UploadedFile.user))
+            .order_by(UploadedFile.uploaded_at.desc(), UploadedFile.id.desc()),
+            page=request.args.get('page', 1, type=int),
+            per_page=app.config['ADMIN_FILES_PER_PAGE'],
+            error_out=False
+        )
+        return render_template('admin_files.html', files=files)
+    
+    @app.route('/admin/files/delete', methods=['POST'])
+    @login_required
+    @admin_required
+    def admin_delete_files():
+        """Delete the selected uploaded files and their tracking data."""
+        file_ids = request.form.getlist('file_ids', type=int)
+        success, result = TrackingService.delete_files(file_ids, current_user.id)
+        
+        if request.accept_mimetypes.best == 'application/json':
+            if not success:
+                return jsonify({'error': result}), 400
+            return jsonify(result)
+        
+        if success:
+            flash(f"Deleted {result['files']} files and {result['tracking_rows']} tracking rows", 'success')
+        else:
+            flash(result, 'danger')
+        return redirect(url_for('admin_files'))
+    
+    @app.route('/api/admin/db-pool', methods=['GET'])
+    @login_required
+    @admin_required
+    def api_db_pool():
+        """API endpoint reporting the connection pool status and checkout wait times of this process."""
+        stats = pool_stats(db.engine)
+        if REPLICA_BIND in db.engines:
+            stats['replica'] = pool_stats(db.engines[REPLICA_BIND])
+        return jsonify(stats)
+    
+    @app.route('/api/admin/fragment-cache', methods=['GET'])
+    @login_required
+    @admin_required
+    def api_fragment_cache():
+        """API endpoint reporting the hit rate and size of this process's rendered fragment cache."""
+        return jsonify(dict(fragment_cache.stats(), pid=os.getpid()))
+    
     # Tracking tool routes
     @app.route('/tracking-tool', methods=['GET', 'POST'])
     @login_required
@@ -341,15 +513,17 @@ def register_routes(app, limiter):
         if request.method == 'POST':
             return handle_file_upload(app)
         
-        # For GET requests, just render the upload form
-        return render_template('tracking_tool.html', form=form)
+        # For GET requests, render the upload form and the progress of a queued upload
+        return render_template('tracking_tool.html', form=form, job_id=request.args.get('job'))
     
     @app.route('/tracking-data')
     @login_required
+    @read_statement_timeout
+    @read_only
     def tracking_data():
         """Display tracking data from uploaded file."""
-        # Get uploaded file ID from session
-        file_id = session.get('uploaded_file_id')
+        # Get uploaded file ID from the query string (finished background jobs) or session
+        file_id = request.args.get('file_id', type=int) or session.get('uploaded_file_id')
         
         if not file_id:
             flash('No file selected', 'warning')
@@ -358,18 +532,41 @@ def register_routes(app, limiter):
         # Get the uploaded file record
         uploaded_file = UploadedFile.query.get(file_id)
         
-        if not uploaded_file:
+        if not uploaded_file or not can_view_upload(uploaded_file):
             flash('File not found', 'error')
             return redirect(url_for('tracking_tool'))
         
-        # Get tracking data for this file
-        tracking_items = TrackingData.query.filter_by(file_id=file_id).all()
+        session['uploaded_file_id'] = uploaded_file.id
         
-        return render_template(
+        # Tracking data never changes after ingest, so the browser revalidates its copy
+        # with the ETag; pages showing flashed messages are not cached
+        etag = upload_etag(uploaded_file, current_user.id, current_user.username, current_user.role)
+        cacheable = '_flashes' not in session
+        if cacheable:
+            response = not_modified(etag, 'private, no-cache')
+            if response:
+                return response
+        
+        # The tables depend only on the upload and the templates, so they are rendered
+        # once per process; the page around them stays per user
+        version = upload_etag(uploaded_file, 'tracking_tables.html')
+        tracking_tables = fragment_cache.get(uploaded_file.id, version)
+        if tracking_tables is None:
+            # Get tracking data for this file from its columnar snapshot
+            tracking_items = TrackingService.get_tracking_rows(uploaded_file)
+            tracking_tables = render_template('tracking_tables.html', tracking_items=tracking_items)
+            # An empty read may come from a lagging replica, so only cache real tables
+            if tracking_items:
+                fragment_cache.put(uploaded_file.id, version, tracking_tables)
+        
+        response = make_response(render_template(
             'tracking_data.html', 
-            tracking_items=tracking_items,
+            tracking_tables=Markup(tracking_tables),
             uploaded_file=uploaded_file
-        )
+        ))
+        if cacheable:
+            cache_headers(response, etag, 'private, no-cache')
+        return response
     
     @app.route('/uploads/<filename>')
     @login_required
@@ -379,26 +576,236 @@ def register_routes(app, limiter):
     
     @app.route('/api/tracking-data', methods=['GET'])
     @login_required
+    @read_statement_timeout
+    @read_only
     def api_tracking_data():
-        """API endpoint to get tracking data."""
+        """
+        API endpoint to get tracking data.
+        
+        Returns keyset-paginated pages: pass the returned next_cursor as
+        cursor to get the following page. Supports fields=, limit=, the
+        placement, ad and creative filters and the has_click_tag,
+        has_imp_tag and has_third_party_tag true/false filters.
+        paginate=false returns every row in the original unpaginated shape,
+        from the document serialized at ingest (gzip-encoded when accepted).
+        Responses carry a strong ETag of the upload and the query, and
+        If-None-Match requests for unchanged data are answered with 304.
+        Every response varies on Accept-Encoding, so shared caches never
+        send the gzip-encoded document to clients that did not accept it.
+        """
+        response = make_response(api_tracking_data_response())
+        response.vary.add('Accept-Encoding')
+        return response
+    
+    def api_tracking_data_response():
+        """Build the response of /api/tracking-data, before its Vary header."""
         file_id = request.args.get('file_id') or session.get('uploaded_file_id')
         
         if not file_id:
             return jsonify({'error': 'No file selected'}), 400
         
-        # Get tracking data for this file
-        tracking_items = TrackingData.query.filter_by(file_id=file_id).all()
+        # Unpaginated documents are pre-serialized and sent gzip-encoded to clients accepting it
+        unpaginated = request.args.get('paginate', 'true').lower() in ('false', '0', 'no')
+        gzip_encoded = unpaginated and app.config['API_PAYLOADS'] and request.accept_encodings['gzip'] > 0
+        
+        uploaded_file = UploadedFile.query.get(file_id)
+        if not uploaded_file or not can_view_upload(uploaded_file):
+            return jsonify({'error': 'File not found'}), 404
+        
+        # Answer repeat requests from the ETag of the upload without reading its rows
+        etag = upload_etag(uploaded_file, query_variant(), 'gzip' if gzip_encoded else 'identity')
+        cache_control = f"private, max-age={app.config['API_CACHE_MAX_AGE']}"
+        response = not_modified(etag, cache_control)
+        if response:
+            return response
+        
+        if unpaginated:
+            response = make_response(api_tracking_data_unpaginated(uploaded_file, gzip_encoded))
+        else:
+            response = make_response(api_tracking_data_page(uploaded_file.id))
+        if response.status_code == 200:
+            cache_headers(response, etag, cache_control)
+        return response
+    
+    def api_tracking_data_page(file_id):
+        """Return one keyset-paginated page of /api/tracking-data."""
+        fields, unknown = parse_api_fields(request.args)
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+        
+        cursor = request.args.get('cursor', type=int)
+        if cursor is None and request.args.get('cursor'):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        limit = request.args.get('limit', app.config['API_PAGE_SIZE'], type=int)
+        limit = min(max(limit, 1), app.config['API_MAX_PAGE_SIZE'])
+        
+        filters, invalid = parse_api_filters(request.args)
+        if invalid:
+            return jsonify({'error': f"Invalid filters: {', '.join(invalid)}"}), 400
+        
+        rows, next_cursor = TrackingService.get_tracking_page(file_id, fields, cursor, limit, filters)
+        return jsonify({'data': rows, 'next_cursor': next_cursor})
+    
+    @app.route('/api/tracking-data/stream', methods=['GET'])
+    @login_required
+    @read_statement_timeout
+    @read_only
+    def api_tracking_data_stream():
+        """
+        API endpoint streaming all tracking data of a file.
+        
+        format=ndjson (default) sends one JSON object per line, format=json
+        a chunked {"data": [...]} document. Supports fields= and the
+        filters of /api/tracking-data.
+        """
+        file_id = request.args.get('file_id') or session.get('uploaded_file_id')
+        
+        if not file_id:
+            return jsonify({'error': 'No file selected'}), 400
+        
+        uploaded_file = UploadedFile.query.get(file_id)
+        if not uploaded_file or not can_view_upload(uploaded_file):
+            return jsonify({'error': 'File not found'}), 404
+        
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in ('ndjson', 'json'):
+            return jsonify({'error': 'Invalid format'}), 400
+        
+        fields, unknown = parse_api_fields(request.args)
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+        
+        filters, invalid = parse_api_filters(request.args)
+        if invalid:
+            return jsonify({'error': f"Invalid filters: {', '.join(invalid)}"}), 400
+        
+        chunks = TrackingService.stream_tracking_data(
+            uploaded_file.id, fields, filters, fmt, app.config['API_STREAM_BATCH_SIZE']
+        )
+        mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+        return Response(stream_with_context(chunks), mimetype=mimetype)
+    
+    def api_tracking_data_unpaginated(uploaded_file, gzip_encoded=False):
+        """Return every row of a file in the original unpaginated shape."""
+        # Send the document serialized at ingest, without loading or encoding rows
+        if app.config['API_PAYLOADS']:
+            path = ensure_payload(uploaded_file)
+            if path:
+                return payload_response(path, gzip_encoded)
+        
+        # Read only the served columns from the file's columnar snapshot
+        rows = TrackingService.get_tracking_rows(
+            uploaded_file,
+            columns=['id', 'placement_name', 'ad_name', 'creative_name', 'click_tag_converted']
+        )
         
         # Convert to JSON-serializable format
         data = [{
-            'id': item.id,
-            'placement_name': item.placement_name,
-            'ad_name': item.ad_name,
-            'creative_name': item.creative_name,
-            'click_tag': item.click_tag_converted
-        } for item in tracking_items]
+            'id': row['id'],
+            'placement_name': row['placement_name'],
+            'ad_name': row['ad_name'],
+            'creative_name': row['creative_name'],
+            'click_tag': row['click_tag_converted']
+        } for row in rows]
         
         return jsonify({'data': data})
+    
+    @app.route('/api/search', methods=['GET'])
+    @login_required
+    @read_statement_timeout
+    def api_search():
+        """
+        API endpoint to search tracking data.
+        
+        Matches q against placement, ad, creative and campaign names using the
+        database search index and returns pages ordered by relevance.
+        Supports file_id=, page= and per_page=. Users other than admins
+        search only their own uploads.
+        """
+        search_term = request.args.get('q', '').strip()
+        
+        if not search_term:
+            return jsonify({'error': 'No search term'}), 400
+        
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = request.args.get('per_page', app.config['API_PAGE_SIZE'], type=int)
+        per_page = min(max(per_page, 1), app.config['API_MAX_PAGE_SIZE'])
+        
+        file_id = request.args.get('file_id')
+        if file_id:
+            uploaded_file = UploadedFile.query.get(file_id)
+            if not uploaded_file or not can_view_upload(uploaded_file):
+                return jsonify({'error': 'File not found'}), 404
+        
+        user_id = None if current_user.is_admin() else current_user.id
+        rows, has_next = TrackingService.search(search_term, file_id, page, per_page, user_id)
+        return jsonify({'data': rows, 'page': page, 'per_page': per_page, 'has_next': has_next})
+    
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    @login_required
+    def api_job(job_id):
+        """API endpoint to report the progress of a background ingestion job."""
+        job = JobService.get_job(job_id)
+        
+        if not job or (job.uploaded_by != current_user.id and not current_user.is_admin()):
+            return jsonify({'error': 'Job not found'}), 404
+        
+        data = job.to_dict()
+        if job.status == 'completed':
+            data['result_url'] = url_for('tracking_data', file_id=job.file_id)
+        
+        return jsonify(data)
+
+def can_view_upload(uploaded_file):
+    """
+    Check whether the current user may view the tracking data of an upload.
+    
+    Args:
+        uploaded_file (UploadedFile): Upload to view
+        
+    Returns:
+        bool: True for the user who uploaded it and for admins
+    """
+    return uploaded_file.uploaded_by == current_user.id or current_user.is_admin()
+
+def parse_api_fields(args):
+    """
+    Parse the comma-separated fields= parameter of the tracking data API.
+    
+    Args:
+        args (MultiDict): Request query arguments
+        
+    Returns:
+        tuple: (fields, unknown) lists of requested and unsupported field names
+    """
+    fields = [name.strip() for name in args.get('fields', '').split(',') if name.strip()]
+    unknown = [name for name in fields if name not in TRACKING_API_FIELDS]
+    return fields, unknown
+
+def parse_api_filters(args):
+    """
+    Parse the filters of the tracking data API.
+    
+    Args:
+        args (MultiDict): Request query arguments
+        
+    Returns:
+        tuple: (filters, invalid) where filters holds the substring filters
+        and the tag presence flags as booleans (None when absent), and
+        invalid lists flags whose value is not true or false
+    """
+    filters = {name: args.get(name) for name in TRACKING_API_FILTERS}
+    invalid = []
+    for name in TRACKING_API_FLAGS:
+        value = args.get(name, '').lower()
+        if value in ('true', '1', 'yes'):
+            filters[name] = True
+        elif value in ('false', '0', 'no'):
+            filters[name] = False
+        elif value:
+            invalid.append(name)
+    return filters, invalid
 
 def handle_file_upload(app):
     """
@@ -408,7 +815,8 @@ def handle_file_upload(app):
         app (Flask): Flask application instance
         
     Returns:
-        Response: Redirect response
+        Response: Redirect response, or a 202 JSON response with the job id
+        when the upload is queued for background ingestion
     """
     # Check if the post request has the file part
     if 'file' not in request.files:
@@ -432,14 +840,46 @@ def handle_file_upload(app):
     result = save_uploaded_file(file, app.config['UPLOAD_FOLDER'], allowed_extensions)
     
     if result[0] is None:
-        flash(result[1], 'error')
+        flash(result[2], 'error')
         return redirect(request.url)
     
-    filepath, new_filename = result
+    filepath, new_filename, checksum = result
     
     try:
+        # Show the results of an identical file instead of parsing it again
+        duplicate = TrackingService.find_duplicate(checksum, current_user.id)
+        
+        if duplicate:
+            os.remove(filepath)
+            app.logger.info(f"File {file.filename} matches already processed file {duplicate.id}")
+            
+            if app.config['INGEST_ASYNC'] and request.accept_mimetypes.best == 'application/json':
+                return jsonify({
+                    'file_id': duplicate.id,
+                    'result_url': url_for('tracking_data', file_id=duplicate.id)
+                })
+            
+            session['uploaded_file_id'] = duplicate.id
+            flash('This file was already processed. Showing the existing results.', 'info')
+            return redirect(url_for('tracking_data'))
+        
+        # In asynchronous mode, queue the file and return the job id immediately
+        if app.config['INGEST_ASYNC']:
+            job = JobService.enqueue(filepath, new_filename, file.filename, current_user.id, checksum=checksum)
+            
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({
+                    'job_id': job.id,
+                    'status_url': url_for('api_job', job_id=job.id)
+                }), 202
+            
+            flash('File uploaded. Processing has started.', 'info')
+            return redirect(url_for('tracking_tool', job=job.id))
+        
         # Validate that the Excel file has the required columns
-        validation_result = validate_excel_file(filepath)
+        read_start = time.perf_counter()
+        validation_result = validate_excel_file(filepath, app.config['HEADER_SCAN_ROWS'])
+        read_seconds = time.perf_counter() - read_start
         
         if not validation_result[0]:
             # If validation fails, delete the file and show error
@@ -456,21 +896,13 @@ def handle_file_upload(app):
             original_filename=file.filename,
             file_path=filepath,
             file_type='excel',
+            checksum=checksum,
             uploaded_by=current_user.id
         )
-        db.session.add(uploaded_file)
-        db.session.commit()
-        
-        # Process the Excel file and extract tracking data
-        tracking_data = process_excel_file(df, uploaded_file.id)
         
-        # Save tracking data to database
-        for data in tracking_data:
-            tracking_item = TrackingData(**data)
-            db.session.add(tracking_item)
-        
-        db.session.commit()
-        app.logger.info(f"Successfully processed file {new_filename} with {len(tracking_data)} tracking items")
+        # Process the Excel file and save the file record and tracking data in one transaction
+        row_count = TrackingService.ingest(uploaded_file, df, read_seconds=read_seconds)
+        app.logger.info(f"Successfully processed file {new_filename} with {row_count} tracking items")
         
         # Store the uploaded file ID in the session
         session['uploaded_file_id'] = uploaded_file.id
@@ -481,8 +913,11 @@ def handle_file_upload(app):
         
     except Exception as e:
         # Clean up on error
+        db.session.rollback()
         if os.path.exists(filepath):
             os.remove(filepath)
+        remove_snapshot(filepath)
+        remove_payload(filepath)
         
         app.logger.error(f"Error processing file {new_filename}: {str(e)}")
         flash(f'Error processing file: {str(e)}', 'error')
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark header-row detection for uploaded tracking sheets.
+
+Compares the previous row-by-row search (iterrows with nested loops, exact
+pass followed by a relaxed pass) with the vectorized find_header_row matcher
+on wide and tall sheets.
+"""
+import sys
+import os
+import argparse
+import timeit
+import pandas as pd
+from tabulate import tabulate
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import REQUIRED_COLUMNS, find_header_row
+
+def legacy_find_header_row(df_no_header, required_columns):
+    """Row-by-row header search as previously done by validate_excel_file."""
+    for exact in (True, False):
+        for idx, row in df_no_header.iterrows():
+            row_values = [str(val).strip() if pd.notnull(val) else "" for val in row]
+            matches = []
+            for col in required_columns:
+                found = False
+                for val in row_values:
+                    if val and (col.lower() == val.lower() if exact else col.lower() in val.lower()):
+                        found = True
+                        break
+                matches.append(found)
+            if all(matches):
+                return idx
+    return None
+
+def build_sheet(junk_rows, width, partial=False):
+    """
+    Build a header-less sheet with junk rows above a header row.
+
+    Args:
+        junk_rows (int): Number of pre-header rows
+        width (int): Number of columns
+        partial (bool): Use headers that only match the relaxed search
+
+    Returns:
+        pandas.DataFrame: Sheet as read with header=None
+    """
+    junk = [[f"note {r}-{c}" for c in range(width)] for r in range(junk_rows)]
+    suffix = ' (required)' if partial else ''
+    header = [col + suffix for col in REQUIRED_COLUMNS] + [f"extra {c}" for c in range(width - len(REQUIRED_COLUMNS))]
+    return pd.DataFrame(junk + [header], dtype=object)
+
+def run(repeat):
+    """Run all benchmark scenarios and print a result table."""
+    scenarios = [
+        ('wide (50 rows x 200 cols)', build_sheet(49, 200)),
+        ('tall (5000 rows x 8 cols)', build_sheet(4999, 8)),
+        ('tall, partial header', build_sheet(4999, 8, partial=True)),
+    ]
+    results = []
+    for name, df in scenarios:
+        rows = df.values.tolist()
+        expected = legacy_find_header_row(df, REQUIRED_COLUMNS)
+        assert find_header_row(rows, REQUIRED_COLUMNS)[0] == expected
+
+        legacy = min(timeit.repeat(lambda: legacy_find_header_row(df, REQUIRED_COLUMNS), number=1, repeat=repeat))
+        vectorized = min(timeit.repeat(lambda: find_header_row(rows, REQUIRED_COLUMNS), number=1, repeat=repeat))
+        results.append([name, f"{legacy * 1000:.1f}", f"{vectorized * 1000:.1f}", f"{legacy / vectorized:.1f}x"])
+
+    print(tabulate(results, headers=['Sheet', 'iterrows (ms)', 'vectorized (ms)', 'Speed-up']))
+
+def parse_arguments():
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description='Benchmark Excel header-row detection')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of timing repetitions per scenario (default: 5)')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    run(args.repeat)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark the row-by-row and columnar engines of process_excel_file.
+
+Builds a synthetic tracking sheet with realistic tag markup, checks that
+both engines produce identical records and reports their timings.
+"""
+import sys
+import os
+import argparse
+import logging
+import random
+import timeit
+import pandas as pd
+from tabulate import tabulate
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import process_excel_file
+
+CLICK_TAGS = [
+    '<a href="https://ad.doubleclick.net/ddm/trackclk/N1234.{n}/B5678;dc_trk_aid={n};dc_rdid=;ord=[timestamp]">Click</a>',
+    'https://ad.example.com/click?placement={n}&cb=%%CACHEBUSTER%%&gdpr=${{GDPR}}',
+]
+IMP_TAGS = [
+    '<IMG SRC="https://ad.doubleclick.net/ddm/trackimp/N1234.{n}/B5678;ord=[timestamp];dc_tdv=1?" BORDER="0" HEIGHT="1" WIDTH="1">',
+    None,
+]
+THIRD_PARTY_TAGS = [
+    '<script src="https://pixel.vendor.com/tag.js?pid={n}&gdpr_consent=${{GDPR_CONSENT_755}}&cb=${{CACHEBUSTER}}"></script>',
+    None,
+]
+
+def build_sheet(rows, distinct_tags):
+    """
+    Build a tracking sheet DataFrame as returned by validate_excel_file.
+
+    Args:
+        rows (int): Number of placements
+        distinct_tags (int): Number of distinct tag values per column
+
+    Returns:
+        pandas.DataFrame: Synthetic tracking sheet
+    """
+    rng = random.Random(42)
+
+    def tag(templates):
+        template = rng.choice(templates)
+        return template.format(n=rng.randrange(distinct_tags)) if template else None
+
+    return pd.DataFrame({
+        'Placement Name': [f"Site_{i % 40}_Display_300x250_{i}" if i % 97 else None for i in range(rows)],
+        'Ad Name': [f"Ad {i}" for i in range(rows)],
+        'Creative Name': [f"Creative {i % 12}" for i in range(rows)],
+        'Click Tag': [tag(CLICK_TAGS) for _ in range(rows)],
+        'Impression Tag (image)': [tag(IMP_TAGS) for _ in range(rows)],
+        'Third-party vendor tracking tag': [tag(THIRD_PARTY_TAGS) for _ in range(rows)],
+    })
+
+def run(sizes, repeat):
+    """Run the benchmark for each sheet size and print a result table."""
+    logging.disable(logging.WARNING)
+    results = []
+    for rows in sizes:
+        df = build_sheet(rows, distinct_tags=max(rows // 20, 1))
+        assert process_excel_file(df, 1) == process_excel_file(df, 1, columnar=True)
+
+        by_row = min(timeit.repeat(lambda: process_excel_file(df, 1), number=1, repeat=repeat))
+        columnar = min(timeit.repeat(lambda: process_excel_file(df, 1, columnar=True), number=1, repeat=repeat))
+        results.append([rows, f"{by_row * 1000:.1f}", f"{columnar * 1000:.1f}", f"{by_row / columnar:.1f}x"])
+
+    print(tabulate(results, headers=['Rows', 'iterrows (ms)', 'columnar (ms)', 'Speed-up']))
+
+def parse_arguments():
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description='Benchmark process_excel_file engines')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help='Sheet sizes in rows (default: 1000 10000 50000)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timing repetitions per size (default: 3)')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    run(args.sizes, args.repeat)
@@ -34,6 +34,7 @@ def create_test_data():
     """Create test data for development."""
     from models.user import User
     from models.tracking import UploadedFile, TrackingData
+    from services.tag_dictionary import intern_tags
     import secrets
     from datetime import datetime, timedelta
     
@@ -71,15 +72,22 @@ def create_test_data():
             # Add tracking data for each file
             for j in range(1, 4):  # 3 tracking entries per file
                 unique_id = secrets.token_hex(4)
+                tags = intern_tags([
+                    f"<img src='https://example.com/pixel?id={unique_id}'>",
+                    f"<a href='https://example.com/click?id={unique_id}'>Click</a>",
+                    f"<!-- 3rd party tracking for {unique_id} -->"
+                ])
+                imp_tag_id, click_tag_id, third_party_tracking_id = tags.values()
                 tracking = TrackingData(
                     file_id=file.id,
                     placement_name=f"Placement {i}-{j}",
                     ad_name=f"Ad {i}-{j}",
                     creative_name=f"Creative {i}-{j}",
                     campaign_id=f"CAMP{i}{j}",
-                    imp_tag=f"<img src='https://example.com/pixel?id={unique_id}'>",
-                    click_tag=f"<a href='https://example.com/click?id={unique_id}'>Click</a>",
-                    third_party_tracking=f"<!-- 3rd party tracking for {unique_id} -->"
+                    imp_tag_id=imp_tag_id,
+                    click_tag_id=click_tag_id,
+                    third_party_tracking_id=third_party_tracking_id,
+                    created_at=file.uploaded_at
                 )
                 db.session.add(tracking)
             
@@ -88,5 +96,80 @@ def create_test_data():
     
     click.echo("Test data creation complete")
 
+@cli.command('explain-queries')
+def explain_queries():
+    """Run EXPLAIN on hot queries and flag sequential scans."""
+    from tabulate import tabulate
+    from services.query_audit import audit_queries
+    
+    results = audit_queries()
+    rows = [
+        [result['name'], '\n'.join(result['plan']),
+         f"SEQ SCAN: {', '.join(result['seq_scans'])}" if result['seq_scans'] else 'ok']
+        for result in results
+    ]
+    click.echo(tabulate(rows, headers=['Query', 'Plan', 'Status'], tablefmt='grid'))
+    
+    flagged = [result['name'] for result in results if result['seq_scans']]
+    if flagged:
+        raise click.ClickException(f"{len(flagged)} hot queries use sequential scans: {', '.join(flagged)}")
+    click.echo("All hot queries use indexes.")
+
+@cli.command('purge-expired')
+@click.option('--hours', type=int, default=None, help='Retention period in hours (default: UPLOAD_RETENTION_HOURS).')
+@click.option('--batch-size', type=int, default=None, help='Uploads deleted per transaction (default: RETENTION_BATCH_SIZE).')
+@click.option('--row-batch-size', type=int, default=None,
+              help='Tracking rows deleted per transaction (default: RETENTION_ROW_BATCH_SIZE).')
+def purge_expired(hours, batch_size, row_batch_size):
+    """Delete expired uploads and their tracking data."""
+    from services.retention_service import RetentionService
+    
+    report = RetentionService.purge_expired(
+        hours if hours is not None else app.config['UPLOAD_RETENTION_HOURS'],
+        batch_size or app.config['RETENTION_BATCH_SIZE'],
+        row_batch_size=row_batch_size
+    )
+    click.echo(f"Deleted {report['files']} uploads, {report['tracking_rows']} tracking rows "
+               f"and {report['jobs']} finished jobs in {report['batches']} batches.")
+    click.echo(f"Reclaimed {report['bytes_reclaimed']} bytes on disk in {report['seconds']}s.")
+
+@cli.command('backfill-tag-flags')
+@click.option('--batch-size', type=int, default=1000, help='Rows updated per transaction.')
+def backfill_tag_flags(batch_size):
+    """Fill the tag presence flags of existing tracking rows."""
+    from services.tracking_service import TrackingService
+    
+    updated = TrackingService.backfill_tag_flags(batch_size)
+    click.echo(f"Updated the tag presence flags of {updated} tracking rows.")
+
+@cli.command('partition-tracking-data')
+@click.confirmation_option(prompt='This rebuilds tracking_data in one transaction. Continue?')
+def partition_tracking_data():
+    """Convert tracking_data to daily range partitions (PostgreSQL)."""
+    from services.partitioning import convert_to_partitioned
+    
+    if convert_to_partitioned(app.config['TRACKING_PARTITIONS_AHEAD']):
+        click.echo("tracking_data is now partitioned by created_at.")
+        click.echo("Set TRACKING_PARTITIONS=true so that queries and the scheduler use the partitions.")
+    else:
+        click.echo("Nothing to do: the database is not PostgreSQL or tracking_data is already partitioned.")
+
+@cli.command('maintain-partitions')
+@click.option('--hours', type=int, default=None, help='Retention period in hours (default: UPLOAD_RETENTION_HOURS).')
+def maintain_tracking_partitions(hours):
+    """Create upcoming tracking_data partitions and drop expired ones."""
+    from services.partitioning import maintain_partitions
+    
+    report = maintain_partitions(
+        hours if hours is not None else app.config['UPLOAD_RETENTION_HOURS'],
+        app.config['TRACKING_PARTITIONS_AHEAD'],
+        app.config['RETENTION_BATCH_SIZE']
+    )
+    if report is None:
+        raise click.ClickException("tracking_data is not partitioned; run 'python manage.py partition-tracking-data' first.")
+    click.echo(f"Created {len(report['created'])} partitions: {', '.join(report['created']) or '-'}")
+    click.echo(f"Dropped {len(report['dropped'])} partitions: {', '.join(report['dropped']) or '-'}")
+    click.echo(f"Deleted {report['purge']['files']} expired uploads.")
+
 if __name__ == '__main__':
     cli() 
\ No newline at end of file
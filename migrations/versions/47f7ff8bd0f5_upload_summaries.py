@@ -0,0 +1,43 @@
+"""upload summaries
+
+Revision ID: 47f7ff8bd0f5
+Revises: 5396aba50a6a
+Create Date: 2026-10-18 09:25:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '47f7ff8bd0f5'
+down_revision = '5396aba50a6a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    # db.create_all() already creates the table on databases started by the new code
+    if not inspector.has_table('upload_summaries'):
+        op.create_table(
+            'upload_summaries',
+            sa.Column('file_id', sa.Integer(), nullable=False),
+            sa.Column('rows_total', sa.Integer(), nullable=False),
+            sa.Column('rows_inserted', sa.Integer(), nullable=False),
+            sa.Column('rows_skipped', sa.Integer(), nullable=False),
+            sa.Column('click_tags', sa.Integer(), nullable=False),
+            sa.Column('impression_tags', sa.Integer(), nullable=False),
+            sa.Column('third_party_tags', sa.Integer(), nullable=False),
+            sa.Column('distinct_placements', sa.Integer(), nullable=False),
+            sa.Column('parse_seconds', sa.Float(), nullable=True),
+            sa.Column('byte_size', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['file_id'], ['uploaded_files.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('file_id')
+        )
+
+
+def downgrade():
+    op.drop_table('upload_summaries')
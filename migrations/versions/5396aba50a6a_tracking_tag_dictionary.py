@@ -0,0 +1,112 @@
+"""tracking tag dictionary
+
+Revision ID: 5396aba50a6a
+Revises: 93865a6292b3
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+import hashlib
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5396aba50a6a'
+down_revision = '93865a6292b3'
+branch_labels = None
+depends_on = None
+
+TAG_COLUMNS = [
+    'imp_tag', 'click_tag', 'third_party_tracking',
+    'imp_tag_converted', 'click_tag_converted', 'third_party_converted'
+]
+
+BATCH_SIZE = 1000
+
+tags = sa.table('tracking_tags', sa.column('id', sa.Integer), sa.column('digest', sa.String), sa.column('value', sa.Text))
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # db.create_all() already creates the table on databases started by the new code
+    if not inspector.has_table('tracking_tags'):
+        op.create_table(
+            'tracking_tags',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('digest', sa.String(length=64), nullable=False),
+            sa.Column('value', sa.Text(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_tracking_tags_digest', 'tracking_tags', ['digest'], unique=True)
+
+    columns = {column['name'] for column in inspector.get_columns('tracking_data')}
+    indexes = {index['name'] for index in inspector.get_indexes('tracking_data')}
+    for name in TAG_COLUMNS:
+        if f'{name}_id' not in columns:
+            op.add_column('tracking_data', sa.Column(f'{name}_id', sa.Integer(), nullable=True))
+            if bind.dialect.name == 'postgresql':
+                op.create_foreign_key(
+                    f'tracking_data_{name}_id_fkey', 'tracking_data', 'tracking_tags', [f'{name}_id'], ['id']
+                )
+        # Pruning unused tags and deleting tags probe the rows referring to them
+        if f'ix_tracking_data_{name}_id' not in indexes:
+            op.create_index(f'ix_tracking_data_{name}_id', 'tracking_data', [f'{name}_id'])
+
+    legacy = [name for name in TAG_COLUMNS if name in columns]
+    if not legacy:
+        return
+
+    # Copy every distinct tag text into the dictionary
+    known = set(bind.execute(sa.select(tags.c.digest)).scalars())
+    batch = []
+    for name in legacy:
+        values = bind.execute(sa.text(f"SELECT DISTINCT {name} FROM tracking_data WHERE {name} IS NOT NULL")).scalars()
+        for value in values:
+            digest = hashlib.sha256(value.encode('utf-8')).hexdigest()
+            if digest not in known:
+                known.add(digest)
+                batch.append({'digest': digest, 'value': value})
+            if len(batch) >= BATCH_SIZE:
+                bind.execute(tags.insert(), batch)
+                batch = []
+    if batch:
+        bind.execute(tags.insert(), batch)
+
+    # Point the rows at the dictionary and drop the text columns
+    if bind.dialect.name == 'postgresql':
+        for name in legacy:
+            op.execute(
+                f"UPDATE tracking_data t SET {name}_id = g.id FROM tracking_tags g "
+                f"WHERE t.{name} IS NOT NULL AND g.value = t.{name}"
+            )
+    else:
+        op.execute("CREATE INDEX tmp_tracking_tags_value ON tracking_tags (value)")
+        for name in legacy:
+            op.execute(
+                f"UPDATE tracking_data SET {name}_id = "
+                f"(SELECT id FROM tracking_tags WHERE value = tracking_data.{name}) WHERE {name} IS NOT NULL"
+            )
+        op.execute("DROP INDEX tmp_tracking_tags_value")
+
+    for name in legacy:
+        op.execute(f"ALTER TABLE tracking_data DROP COLUMN {name}")
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    for name in TAG_COLUMNS:
+        op.add_column('tracking_data', sa.Column(name, sa.Text(), nullable=True))
+        op.execute(
+            f"UPDATE tracking_data SET {name} = "
+            f"(SELECT value FROM tracking_tags WHERE id = tracking_data.{name}_id) WHERE {name}_id IS NOT NULL"
+        )
+        if bind.dialect.name == 'postgresql':
+            op.drop_constraint(f'tracking_data_{name}_id_fkey', 'tracking_data', type_='foreignkey')
+        op.drop_index(f'ix_tracking_data_{name}_id', table_name='tracking_data')
+        op.execute(f"ALTER TABLE tracking_data DROP COLUMN {name}_id")
+
+    op.drop_index('ix_tracking_tags_digest', table_name='tracking_tags')
+    op.drop_table('tracking_tags')
@@ -0,0 +1,83 @@
+"""initial schema
+
+Revision ID: 8b98c4583030
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b98c4583030'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    # Databases created by db.create_all() before migrations existed already have the tables
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not _has_table('users'):
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=64), nullable=True),
+            sa.Column('email', sa.String(length=120), nullable=True),
+            sa.Column('password_hash', sa.String(length=128), nullable=True),
+            sa.Column('role', sa.String(length=20), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('last_login', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_users_username', 'users', ['username'], unique=True)
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    if not _has_table('uploaded_files'):
+        op.create_table(
+            'uploaded_files',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('filename', sa.String(length=255), nullable=False),
+            sa.Column('original_filename', sa.String(length=255), nullable=False),
+            sa.Column('file_path', sa.String(length=255), nullable=False),
+            sa.Column('file_size', sa.Integer(), nullable=True),
+            sa.Column('file_type', sa.String(length=50), nullable=True),
+            sa.Column('uploaded_by', sa.Integer(), nullable=True),
+            sa.Column('uploaded_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['uploaded_by'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if not _has_table('tracking_data'):
+        op.create_table(
+            'tracking_data',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('file_id', sa.Integer(), nullable=False),
+            sa.Column('placement_name', sa.String(length=255), nullable=True),
+            sa.Column('ad_name', sa.String(length=255), nullable=True),
+            sa.Column('creative_name', sa.String(length=255), nullable=True),
+            sa.Column('imp_tag', sa.Text(), nullable=True),
+            sa.Column('click_tag', sa.Text(), nullable=True),
+            sa.Column('third_party_tracking', sa.Text(), nullable=True),
+            sa.Column('imp_tag_converted', sa.Text(), nullable=True),
+            sa.Column('click_tag_converted', sa.Text(), nullable=True),
+            sa.Column('third_party_converted', sa.Text(), nullable=True),
+            sa.Column('campaign_id', sa.String(length=100), nullable=True),
+            sa.Column('start_date', sa.Date(), nullable=True),
+            sa.Column('end_date', sa.Date(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['file_id'], ['uploaded_files.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('tracking_data')
+    op.drop_table('uploaded_files')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_table('users')
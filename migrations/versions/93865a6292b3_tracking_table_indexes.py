@@ -0,0 +1,36 @@
+"""tracking table indexes
+
+Revision ID: 93865a6292b3
+Revises: f2f0905c842a
+Create Date: 2026-10-18 09:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '93865a6292b3'
+down_revision = 'f2f0905c842a'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_tracking_data_file_id_id', 'tracking_data', ['file_id', 'id']),
+    ('ix_uploaded_files_uploaded_at', 'uploaded_files', ['uploaded_at']),
+    ('ix_uploaded_files_uploaded_by_uploaded_at', 'uploaded_files', ['uploaded_by', 'uploaded_at']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    for name, table, columns in INDEXES:
+        # db.create_all() already creates these on new databases
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,59 @@
+"""ingest jobs and upload checksums
+
+Revision ID: 98cfe5a5ab7e
+Revises: 8b98c4583030
+Create Date: 2026-10-18 09:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '98cfe5a5ab7e'
+down_revision = '8b98c4583030'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('ingest_jobs'):
+        op.create_table(
+            'ingest_jobs',
+            sa.Column('id', sa.String(length=32), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('stage', sa.String(length=20), nullable=False),
+            sa.Column('filename', sa.String(length=255), nullable=False),
+            sa.Column('original_filename', sa.String(length=255), nullable=False),
+            sa.Column('file_path', sa.String(length=255), nullable=False),
+            sa.Column('file_type', sa.String(length=50), nullable=True),
+            sa.Column('checksum', sa.String(length=64), nullable=True),
+            sa.Column('uploaded_by', sa.Integer(), nullable=True),
+            sa.Column('file_id', sa.Integer(), nullable=True),
+            sa.Column('rows_total', sa.Integer(), nullable=True),
+            sa.Column('rows_inserted', sa.Integer(), nullable=True),
+            sa.Column('rows_skipped', sa.Integer(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['file_id'], ['uploaded_files.id'], ondelete='SET NULL'),
+            sa.ForeignKeyConstraint(['uploaded_by'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_ingest_jobs_status', 'ingest_jobs', ['status'])
+
+    if 'checksum' not in {column['name'] for column in inspector.get_columns('uploaded_files')}:
+        op.add_column('uploaded_files', sa.Column('checksum', sa.String(length=64), nullable=True))
+        op.create_index('ix_uploaded_files_checksum', 'uploaded_files', ['checksum'])
+
+
+def downgrade():
+    op.drop_index('ix_uploaded_files_checksum', table_name='uploaded_files')
+    op.drop_column('uploaded_files', 'checksum')
+    op.drop_index('ix_ingest_jobs_status', table_name='ingest_jobs')
+    op.drop_table('ingest_jobs')
@@ -0,0 +1,32 @@
+"""ingest job leases
+
+Revision ID: c41d7e2a9b63
+Revises: ff1521dbeb3c
+Create Date: 2026-10-18 10:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e2a9b63'
+down_revision = 'ff1521dbeb3c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('ingest_jobs')}
+
+    # Jobs running during the upgrade have no lease and are recovered by their last update
+    if 'lease_owner' not in columns:
+        op.add_column('ingest_jobs', sa.Column('lease_owner', sa.String(length=100), nullable=True))
+    if 'lease_expires_at' not in columns:
+        op.add_column('ingest_jobs', sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('ingest_jobs', 'lease_expires_at')
+    op.drop_column('ingest_jobs', 'lease_owner')
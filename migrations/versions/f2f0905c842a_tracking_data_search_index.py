@@ -0,0 +1,72 @@
+"""tracking data search index
+
+Revision ID: f2f0905c842a
+Revises: 98cfe5a5ab7e
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2f0905c842a'
+down_revision = '98cfe5a5ab7e'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ['placement_name', 'ad_name', 'creative_name', 'campaign_id']
+COLUMN_LIST = ', '.join(SEARCH_COLUMNS)
+NEW_VALUES = ', '.join(f'new.{name}' for name in SEARCH_COLUMNS)
+OLD_VALUES = ', '.join(f'old.{name}' for name in SEARCH_COLUMNS)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name in SEARCH_COLUMNS:
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_tracking_data_{name}_trgm "
+                f"ON tracking_data USING gin ({name} gin_trgm_ops)"
+            )
+
+    elif dialect == 'sqlite':
+        exists = op.get_bind().execute(
+            sa.text("SELECT 1 FROM sqlite_master WHERE name = 'tracking_data_fts'")
+        ).first()
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS tracking_data_fts USING fts5({COLUMN_LIST}, "
+            f"content='tracking_data', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS tracking_data_fts_insert AFTER INSERT ON tracking_data BEGIN "
+            f"INSERT INTO tracking_data_fts(rowid, {COLUMN_LIST}) VALUES (new.id, {NEW_VALUES}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS tracking_data_fts_delete AFTER DELETE ON tracking_data BEGIN "
+            f"INSERT INTO tracking_data_fts(tracking_data_fts, rowid, {COLUMN_LIST}) "
+            f"VALUES ('delete', old.id, {OLD_VALUES}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS tracking_data_fts_update AFTER UPDATE ON tracking_data BEGIN "
+            f"INSERT INTO tracking_data_fts(tracking_data_fts, rowid, {COLUMN_LIST}) "
+            f"VALUES ('delete', old.id, {OLD_VALUES}); "
+            f"INSERT INTO tracking_data_fts(rowid, {COLUMN_LIST}) VALUES (new.id, {NEW_VALUES}); END"
+        )
+        if not exists:
+            op.execute("INSERT INTO tracking_data_fts(tracking_data_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        for name in SEARCH_COLUMNS:
+            op.execute(f"DROP INDEX IF EXISTS ix_tracking_data_{name}_trgm")
+
+    elif dialect == 'sqlite':
+        for suffix in ('insert', 'delete', 'update'):
+            op.execute(f"DROP TRIGGER IF EXISTS tracking_data_fts_{suffix}")
+        op.execute("DROP TABLE IF EXISTS tracking_data_fts")
@@ -0,0 +1,45 @@
+"""tag presence flags
+
+Revision ID: ff1521dbeb3c
+Revises: 47f7ff8bd0f5
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ff1521dbeb3c'
+down_revision = '47f7ff8bd0f5'
+branch_labels = None
+depends_on = None
+
+# Flag column and the name of the partial index of rows missing that tag
+FLAGS = [
+    ('click_tag_present', 'ix_tracking_data_missing_click_tag'),
+    ('imp_tag_present', 'ix_tracking_data_missing_imp_tag'),
+    ('third_party_present', 'ix_tracking_data_missing_third_party'),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('tracking_data')}
+    indexes = {index['name'] for index in inspector.get_indexes('tracking_data')}
+
+    # Existing rows keep NULL flags until 'python manage.py backfill-tag-flags' runs
+    for column, index in FLAGS:
+        if column not in columns:
+            op.add_column('tracking_data', sa.Column(column, sa.Boolean(), nullable=True))
+        if index not in indexes:
+            op.create_index(
+                index, 'tracking_data', ['file_id', 'id'],
+                postgresql_where=sa.text(f'NOT {column}'), sqlite_where=sa.text(f'{column} = 0')
+            )
+
+
+def downgrade():
+    for column, index in reversed(FLAGS):
+        op.drop_index(index, table_name='tracking_data')
+        op.execute(f"ALTER TABLE tracking_data DROP COLUMN {column}")
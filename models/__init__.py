@@ -1,9 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from models.session import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
 # Import models after db to avoid circular imports
 from models.user import User
-from models.tracking import UploadedFile, TrackingData 
\ No newline at end of file
+from models.tracking import UploadedFile, TrackingData, TrackingTag, UploadSummary
+from models.job import IngestJob
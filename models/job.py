@@ -0,0 +1,94 @@
+"""
+Database models for background jobs.
+This module contains the ingestion job model used by the asynchronous upload mode.
+"""
+import uuid
+from datetime import datetime
+from models import db
+
+class IngestJob(db.Model):
+    """
+    Model for a background ingestion job.
+
+    Jobs are stored in the database so they survive restarts of the web and
+    worker processes; a job is claimed by atomically moving it from queued to
+    running before any work starts.
+
+    Attributes:
+        id (str): Random job identifier exposed to clients
+        status (str): queued, running, completed or failed
+        stage (str): Current processing stage (queued, validating, ingesting, done)
+        filename (str): Secure filename stored on disk
+        original_filename (str): Original filename provided by user
+        file_path (str): Full path to the uploaded file on server
+        file_type (str): File extension
+        checksum (str): SHA-256 hex digest of the file contents
+        uploaded_by (int): Foreign key to user who uploaded the file
+        file_id (int): Foreign key to the UploadedFile created by the job
+        rows_total (int): Number of data rows found in the sheet
+        rows_inserted (int): Number of tracking rows saved
+        rows_skipped (int): Number of rows skipped for missing required fields
+        error (text): Error message if the job failed
+        attempts (int): Number of times the job was started
+        lease_owner (str): Process and run holding the lease of a running job
+        lease_expires_at (datetime): Time after which recovery may reclaim a running job
+        created_at (datetime): Timestamp when the job was queued
+        started_at (datetime): Timestamp when the job was last claimed
+        updated_at (datetime): Timestamp of the last progress update
+        finished_at (datetime): Timestamp when the job completed or failed
+    """
+    __tablename__ = 'ingest_jobs'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    stage = db.Column(db.String(20), nullable=False, default='queued')
+    filename = db.Column(db.String(255), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(255), nullable=False)
+    file_type = db.Column(db.String(50))
+    checksum = db.Column(db.String(64))
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    file_id = db.Column(db.Integer, db.ForeignKey('uploaded_files.id', ondelete='SET NULL'), nullable=True)
+    rows_total = db.Column(db.Integer)
+    rows_inserted = db.Column(db.Integer)
+    rows_skipped = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    lease_owner = db.Column(db.String(100))
+    lease_expires_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        """String representation of the object."""
+        return f'<IngestJob {self.id} {self.status}>'
+
+    @property
+    def is_finished(self):
+        """bool: True if the job completed or failed."""
+        return self.status in ('completed', 'failed')
+
+    def to_dict(self):
+        """
+        Convert model to dictionary for API responses.
+
+        Returns:
+            dict: Dictionary representation of the model
+        """
+        return {
+            'id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'original_filename': self.original_filename,
+            'file_id': self.file_id,
+            'rows_total': self.rows_total,
+            'rows_inserted': self.rows_inserted,
+            'rows_skipped': self.rows_skipped,
+            'error': self.error,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,59 @@
+"""
+Database session with read replica routing.
+This module defines the session class that sends reads to the optional read replica
+and the read-only mode of sessions.
+"""
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event
+
+# Bind key of the read replica in SQLALCHEMY_BINDS
+REPLICA_BIND = 'replica'
+
+class RoutingSession(Session):
+    """
+    Session that can send its reads to the read replica.
+
+    Reads go to the replica while info['replica_reads'] is set (see
+    services.replica) and a replica bind is configured. Flushes, writes,
+    locking reads and every statement after the session has written go to
+    the primary, so a request always sees its own changes.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and self.info.get('replica_reads') and not self.info.get('wrote')
+                and not self._flushing and isinstance(clause, Select) and clause._for_update_arg is None):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    """Keep a session that flushed changes on the primary."""
+    session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _executed(orm_execute_state):
+    """Keep a session that executed an insert, update or delete on the primary."""
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'after_begin')
+def _begin_read_only(session, transaction, connection):
+    """Start the transactions of read-only sessions as READ ONLY on PostgreSQL."""
+    if session.info.get('read_only') and connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql('SET TRANSACTION READ ONLY')
+
+def make_read_only(session, read_only=True):
+    """
+    Switch a session to or from read-only use.
+
+    Read-only sessions do not autoflush and start their transactions READ
+    ONLY on PostgreSQL; SQLite has no read-only transactions. Switch before
+    the first query of the request so that the first transaction is covered.
+
+    Args:
+        session (RoutingSession): Session of the current request
+        read_only (bool): False to restore the default behaviour
+    """
+    session.autoflush = not read_only
+    session.info['read_only'] = read_only
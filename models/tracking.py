@@ -2,9 +2,17 @@
 Database models for tracking system.
 This module contains models related to file uploads and tracking data.
 """
+import hashlib
 from datetime import datetime, timedelta
+from sqlalchemy.ext.hybrid import hybrid_property
 from models import db
 
+# TrackingData attributes whose text is stored once in the tracking_tags dictionary
+TAG_COLUMNS = [
+    'imp_tag', 'click_tag', 'third_party_tracking',
+    'imp_tag_converted', 'click_tag_converted', 'third_party_converted'
+]
+
 class UploadedFile(db.Model):
     """
     Model for uploaded files.
@@ -16,11 +24,16 @@ class UploadedFile(db.Model):
         file_path (str): Full path to the file on server
         file_size (int): File size in bytes
         file_type (str): File type (extension or MIME)
+        checksum (str): SHA-256 hex digest of the file contents
         uploaded_by (int): Foreign key to user who uploaded the file
         uploaded_at (datetime): Timestamp when file was uploaded
         user (relationship): Relationship to User model
     """
     __tablename__ = 'uploaded_files'
+    __table_args__ = (
+        # Per-user upload listings, newest first
+        db.Index('ix_uploaded_files_uploaded_by_uploaded_at', 'uploaded_by', 'uploaded_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
@@ -28,8 +41,9 @@ class UploadedFile(db.Model):
     file_path = db.Column(db.String(255), nullable=False)
     file_size = db.Column(db.Integer)  # File size in bytes
     file_type = db.Column(db.String(50))  # MIME type or extension
+    checksum = db.Column(db.String(64), index=True)  # SHA-256 of the contents
     uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'))
-    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     user = db.relationship('User', backref=db.backref('uploads', lazy='dynamic'))
     
@@ -108,10 +122,85 @@ class UploadedFile(db.Model):
             'original_filename': self.original_filename,
             'file_size': self.get_human_readable_size(),
             'file_type': self.file_type,
+            'checksum': self.checksum,
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
             'is_expired': self.is_expired()
         }
 
+# Presence flags of TrackingData and the converted tag each one describes
+TAG_PRESENCE_COLUMNS = {
+    'click_tag_present': 'click_tag_converted',
+    'imp_tag_present': 'imp_tag_converted',
+    'third_party_present': 'third_party_converted'
+}
+
+class TrackingTag(db.Model):
+    """
+    Model for the content-addressed dictionary of tracking tags.
+    
+    Tags repeat heavily within and across uploads, so each distinct text is
+    stored once and tracking rows hold integer references to it.
+    
+    Attributes:
+        id (int): Primary key
+        digest (str): SHA-256 hex digest of the value
+        value (text): Tag text
+    """
+    __tablename__ = 'tracking_tags'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), unique=True, index=True, nullable=False)
+    value = db.Column(db.Text, nullable=False)
+    
+    def __repr__(self):
+        """String representation of the object."""
+        return f'<TrackingTag {self.id}>'
+    
+    @staticmethod
+    def digest_of(value):
+        """
+        Compute the dictionary key of a tag.
+        
+        Args:
+            value (str): Tag text
+            
+        Returns:
+            str: SHA-256 hex digest of the UTF-8 encoded text
+        """
+        return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+def tag_present(value):
+    """
+    Check whether a converted tag holds anything besides whitespace.
+    
+    Args:
+        value (str): Tag text or None
+        
+    Returns:
+        bool: True if the tag is present
+    """
+    return bool(value and value.strip())
+
+def _tag_text(name):
+    """
+    Expose the text of a tag reference under the column name it replaced.
+    
+    Instances read the referenced TrackingTag, loaded on first access
+    unless the query joined it; queries get a correlated lookup of
+    tracking_tags by primary key.
+    """
+    def fget(self):
+        tag = getattr(self, f'{name}_ref')
+        return tag.value if tag is not None else None
+    
+    def expression(cls):
+        return (db.select(TrackingTag.value)
+                .where(TrackingTag.id == getattr(cls, f'{name}_id'))
+                .scalar_subquery()
+                .label(name))
+    
+    return hybrid_property(fget, expr=expression)
+
 class TrackingData(db.Model):
     """
     Model for tracking data extracted from uploaded files.
@@ -128,6 +217,10 @@ class TrackingData(db.Model):
         imp_tag_converted (text): Processed impression tag
         click_tag_converted (text): Processed click tag
         third_party_converted (text): Processed third-party tracking
+        <tag>_id (int): Foreign key to the TrackingTag holding each of the tags above
+        click_tag_present (bool): Whether the processed click tag is present (None until backfilled)
+        imp_tag_present (bool): Whether the processed impression tag is present
+        third_party_present (bool): Whether the processed third-party tracking is present
         campaign_id (str): Optional campaign identifier
         start_date (date): Campaign start date
         end_date (date): Campaign end date
@@ -135,24 +228,58 @@ class TrackingData(db.Model):
         file (relationship): Relationship to UploadedFile model
     """
     __tablename__ = 'tracking_data'
+    __table_args__ = (
+        # Rows of a file in id order: reads, keyset pages, deletes and the FK cascade
+        db.Index('ix_tracking_data_file_id_id', 'file_id', 'id'),
+        # Rows of a file missing a tag, for the presence filters of the API. The
+        # conditions match how NOT <flag> is rendered on each database.
+        db.Index('ix_tracking_data_missing_click_tag', 'file_id', 'id',
+                 postgresql_where=db.text('NOT click_tag_present'), sqlite_where=db.text('click_tag_present = 0')),
+        db.Index('ix_tracking_data_missing_imp_tag', 'file_id', 'id',
+                 postgresql_where=db.text('NOT imp_tag_present'), sqlite_where=db.text('imp_tag_present = 0')),
+        db.Index('ix_tracking_data_missing_third_party', 'file_id', 'id',
+                 postgresql_where=db.text('NOT third_party_present'), sqlite_where=db.text('third_party_present = 0')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     file_id = db.Column(db.Integer, db.ForeignKey('uploaded_files.id', ondelete='CASCADE'), nullable=False)
     placement_name = db.Column(db.String(255))
     ad_name = db.Column(db.String(255))
     creative_name = db.Column(db.String(255))
-    imp_tag = db.Column(db.Text)
-    click_tag = db.Column(db.Text)
-    third_party_tracking = db.Column(db.Text)
-    imp_tag_converted = db.Column(db.Text)
-    click_tag_converted = db.Column(db.Text)
-    third_party_converted = db.Column(db.Text)
+    imp_tag_id = db.Column(db.Integer, db.ForeignKey('tracking_tags.id'), index=True)
+    click_tag_id = db.Column(db.Integer, db.ForeignKey('tracking_tags.id'), index=True)
+    third_party_tracking_id = db.Column(db.Integer, db.ForeignKey('tracking_tags.id'), index=True)
+    imp_tag_converted_id = db.Column(db.Integer, db.ForeignKey('tracking_tags.id'), index=True)
+    click_tag_converted_id = db.Column(db.Integer, db.ForeignKey('tracking_tags.id'), index=True)
+    third_party_converted_id = db.Column(db.Integer, db.ForeignKey('tracking_tags.id'), index=True)
+    click_tag_present = db.Column(db.Boolean)
+    imp_tag_present = db.Column(db.Boolean)
+    third_party_present = db.Column(db.Boolean)
     campaign_id = db.Column(db.String(100), nullable=True)
     start_date = db.Column(db.Date, nullable=True)
     end_date = db.Column(db.Date, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    file = db.relationship('UploadedFile', backref=db.backref('tracking_data', cascade='all, delete-orphan'))
+    # passive_deletes leaves the rows of a deleted file to the database's ON DELETE CASCADE
+    # instead of loading each of them into the session first
+    file = db.relationship('UploadedFile', backref=db.backref('tracking_data', cascade='all, delete-orphan',
+                                                              passive_deletes=True))
+    
+    # Tag texts load on first access, once per distinct tag; queries that render
+    # tags opt in to joining them with joinedload
+    imp_tag_ref = db.relationship(TrackingTag, foreign_keys=[imp_tag_id], lazy='select')
+    click_tag_ref = db.relationship(TrackingTag, foreign_keys=[click_tag_id], lazy='select')
+    third_party_tracking_ref = db.relationship(TrackingTag, foreign_keys=[third_party_tracking_id], lazy='select')
+    imp_tag_converted_ref = db.relationship(TrackingTag, foreign_keys=[imp_tag_converted_id], lazy='select')
+    click_tag_converted_ref = db.relationship(TrackingTag, foreign_keys=[click_tag_converted_id], lazy='select')
+    third_party_converted_ref = db.relationship(TrackingTag, foreign_keys=[third_party_converted_id], lazy='select')
+    
+    imp_tag = _tag_text('imp_tag')
+    click_tag = _tag_text('click_tag')
+    third_party_tracking = _tag_text('third_party_tracking')
+    imp_tag_converted = _tag_text('imp_tag_converted')
+    click_tag_converted = _tag_text('click_tag_converted')
+    third_party_converted = _tag_text('third_party_converted')
     
     def __repr__(self):
         """String representation of the object."""
@@ -185,7 +312,9 @@ class TrackingData(db.Model):
         Returns:
             bool: True if impression tag exists, False otherwise
         """
-        return bool(self.imp_tag_converted and self.imp_tag_converted.strip())
+        if self.imp_tag_present is not None:
+            return self.imp_tag_present
+        return tag_present(self.imp_tag_converted)
     
     def has_click_tag(self):
         """
@@ -194,7 +323,9 @@ class TrackingData(db.Model):
         Returns:
             bool: True if click tag exists, False otherwise
         """
-        return bool(self.click_tag_converted and self.click_tag_converted.strip())
+        if self.click_tag_present is not None:
+            return self.click_tag_present
+        return tag_present(self.click_tag_converted)
     
     def has_third_party(self):
         """
@@ -203,4 +334,94 @@ class TrackingData(db.Model):
         Returns:
             bool: True if third-party tracking exists, False otherwise
         """
-        return bool(self.third_party_converted and self.third_party_converted.strip()) 
\ No newline at end of file
+        if self.third_party_present is not None:
+            return self.third_party_present
+        return tag_present(self.third_party_converted)
+
+class UploadSummary(db.Model):
+    """
+    Model for the statistics of an upload, written in the ingest transaction.
+    
+    Listing and dashboard views read these instead of counting and
+    inspecting the tracking rows of each file.
+    
+    Attributes:
+        file_id (int): Primary key and foreign key to UploadedFile
+        rows_total (int): Number of data rows found in the sheet
+        rows_inserted (int): Number of tracking rows saved
+        rows_skipped (int): Number of rows skipped for missing required fields
+        click_tags (int): Number of rows with a click tag
+        impression_tags (int): Number of rows with an impression tag
+        third_party_tags (int): Number of rows with third-party tracking
+        distinct_placements (int): Number of different placement names
+        parse_seconds (float): Time spent reading the workbook and converting it into tracking rows
+        byte_size (int): Size of the uploaded file in bytes
+        created_at (datetime): Timestamp when the summary was written
+        file (relationship): Relationship to UploadedFile model
+    """
+    __tablename__ = 'upload_summaries'
+    
+    file_id = db.Column(db.Integer, db.ForeignKey('uploaded_files.id', ondelete='CASCADE'), primary_key=True)
+    rows_total = db.Column(db.Integer, nullable=False, default=0)
+    rows_inserted = db.Column(db.Integer, nullable=False, default=0)
+    rows_skipped = db.Column(db.Integer, nullable=False, default=0)
+    click_tags = db.Column(db.Integer, nullable=False, default=0)
+    impression_tags = db.Column(db.Integer, nullable=False, default=0)
+    third_party_tags = db.Column(db.Integer, nullable=False, default=0)
+    distinct_placements = db.Column(db.Integer, nullable=False, default=0)
+    parse_seconds = db.Column(db.Float)
+    byte_size = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    file = db.relationship('UploadedFile', backref=db.backref('summary', uselist=False, passive_deletes=True))
+    
+    def __repr__(self):
+        """String representation of the object."""
+        return f'<UploadSummary for file {self.file_id}>'
+    
+    @classmethod
+    def from_rows(cls, uploaded_file, rows, rows_total, parse_seconds):
+        """
+        Summarize the tracking records of an upload.
+        
+        Args:
+            uploaded_file: UploadedFile the records belong to
+            rows (list): Records from process_excel_file, before they are inserted
+            rows_total (int): Number of data rows found in the sheet
+            parse_seconds (float): Time spent reading the workbook and producing the records
+            
+        Returns:
+            UploadSummary: New summary (not yet added to the session)
+        """
+        return cls(
+            file_id=uploaded_file.id,
+            rows_total=rows_total,
+            rows_inserted=len(rows),
+            rows_skipped=max(rows_total - len(rows), 0),
+            click_tags=sum(tag_present(row.get('click_tag_converted')) for row in rows),
+            impression_tags=sum(tag_present(row.get('imp_tag_converted')) for row in rows),
+            third_party_tags=sum(tag_present(row.get('third_party_converted')) for row in rows),
+            distinct_placements=len({row.get('placement_name') for row in rows if row.get('placement_name')}),
+            parse_seconds=parse_seconds,
+            byte_size=uploaded_file.file_size
+        )
+    
+    def to_dict(self):
+        """
+        Convert model to dictionary for API responses.
+        
+        Returns:
+            dict: Dictionary representation of the model
+        """
+        return {
+            'file_id': self.file_id,
+            'rows_total': self.rows_total,
+            'rows_inserted': self.rows_inserted,
+            'rows_skipped': self.rows_skipped,
+            'click_tags': self.click_tags,
+            'impression_tags': self.impression_tags,
+            'third_party_tags': self.third_party_tags,
+            'distinct_placements': self.distinct_placements,
+            'parse_seconds': self.parse_seconds,
+            'byte_size': self.byte_size
+        }
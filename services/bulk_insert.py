@@ -0,0 +1,149 @@
+"""
+Bulk persistence helpers.
+This module writes large batches of rows with as few database round trips as possible.
+"""
+import io
+import time
+import logging
+from datetime import date, datetime
+from models import db
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Rows sent to the database per statement or COPY buffer
+DEFAULT_BATCH_SIZE = 1000
+
+def _copy_literal(value):
+    """
+    Encode a value for PostgreSQL's COPY ... (FORMAT csv).
+
+    NULL is written as an unquoted empty field and every string is quoted,
+    so empty strings and NULLs stay distinguishable.
+
+    Args:
+        value: Python value to encode
+
+    Returns:
+        str: CSV field
+    """
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return '"' + str(value).replace('"', '""') + '"'
+
+def _column_defaults(table, columns):
+    """
+    Evaluate Python-side defaults for table columns missing from the rows.
+
+    COPY bypasses SQLAlchemy's default handling, so defaults such as
+    created_at=datetime.utcnow are computed once per batch here.
+
+    Args:
+        table (Table): Target table
+        columns (list): Column names present in the rows
+
+    Returns:
+        dict: Column name to default value
+    """
+    defaults = {}
+    for column in table.columns:
+        if column.name in columns or column.default is None:
+            continue
+        if column.default.is_callable:
+            defaults[column.name] = column.default.arg(None)
+        elif column.default.is_scalar:
+            defaults[column.name] = column.default.arg
+    return defaults
+
+def _copy_batches(connection, table, columns, batches):
+    """
+    Write batches with COPY FROM STDIN on a psycopg2 connection.
+
+    Args:
+        connection (Connection): SQLAlchemy connection of the current transaction
+        table (Table): Target table
+        columns (list): Column names present in the rows
+        batches (iterable): Lists of row dictionaries
+    """
+    preparer = connection.dialect.identifier_preparer
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        for batch in batches:
+            defaults = _column_defaults(table, columns)
+            names = columns + list(defaults)
+            statement = (
+                f"COPY {preparer.format_table(table)} ({', '.join(preparer.quote(name) for name in names)}) "
+                f"FROM STDIN WITH (FORMAT csv)"
+            )
+            buffer = io.StringIO()
+            for row in batch:
+                values = [row.get(name) for name in columns] + list(defaults.values())
+                buffer.write(','.join(_copy_literal(value) for value in values))
+                buffer.write('\n')
+            buffer.seek(0)
+            cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+
+def _insert_batches(connection, table, batches):
+    """
+    Write batches with executemany INSERT statements.
+
+    Args:
+        connection (Connection): SQLAlchemy connection of the current transaction
+        table (Table): Target table
+        batches (iterable): Lists of row dictionaries
+    """
+    statement = table.insert()
+    for batch in batches:
+        connection.execute(statement, batch)
+
+def _batched(rows, batch_size):
+    """Yield consecutive slices of rows holding at most batch_size items."""
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+def bulk_insert(table, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Insert many rows into a table inside the current session transaction.
+
+    PostgreSQL connections using psycopg2 stream the rows with COPY FROM
+    STDIN; other databases (SQLite in development and tests) use batched
+    executemany INSERTs. Nothing is committed here, so the caller decides
+    the transaction boundary.
+
+    Args:
+        table (Table): Target table, e.g. TrackingData.__table__
+        rows (list): Row dictionaries keyed by column name, all with the same keys
+        batch_size (int): Rows per statement or COPY buffer
+
+    Returns:
+        int: Number of rows inserted
+    """
+    if not rows:
+        return 0
+
+    connection = db.session.connection()
+    columns = list(rows[0])
+    use_copy = connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2'
+    batches = _batched(rows, max(int(batch_size), 1))
+
+    start = time.perf_counter()
+    if use_copy:
+        _copy_batches(connection, table, columns, batches)
+    else:
+        _insert_batches(connection, table, batches)
+    elapsed = time.perf_counter() - start
+
+    rate = len(rows) / elapsed if elapsed > 0 else float('inf')
+    logger.info(
+        f"Inserted {len(rows)} rows into {table.name} via {'COPY' if use_copy else 'executemany'} "
+        f"in {elapsed:.3f}s ({rate:.0f} rows/s, batch size {batch_size})"
+    )
+    return len(rows)
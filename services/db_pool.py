@@ -0,0 +1,92 @@
+"""
+Database connection pool metrics.
+This module provides a connection pool that records checkout counts and wait times,
+and reports them together with the pool status.
+"""
+import logging
+import os
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+class MeteredQueuePool(QueuePool):
+    """
+    QueuePool that records how long connection checkouts take.
+
+    A checkout waits when every pooled and overflow connection is in use, so
+    rising wait times show pool saturation before it turns into request
+    latency. The time includes opening new connections and the pre-ping.
+    """
+    # Checkouts slower than this many seconds are logged as warnings
+    wait_warning = 0.1
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            'checkouts': 0,
+            'slow_checkouts': 0,
+            'timeouts': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            with self._metrics_lock:
+                self.metrics['timeouts'] += 1
+            logger.error(f"Connection pool exhausted: {self.status()}")
+            raise
+        self._record_wait(time.perf_counter() - start)
+        return connection
+
+    def _record_wait(self, seconds):
+        with self._metrics_lock:
+            self.metrics['checkouts'] += 1
+            self.metrics['wait_seconds_total'] += seconds
+            self.metrics['wait_seconds_max'] = max(self.metrics['wait_seconds_max'], seconds)
+            slow = seconds > self.wait_warning
+            if slow:
+                self.metrics['slow_checkouts'] += 1
+        if slow:
+            logger.warning(f"Connection checkout waited {seconds * 1000:.0f} ms: {self.status()}")
+
+def pool_stats(engine):
+    """
+    Report the connection pool of an engine in this process.
+
+    Args:
+        engine (Engine): SQLAlchemy engine
+
+    Returns:
+        dict: Pool class and status, plus the occupancy of queue pools and
+            the checkout metrics of metered pools
+    """
+    pool = engine.pool
+    stats = {'pid': os.getpid(), 'pool': type(pool).__name__, 'status': pool.status()}
+
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+        })
+
+    metrics = getattr(pool, 'metrics', None)
+    if metrics is not None:
+        with pool._metrics_lock:
+            stats.update(metrics)
+        checkouts = stats['checkouts']
+        stats['wait_ms_avg'] = round(stats['wait_seconds_total'] * 1000 / checkouts, 3) if checkouts else 0.0
+        stats['wait_ms_max'] = round(stats.pop('wait_seconds_max') * 1000, 3)
+        del stats['wait_seconds_total']
+
+    return stats
@@ -0,0 +1,146 @@
+"""
+Rendered fragment cache.
+This module keeps rendered HTML fragments of uploads in a size-bounded LRU,
+so that repeat views of the same upload skip reading and rendering its rows.
+"""
+import threading
+import logging
+from collections import OrderedDict
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Default upper bound of the cached fragments of one process
+FRAGMENT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+class FragmentCache:
+    """
+    Size-bounded LRU of rendered HTML fragments.
+
+    Entries are keyed by upload id and a version string that changes with
+    the upload's content and the deployed templates, so a deploy never
+    serves fragments of the previous templates. The least recently used
+    fragments are evicted once their UTF-8 size exceeds maxbytes.
+
+    Attributes:
+        maxbytes (int): Maximum total size of the cached fragments, 0 disables caching
+        hits (int): Number of fragments served from the cache
+        misses (int): Number of fragments that had to be rendered
+        evictions (int): Number of fragments evicted to make room
+    """
+
+    def __init__(self, maxbytes=FRAGMENT_CACHE_MAX_BYTES):
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, maxbytes):
+        """
+        Set the size bound, evicting fragments that no longer fit.
+
+        Args:
+            maxbytes (int): Maximum total size of the cached fragments, 0 disables caching
+        """
+        with self._lock:
+            self.maxbytes = maxbytes
+            self._evict()
+
+    def get(self, file_id, version):
+        """
+        Get a cached fragment.
+
+        Args:
+            file_id (int): ID of the uploaded file
+            version (str): Version of the upload content and templates
+
+        Returns:
+            str: Rendered fragment, or None on a miss
+        """
+        key = (file_id, version)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, file_id, version, fragment):
+        """
+        Cache a rendered fragment unless it is larger than the whole cache.
+
+        Args:
+            file_id (int): ID of the uploaded file
+            version (str): Version of the upload content and templates
+            fragment (str): Rendered HTML
+        """
+        size = len(fragment.encode('utf-8'))
+        if size > self.maxbytes:
+            return
+
+        key = (file_id, version)
+        with self._lock:
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._cache[key] = (fragment, size)
+            self._size += size
+            self._evict()
+
+    def invalidate(self, file_id):
+        """
+        Drop every cached fragment of an upload.
+
+        Args:
+            file_id (int): ID of the uploaded file
+
+        Returns:
+            int: Number of fragments dropped
+        """
+        with self._lock:
+            keys = [key for key in self._cache if key[0] == file_id]
+            for key in keys:
+                self._size -= self._cache.pop(key)[1]
+        return len(keys)
+
+    def _evict(self):
+        """Evict the least recently used fragments until the cache fits; the lock must be held."""
+        while self._cache and self._size > self.maxbytes:
+            self._size -= self._cache.popitem(last=False)[1][1]
+            self.evictions += 1
+
+    def stats(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Hits, misses, hit rate, evictions and current/maximum size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._cache),
+                'bytes': self._size,
+                'maxbytes': self.maxbytes,
+            }
+
+    def clear(self):
+        """Empty the cache and reset its counters."""
+        with self._lock:
+            self._cache.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+# Module-level cache shared by all requests in this process
+fragment_cache = FragmentCache()
@@ -0,0 +1,92 @@
+"""
+HTTP caching of upload views.
+This module builds strong ETags for the immutable tracking data of an upload and answers conditional GETs.
+"""
+import os
+import hashlib
+import logging
+from flask import Response, current_app, request
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+def template_digest(template_folder):
+    """
+    Digest the templates, so that a deploy changing them changes the release version.
+
+    Args:
+        template_folder (str): Folder holding the Jinja templates
+
+    Returns:
+        str: Short hex digest of the template paths and contents
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(template_folder):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, template_folder).encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+def upload_etag(uploaded_file, *variant):
+    """
+    Build the strong ETag of one representation of an upload's tracking data.
+
+    Tracking data never changes after ingest, so the upload id and checksum
+    (or upload time for records without one) identify its content. The
+    release version covers code and template changes; variant covers
+    anything else the representation depends on, like query parameters.
+
+    Args:
+        uploaded_file (UploadedFile): Upload whose data is represented
+        *variant: Further values the response body depends on
+
+    Returns:
+        str: Unquoted entity tag
+    """
+    stamp = uploaded_file.checksum or (uploaded_file.uploaded_at.isoformat() if uploaded_file.uploaded_at else '')
+    parts = [str(uploaded_file.id), stamp, current_app.config['RELEASE_VERSION'], *map(str, variant)]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()[:32]
+
+def query_variant():
+    """
+    Normalize the query string of the current request for an ETag.
+
+    Returns:
+        str: Query parameters sorted by name
+    """
+    return '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+
+def not_modified(etag, cache_control):
+    """
+    Answer a conditional GET whose If-None-Match matches the current ETag.
+
+    Args:
+        etag (str): Current entity tag of the resource
+        cache_control (str): Cache-Control header of the resource
+
+    Returns:
+        Response: Empty 304 response, or None when the client copy is outdated
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    return cache_headers(response, etag, cache_control)
+
+def cache_headers(response, etag, cache_control):
+    """
+    Add the ETag and Cache-Control headers to a successful response.
+
+    Args:
+        response (Response): Response of the resource
+        etag (str): Entity tag of the response body
+        cache_control (str): Cache-Control header value
+
+    Returns:
+        Response: The same response
+    """
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,501 @@
+"""
+Background ingestion job service.
+This module queues uploaded workbooks and ingests them in a local process pool.
+"""
+import os
+import time
+import uuid
+import pickle
+import socket
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from flask import Flask, current_app
+from models import db
+from models.job import IngestJob
+from models.tracking import UploadedFile, TrackingData
+from utils import validate_excel_file, macro_rewriter
+from services.partitioning import file_rows
+from services.tracking_service import TrackingService
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Process pool of the current web process, created on first use
+_executor = None
+_executor_lock = threading.Lock()
+
+# Flask application of a pool worker process, set by _init_worker
+_worker_app = None
+
+def _worker_settings(app):
+    """
+    Collect the configuration passed to pool worker processes.
+
+    Args:
+        app (Flask): Application whose configuration is copied
+
+    Returns:
+        dict: Picklable upper-case configuration values
+    """
+    settings = {}
+    for key, value in app.config.items():
+        if not key.isupper():
+            continue
+        try:
+            pickle.dumps(value)
+        except Exception:
+            continue
+        settings[key] = value
+    return settings
+
+def _init_worker(settings):
+    """
+    Initialize a pool worker process.
+
+    Workers are spawned rather than forked, so they never share database
+    connections with the web process; each one builds a minimal Flask
+    application with its own engine.
+
+    Args:
+        settings (dict): Configuration of the web application
+    """
+    global _worker_app
+    app = Flask(__name__)
+    app.config.update(settings)
+    db.init_app(app)
+    macro_rewriter.configure(settings.get('MACRO_RULES_FILE'))
+    _worker_app = app
+
+def _run_job(job_id):
+    """Run a job inside the worker application context."""
+    with _worker_app.app_context():
+        return JobService.run(job_id)
+
+def _log_job_failure(future):
+    """Log jobs that crashed their worker process."""
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Ingestion worker failed: {error}")
+
+def _lease_owner():
+    """Identify the process, and the run within it, holding a job lease."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+@contextmanager
+def _heartbeat(job_id, owner):
+    """
+    Renew the lease of a running job from a background thread.
+
+    The lease is renewed every third of INGEST_JOB_TIMEOUT on a connection
+    of its own, so long validation or ingest transactions never let it
+    expire while the job is still being worked on.
+
+    Args:
+        job_id: ID of the job
+        owner: Lease owner set when the job was claimed
+    """
+    engine = db.engine
+    timeout = current_app.config['INGEST_JOB_TIMEOUT']
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(max(timeout / 3, 1)):
+            now = datetime.utcnow()
+            try:
+                with engine.begin() as connection:
+                    result = connection.execute(
+                        db.update(IngestJob)
+                        .where(IngestJob.id == job_id, IngestJob.status == 'running', IngestJob.lease_owner == owner)
+                        .values(lease_expires_at=now + timedelta(seconds=timeout), updated_at=now)
+                    )
+            except Exception as e:
+                logger.warning(f"Could not renew the lease of ingestion job {job_id}: {str(e)}")
+                continue
+            if result.rowcount == 0:
+                logger.warning(f"Ingestion job {job_id} lost its lease")
+                return
+
+    thread = threading.Thread(target=renew, name=f"ingest-heartbeat-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+def _get_executor(app):
+    """
+    Return the process pool of the current web process.
+
+    Args:
+        app (Flask): Application used to configure the workers
+
+    Returns:
+        ProcessPoolExecutor: Shared process pool
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=app.config['INGEST_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(_worker_settings(app),)
+            )
+            logger.info(f"Started ingestion pool with {app.config['INGEST_WORKERS']} workers")
+        return _executor
+
+class JobService:
+    """
+    Service class for background ingestion jobs.
+    Handles queueing, claiming, running and recovering jobs.
+    """
+
+    @staticmethod
+    def enqueue(filepath, filename, original_filename, user_id, file_type='excel', checksum=None):
+        """
+        Queue a saved upload for background ingestion.
+
+        Args:
+            filepath: Full path of the saved file
+            filename: Secure filename stored on disk
+            original_filename: Filename provided by the user
+            user_id: ID of the user uploading the file
+            file_type: File type stored on the UploadedFile record
+            checksum: SHA-256 hex digest of the file contents
+
+        Returns:
+            IngestJob: The queued job
+        """
+        job = IngestJob(
+            filename=filename,
+            original_filename=original_filename,
+            file_path=filepath,
+            file_type=file_type,
+            checksum=checksum,
+            uploaded_by=user_id
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        logger.info(f"Queued ingestion job {job.id} for {filename}")
+        JobService.submit(job.id)
+        return job
+
+    @staticmethod
+    def submit(job_id):
+        """
+        Hand a queued job to the process pool.
+
+        With INGEST_WORKERS set to 0 the job runs inline in the current
+        process, which is useful for tests and single-process debugging.
+
+        Args:
+            job_id: ID of the job
+        """
+        app = current_app._get_current_object()
+        if app.config['INGEST_WORKERS'] <= 0:
+            JobService.run(job_id)
+            return
+
+        future = _get_executor(app).submit(_run_job, job_id)
+        future.add_done_callback(_log_job_failure)
+
+    @staticmethod
+    def get_job(job_id):
+        """
+        Get a job by its ID.
+
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            IngestJob: The job, or None if it does not exist
+        """
+        return IngestJob.query.get(job_id)
+
+    @staticmethod
+    def claim(job_id, owner):
+        """
+        Atomically move a queued job to running and take its lease.
+
+        The conditional UPDATE guarantees that a job handed to several
+        processes (for example when recovery re-submits it) runs once. The
+        lease expires after INGEST_JOB_TIMEOUT seconds unless it is renewed.
+
+        Args:
+            job_id: ID of the job
+            owner: Identifier of the run taking the lease
+
+        Returns:
+            bool: True if this process owns the job
+        """
+        now = datetime.utcnow()
+        result = db.session.execute(
+            db.update(IngestJob)
+            .where(IngestJob.id == job_id, IngestJob.status == 'queued')
+            .values(status='running', stage='validating', started_at=now, updated_at=now,
+                    lease_owner=owner,
+                    lease_expires_at=now + timedelta(seconds=current_app.config['INGEST_JOB_TIMEOUT']),
+                    attempts=IngestJob.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    def hold_lease(job_id, owner):
+        """
+        Check that a run still holds the lease of its job, in the current transaction.
+
+        Called right before a run commits its results: the UPDATE locks the
+        job row, so recovery cannot requeue the job until the commit, and a
+        run whose lease was already reclaimed finds it lost.
+
+        Args:
+            job_id: ID of the job
+            owner: Lease owner set when the job was claimed
+
+        Returns:
+            bool: True if the lease is still held
+        """
+        now = datetime.utcnow()
+        result = db.session.execute(
+            db.update(IngestJob)
+            .where(IngestJob.id == job_id, IngestJob.status == 'running', IngestJob.lease_owner == owner)
+            .values(lease_expires_at=now + timedelta(seconds=current_app.config['INGEST_JOB_TIMEOUT']))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    def run(job_id):
+        """
+        Validate and ingest the file of a job, recording progress on the job.
+
+        The UploadedFile, its tracking rows and the job's completion are
+        committed in one transaction, so an interrupted job can be re-run.
+        The job's lease is renewed while it runs, and nothing is committed
+        once recovery has reclaimed it.
+
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            bool: True if the job completed
+        """
+        owner = _lease_owner()
+        if not JobService.claim(job_id, owner):
+            logger.info(f"Ingestion job {job_id} is not queued, skipping")
+            return False
+
+        job = IngestJob.query.get(job_id)
+
+        with _heartbeat(job_id, owner):
+            return JobService._process(job, owner)
+
+    @staticmethod
+    def _process(job, owner):
+        """
+        Validate and ingest the file of a claimed job.
+
+        Args:
+            job (IngestJob): The running job
+            owner: Lease owner set when the job was claimed
+
+        Returns:
+            bool: True if the job completed
+        """
+        job_id = job.id
+
+        try:
+            # An identical file may have been processed since the job was queued
+            duplicate = TrackingService.find_duplicate(job.checksum, job.uploaded_by)
+
+            if duplicate:
+                if not JobService.hold_lease(job_id, owner):
+                    return JobService._lost_lease(job_id)
+                if os.path.exists(job.file_path):
+                    os.remove(job.file_path)
+                job.status = 'completed'
+                job.stage = 'done'
+                job.file_id = duplicate.id
+                JobService._copy_row_counts(job, duplicate)
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+                logger.info(f"Ingestion job {job_id} reused already processed file {duplicate.id}")
+                return True
+
+            read_start = time.perf_counter()
+            validation_result = validate_excel_file(job.file_path, current_app.config['HEADER_SCAN_ROWS'])
+            read_seconds = time.perf_counter() - read_start
+
+            if not validation_result[0]:
+                JobService._fail(job, f"Invalid Excel file: {validation_result[1]}", owner)
+                return False
+
+            df = validation_result[1]
+            job.stage = 'ingesting'
+            job.rows_total = len(df)
+            db.session.commit()
+
+            uploaded_file = UploadedFile(
+                filename=job.filename,
+                original_filename=job.original_filename,
+                file_path=job.file_path,
+                file_size=os.path.getsize(job.file_path),
+                file_type=job.file_type,
+                checksum=job.checksum,
+                uploaded_by=job.uploaded_by
+            )
+            row_count = TrackingService.ingest(uploaded_file, df, commit=False, read_seconds=read_seconds)
+
+            # The files written by ingest are left to the run that took over the job
+            if not JobService.hold_lease(job_id, owner):
+                return JobService._lost_lease(job_id)
+
+            job.status = 'completed'
+            job.stage = 'done'
+            job.file_id = uploaded_file.id
+            job.rows_inserted = row_count
+            job.rows_skipped = len(df) - row_count
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+            logger.info(f"Ingestion job {job_id} processed {job.filename} with {row_count} tracking items")
+            return True
+
+        except Exception as e:
+            logger.exception(f"Error processing ingestion job {job_id}: {str(e)}")
+            db.session.rollback()
+            JobService._fail(job, f"Error processing file: {str(e)}", owner)
+            return False
+
+    @staticmethod
+    def _lost_lease(job_id):
+        """
+        Abandon a run whose job was reclaimed by recovery.
+
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            bool: Always False
+        """
+        db.session.rollback()
+        logger.warning(f"Ingestion job {job_id} was reclaimed while running, discarding this run")
+        return False
+
+    @staticmethod
+    def _copy_row_counts(job, uploaded_file):
+        """
+        Record the row counts of an already processed upload on a job.
+
+        Uploads from before upload summaries are counted from their tracking rows.
+
+        Args:
+            job (IngestJob): Job completed by reusing the upload
+            uploaded_file (UploadedFile): Upload with identical contents
+        """
+        summary = uploaded_file.summary
+        if summary is not None:
+            job.rows_total = summary.rows_total
+            job.rows_inserted = summary.rows_inserted
+            job.rows_skipped = summary.rows_skipped
+        else:
+            job.rows_inserted = db.session.scalar(
+                db.select(db.func.count()).select_from(TrackingData).where(file_rows(uploaded_file.id))
+            )
+            job.rows_total = job.rows_inserted
+            job.rows_skipped = 0
+
+    @staticmethod
+    def _fail(job, error, owner):
+        """
+        Mark a job as failed and remove its file, snapshot and API payload.
+
+        Nothing is changed when the run no longer holds the lease of the
+        job: the job and its files then belong to the run that took over.
+
+        Args:
+            job: The failed job
+            error: Error message reported to the client
+            owner: Lease owner set when the job was claimed
+
+        Returns:
+            bool: True if the job was marked as failed
+        """
+        result = db.session.execute(
+            db.update(IngestJob)
+            .where(IngestJob.id == job.id, IngestJob.status == 'running', IngestJob.lease_owner == owner)
+            .values(status='failed', error=error, finished_at=datetime.utcnow(),
+                    lease_owner=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            return JobService._lost_lease(job.id)
+        db.session.commit()
+
+        TrackingService.remove_upload_files(job.file_path)
+        logger.warning(f"Ingestion job {job.id} failed: {error}")
+        return True
+
+    @staticmethod
+    def recover():
+        """
+        Re-submit jobs left behind by a restart.
+
+        Running jobs whose lease expired are put back in the queue, or failed
+        once they reached INGEST_JOB_MAX_ATTEMPTS. They are submitted again
+        together with jobs queued for INGEST_JOB_TIMEOUT seconds without being
+        claimed, whose submitting process is gone. Runs from the scheduler;
+        concurrent runs in several processes are safe, since requeueing and
+        claiming are conditional UPDATEs.
+
+        Returns:
+            int: Number of jobs submitted
+        """
+        now = datetime.utcnow()
+        timeout_ago = now - timedelta(seconds=current_app.config['INGEST_JOB_TIMEOUT'])
+        # Jobs claimed before leases existed only have their last progress update
+        stale = db.and_(
+            IngestJob.status == 'running',
+            db.or_(
+                IngestJob.lease_expires_at < now,
+                db.and_(IngestJob.lease_expires_at.is_(None), IngestJob.updated_at < timeout_ago)
+            )
+        )
+        max_attempts = current_app.config['INGEST_JOB_MAX_ATTEMPTS']
+
+        db.session.execute(
+            db.update(IngestJob)
+            .where(stale, IngestJob.attempts >= max_attempts)
+            .values(status='failed', error='Job was interrupted too many times', finished_at=now,
+                    lease_owner=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        requeued = db.session.execute(
+            db.update(IngestJob)
+            .where(stale, IngestJob.attempts < max_attempts)
+            .values(status='queued', stage='queued', updated_at=now, lease_owner=None, lease_expires_at=None)
+            .returning(IngestJob.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        db.session.commit()
+
+        orphaned = db.session.scalars(
+            db.select(IngestJob.id)
+            .where(IngestJob.status == 'queued', IngestJob.updated_at < timeout_ago)
+            .order_by(IngestJob.created_at)
+        ).all()
+        job_ids = requeued + [job_id for job_id in orphaned if job_id not in requeued]
+        for job_id in job_ids:
+            JobService.submit(job_id)
+
+        if job_ids:
+            logger.info(f"Re-submitted {len(job_ids)} ingestion jobs")
+        return len(job_ids)
@@ -0,0 +1,285 @@
+"""
+Time-partitioned tracking data.
+This module converts tracking_data to daily range partitions on PostgreSQL and maintains them.
+"""
+import re
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import inspect, text
+from models import db
+from models.tracking import UploadedFile, TrackingData
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Daily partitions are named tracking_data_pYYYYMMDD
+PARTITION_PREFIX = 'tracking_data_p'
+PARTITION_NAME = re.compile(rf'^{PARTITION_PREFIX}(\d{{8}})$')
+
+# Catches rows outside every daily partition, e.g. when maintenance has not run
+DEFAULT_PARTITION = 'tracking_data_default'
+
+def file_rows(file_id):
+    """
+    Build the criteria selecting the tracking rows of an uploaded file.
+
+    Ingest stamps every row with its file's upload time. With
+    TRACKING_PARTITIONS enabled, the created_at term lets PostgreSQL skip
+    every partition but the file's one at execution time.
+
+    Args:
+        file_id (int): ID of the uploaded file
+
+    Returns:
+        ColumnElement: WHERE clause for TrackingData
+    """
+    criteria = TrackingData.file_id == file_id
+    if current_app.config['TRACKING_PARTITIONS']:
+        uploaded_at = db.select(UploadedFile.uploaded_at).where(UploadedFile.id == file_id).scalar_subquery()
+        criteria = db.and_(criteria, TrackingData.created_at == uploaded_at)
+    return criteria
+
+def is_partitioned(connection):
+    """
+    Check whether tracking_data is a partitioned table.
+
+    Args:
+        connection (Connection): Database connection
+
+    Returns:
+        bool: True on PostgreSQL once the table has been converted
+    """
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('tracking_data')"
+    )).first() is not None
+
+def partition_days(connection):
+    """
+    List the days covered by the daily partitions of tracking_data.
+
+    Args:
+        connection (Connection): Database connection
+
+    Returns:
+        list: Sorted dates, one per daily partition
+    """
+    names = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'tracking_data'::regclass"
+    )).scalars()
+
+    days = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            days.append(datetime.strptime(match.group(1), '%Y%m%d').date())
+    return sorted(days)
+
+def create_partitions(connection, first_day, last_day):
+    """
+    Create the missing daily partitions between two days, inclusive.
+
+    PostgreSQL refuses to create a partition for a range that the default
+    partition holds rows of, so those rows are moved into the new partition
+    before it is attached.
+
+    Args:
+        connection (Connection): Database connection
+        first_day (date): First day to cover
+        last_day (date): Last day to cover
+
+    Returns:
+        list: Names of the partitions created
+    """
+    existing = set(partition_days(connection))
+    has_default = connection.execute(text("SELECT to_regclass(:name)"), {'name': DEFAULT_PARTITION}).scalar()
+    created = []
+    day = first_day
+    while day <= last_day:
+        if day not in existing:
+            name = f"{PARTITION_PREFIX}{day:%Y%m%d}"
+            bounds = f"FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+            if has_default and _default_has_rows(connection, day):
+                moved = _move_default_rows(connection, name, day, bounds)
+                logger.warning(f"Moved {moved} rows of {day} from {DEFAULT_PARTITION} into {name}")
+            else:
+                connection.exec_driver_sql(f"CREATE TABLE {name} PARTITION OF tracking_data FOR VALUES {bounds}")
+            created.append(name)
+        day += timedelta(days=1)
+    return created
+
+def _default_has_rows(connection, day):
+    """Check whether the default partition holds rows created on a day."""
+    return connection.execute(
+        text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end LIMIT 1"),
+        {'start': day, 'end': day + timedelta(days=1)}
+    ).first() is not None
+
+def _move_default_rows(connection, name, day, bounds):
+    """
+    Create the partition of a day from the rows the default partition holds for it.
+
+    The partition is filled as a standalone table and then attached, which
+    only succeeds once the default partition no longer has rows in its range.
+
+    Args:
+        connection (Connection): Database connection
+        name (str): Name of the new partition
+        day (date): Day covered by the partition
+        bounds (str): FOR VALUES bounds of the partition
+
+    Returns:
+        int: Number of rows moved
+    """
+    connection.exec_driver_sql(f"CREATE TABLE {name} (LIKE tracking_data INCLUDING DEFAULTS)")
+    moved = connection.execute(
+        text(f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+             f"WHERE created_at >= :start AND created_at < :end RETURNING *) "
+             f"INSERT INTO {name} SELECT * FROM moved"),
+        {'start': day, 'end': day + timedelta(days=1)}
+    ).rowcount
+    connection.exec_driver_sql(f"ALTER TABLE tracking_data ATTACH PARTITION {name} FOR VALUES {bounds}")
+    return moved
+
+def drop_partitions(connection, before):
+    """
+    Drop the daily partitions holding only rows older than a time.
+
+    Dropping a partition is a catalog change, so the cost does not depend
+    on the number of rows and leaves no dead tuples behind.
+
+    Args:
+        connection (Connection): Database connection
+        before (datetime): Partitions ending at or before this time are dropped
+
+    Returns:
+        list: Names of the partitions dropped
+    """
+    dropped = []
+    for day in partition_days(connection):
+        if datetime.combine(day + timedelta(days=1), datetime.min.time()) > before:
+            break
+        name = f"{PARTITION_PREFIX}{day:%Y%m%d}"
+        connection.exec_driver_sql(f"DROP TABLE {name}")
+        dropped.append(name)
+    return dropped
+
+def convert_to_partitioned(days_ahead=7):
+    """
+    Rebuild tracking_data as a table range-partitioned by created_at.
+
+    Runs in one transaction. Rows are copied into daily partitions with
+    created_at set to their file's upload time, and the primary key
+    becomes (id, created_at) because PostgreSQL requires the partition key
+    in unique constraints; ids stay unique through the existing sequence.
+    The other indexes and the foreign keys of the table are recreated on
+    the partitioned table.
+
+    Args:
+        days_ahead (int): Future days to create partitions for
+
+    Returns:
+        bool: False if the database is not PostgreSQL or the table is already partitioned
+    """
+    with db.engine.begin() as connection:
+        if connection.dialect.name != 'postgresql' or is_partitioned(connection):
+            return False
+
+        columns = [column['name'] for column in inspect(connection).get_columns('tracking_data')]
+        indexes = connection.execute(text(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = 'tracking_data' AND indexname <> 'tracking_data_pkey'"
+        )).scalars().all()
+        foreign_keys = connection.execute(text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = 'tracking_data'::regclass AND contype = 'f'"
+        )).all()
+        sequence = connection.execute(text("SELECT pg_get_serial_sequence('tracking_data', 'id')")).scalar()
+        first_upload = connection.execute(db.select(db.func.min(UploadedFile.uploaded_at))).scalar()
+
+        connection.exec_driver_sql(
+            "CREATE TABLE tracking_data_partitioned (LIKE tracking_data INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (created_at)"
+        )
+        connection.exec_driver_sql(
+            f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF tracking_data_partitioned DEFAULT"
+        )
+        connection.exec_driver_sql("ALTER TABLE tracking_data RENAME TO tracking_data_unpartitioned")
+        connection.exec_driver_sql("ALTER TABLE tracking_data_partitioned RENAME TO tracking_data")
+
+        today = datetime.utcnow().date()
+        create_partitions(connection, min(first_upload.date(), today) if first_upload else today,
+                          today + timedelta(days=days_ahead))
+
+        column_list = ', '.join(columns)
+        select_list = ', '.join(
+            'COALESCE(u.uploaded_at, t.created_at, now())' if name == 'created_at' else f't.{name}'
+            for name in columns
+        )
+        copied = connection.exec_driver_sql(
+            f"INSERT INTO tracking_data ({column_list}) SELECT {select_list} "
+            f"FROM tracking_data_unpartitioned t JOIN uploaded_files u ON u.id = t.file_id"
+        ).rowcount
+
+        if sequence:
+            connection.exec_driver_sql(f"ALTER SEQUENCE {sequence} OWNED BY tracking_data.id")
+        connection.exec_driver_sql("DROP TABLE tracking_data_unpartitioned")
+
+        connection.exec_driver_sql("ALTER TABLE tracking_data ADD CONSTRAINT tracking_data_pkey PRIMARY KEY (id, created_at)")
+        for name, definition in foreign_keys:
+            connection.exec_driver_sql(f"ALTER TABLE tracking_data ADD CONSTRAINT {name} {definition}")
+        for definition in indexes:
+            connection.exec_driver_sql(definition)
+
+    logger.info(f"Partitioned tracking_data by created_at, copying {copied} rows")
+    return True
+
+def maintain_partitions(retention_hours, days_ahead=7, batch_size=50):
+    """
+    Create upcoming daily partitions and drop expired ones.
+
+    Partitions are dropped once the whole day they cover is past the
+    retention period. The upload records of those days are then purged;
+    their tracking rows are already gone, so the ON DELETE CASCADE finds
+    nothing to delete row by row. Creating, dropping and purging run in
+    separate transactions, and the purge runs even when partition
+    maintenance fails, so expired uploads never outlive a broken partition.
+
+    Args:
+        retention_hours (int): Age in hours after which an upload expires
+        days_ahead (int): Future days to create partitions for
+        batch_size (int): Uploads deleted per transaction by the purge
+
+    Returns:
+        dict: Report with the partitions created and dropped and the
+            purge report, or None if tracking_data is not partitioned
+    """
+    from services.retention_service import RetentionService
+
+    with db.engine.connect() as connection:
+        if not is_partitioned(connection):
+            return None
+
+    today = datetime.utcnow().date()
+    created = []
+    try:
+        with db.engine.begin() as connection:
+            created = create_partitions(connection, today, today + timedelta(days=days_ahead))
+    except Exception:
+        logger.exception("Could not create tracking_data partitions; new rows go to the default partition")
+
+    # Only whole days are dropped, so uploads are kept until their day has expired
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    boundary = datetime.combine(cutoff.date(), datetime.min.time())
+    dropped = []
+    try:
+        with db.engine.begin() as connection:
+            dropped = drop_partitions(connection, boundary)
+    except Exception:
+        logger.exception("Could not drop expired tracking_data partitions; their rows are purged one upload at a time")
+
+    purge = RetentionService.purge_expired(retention_hours, batch_size, cutoff=boundary)
+    logger.info(f"Created partitions {created or 'none'}, dropped partitions {dropped or 'none'}")
+    return {'created': created, 'dropped': dropped, 'purge': purge}
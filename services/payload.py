@@ -0,0 +1,165 @@
+"""
+Pre-serialized API payloads.
+This module writes the unpaginated /api/tracking-data document of an upload once, gzip-compressed,
+next to the upload, so that the API can send it without loading or encoding rows.
+"""
+import os
+import gzip
+import logging
+import tempfile
+import orjson
+from flask import Response, send_file
+from models import db
+from models.tracking import TrackingData
+from services.partitioning import file_rows
+from services.replica import primary_reads
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Fields of the unpaginated API document and the columns they are read from
+PAYLOAD_FIELDS = {
+    'id': TrackingData.id,
+    'placement_name': TrackingData.placement_name,
+    'ad_name': TrackingData.ad_name,
+    'creative_name': TrackingData.creative_name,
+    'click_tag': TrackingData.click_tag_converted
+}
+
+def payload_path(file_path):
+    """
+    Get the payload location for an uploaded file.
+
+    Args:
+        file_path (str): Path of the uploaded file on disk
+
+    Returns:
+        str: Path of the gzip-compressed JSON document
+    """
+    return f"{file_path}.json.gz"
+
+def build_payload(file_id):
+    """
+    Serialize and compress the API document of a file from the database.
+
+    Keys are sorted like jsonify sorts them, and the gzip header carries no
+    timestamp, so the same rows always give the same bytes.
+
+    Args:
+        file_id (int): ID of the uploaded file
+
+    Returns:
+        bytes: gzip-compressed {"data": [...]} document
+    """
+    return _compress(_payload_rows(file_id))
+
+def _payload_rows(file_id):
+    """Read the rows of the API document of a file, ordered by id."""
+    return db.session.execute(
+        db.select(*[column.label(name) for name, column in PAYLOAD_FIELDS.items()])
+        .where(file_rows(file_id))
+        .order_by(TrackingData.id)
+    ).all()
+
+def _compress(rows):
+    """Serialize rows as a {"data": [...]} document and gzip it."""
+    document = orjson.dumps({'data': [row._asdict() for row in rows]}, option=orjson.OPT_SORT_KEYS)
+    return gzip.compress(document, compresslevel=6, mtime=0)
+
+def _write_bytes(data, path):
+    """
+    Atomically write bytes to a file.
+
+    Args:
+        data (bytes): Content to write
+        path (str): Destination path
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_payload(file_id, file_path):
+    """
+    Write the payload of a file from its rows in the current transaction.
+
+    Args:
+        file_id (int): ID of the uploaded file
+        file_path (str): Path of the uploaded file on disk
+
+    Returns:
+        str: Path of the written payload
+    """
+    data = build_payload(file_id)
+    path = payload_path(file_path)
+    _write_bytes(data, path)
+    logger.info(f"Wrote API payload of file {file_id} ({len(data)} bytes)")
+    return path
+
+def remove_payload(file_path):
+    """
+    Remove the payload of a file if it exists.
+
+    Args:
+        file_path (str): Path of the uploaded file on disk
+    """
+    path = payload_path(file_path)
+    if os.path.exists(path):
+        os.remove(path)
+
+def ensure_payload(uploaded_file):
+    """
+    Get the payload of a file, rebuilding it from the database when it is missing.
+
+    The rebuild reads from the primary, since the payload is kept for good,
+    and an empty result is not written: ingest always writes the payload, so
+    a missing one with no rows is more likely a failed read than an empty file.
+
+    Args:
+        uploaded_file (UploadedFile): File whose payload is served
+
+    Returns:
+        str: Path of the payload, or None when it was not written
+    """
+    path = payload_path(uploaded_file.file_path)
+    if os.path.exists(path):
+        return path
+
+    with primary_reads():
+        rows = _payload_rows(uploaded_file.id)
+    if not rows:
+        logger.warning(f"Not rebuilding the API payload of file {uploaded_file.id}: no rows found")
+        return None
+
+    try:
+        _write_bytes(_compress(rows), path)
+        logger.info(f"Rebuilt API payload of file {uploaded_file.id}")
+        return path
+    except OSError as e:
+        logger.error(f"Could not write API payload of file {uploaded_file.id}: {str(e)}")
+        return None
+
+def payload_response(path, gzip_encoded):
+    """
+    Send a payload, as stored when the client accepts gzip, decompressed otherwise.
+
+    Args:
+        path (str): Path of the payload
+        gzip_encoded (bool): Whether to send it with Content-Encoding: gzip
+
+    Returns:
+        Response: JSON response
+    """
+    if gzip_encoded:
+        response = send_file(path, mimetype='application/json', etag=False, conditional=False)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        with open(path, 'rb') as f:
+            response = Response(gzip.decompress(f.read()), mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    return response
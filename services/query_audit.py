@@ -0,0 +1,110 @@
+"""
+Query plan audit.
+This module runs EXPLAIN on the application's hot queries and flags sequential scans.
+"""
+import re
+import logging
+from datetime import datetime, timedelta
+from models import db
+from models.job import IngestJob
+from models.tracking import UploadedFile, TrackingData
+from services.partitioning import file_rows
+from services.tracking_service import TrackingService
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# SQLite reports a full table scan as "SCAN <table>", without "USING ... INDEX"
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+# PostgreSQL reports a full table scan as "Seq Scan on <table>"
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+def hot_queries():
+    """
+    Build the queries run on every page view, API call or scheduled task.
+
+    Parameter values are placeholders; only the plans matter.
+
+    Returns:
+        list: (name, statement) pairs
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=24)
+    return [
+        ('tracking data of a file', TrackingService._api_query(1)),
+        ('tracking data page', TrackingService._api_query(1).where(TrackingData.id > 100).limit(101)),
+        ('rows of a file missing an impression tag', TrackingService._api_query(1, filters={'has_imp_tag': False})),
+        ('delete tracking data of a file', db.delete(TrackingData).where(file_rows(1))),
+        ('expired files', db.select(UploadedFile.id, UploadedFile.file_path)
+            .where(UploadedFile.uploaded_at < cutoff)
+            .order_by(UploadedFile.uploaded_at)
+            .limit(50)),
+        ('uploads of a user', db.select(UploadedFile)
+            .where(UploadedFile.uploaded_by == 1)
+            .order_by(UploadedFile.uploaded_at.desc())),
+        ('upload by checksum', db.select(UploadedFile)
+            .where(UploadedFile.checksum == '0' * 64)
+            .order_by(UploadedFile.uploaded_at.desc())
+            .limit(1)),
+        ('queued ingestion jobs', db.select(IngestJob.id)
+            .where(IngestJob.status == 'queued')
+            .order_by(IngestJob.created_at)),
+    ]
+
+def explain(connection, statement):
+    """
+    Get the plan of a statement and the tables it scans sequentially.
+
+    Args:
+        connection (Connection): Database connection
+        statement: SQLAlchemy statement to explain
+
+    Returns:
+        tuple: (plan, seq_scans) lists of plan lines and scanned table names
+    """
+    compiled = statement.compile(dialect=connection.dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+        plan = [row[-1] for row in rows]
+        pattern = SQLITE_FULL_SCAN
+    else:
+        rows = connection.exec_driver_sql(f"EXPLAIN {compiled}", params).all()
+        plan = [row[0] for row in rows]
+        pattern = POSTGRES_SEQ_SCAN
+
+    seq_scans = []
+    for line in plan:
+        match = pattern.search(line.strip())
+        if match:
+            seq_scans.append(match.group(1))
+    return plan, seq_scans
+
+def audit_queries():
+    """
+    Explain every hot query.
+
+    On PostgreSQL sequential scans are disabled for the audit transaction,
+    so small development tables, which the planner would rather scan, are
+    only flagged when no index can serve the query.
+
+    Returns:
+        list: Dictionaries with the query name, plan lines and seq_scans
+    """
+    results = []
+    with db.engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+
+        for name, statement in hot_queries():
+            plan, seq_scans = explain(connection, statement)
+            results.append({'name': name, 'plan': plan, 'seq_scans': seq_scans})
+            if seq_scans:
+                logger.warning(f"Query '{name}' scans {', '.join(seq_scans)} sequentially")
+
+        connection.rollback()
+    return results
@@ -0,0 +1,92 @@
+"""
+Read replica routing.
+This module configures the optional read replica and decides when the session may read from it.
+"""
+import time
+import logging
+from contextlib import contextmanager
+from flask import current_app, has_request_context, request, session as flask_session
+from sqlalchemy import event
+from models import db
+from models.session import RoutingSession, REPLICA_BIND
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Browser session key holding the time until which its reads stay on the primary
+STICKY_SESSION_KEY = 'db_primary_until'
+
+def init_replica(app):
+    """
+    Add the read replica bind and send the reads of GET requests to it.
+
+    Must run before db.init_app. Does nothing unless REPLICA_DATABASE_URI is set.
+
+    Args:
+        app (Flask): Flask application instance
+    """
+    uri = app.config.get('REPLICA_DATABASE_URI')
+    if not uri:
+        return
+
+    app.config['SQLALCHEMY_BINDS'] = dict(app.config.get('SQLALCHEMY_BINDS') or {}, **{REPLICA_BIND: uri})
+    logger.info("Reads of GET requests are sent to the read replica")
+
+    @app.before_request
+    def read_from_replica():
+        if request.method in ('GET', 'HEAD'):
+            db.session.info['replica_reads'] = replica_allowed()
+
+def replica_allowed():
+    """
+    Check whether the current reads may come from the replica.
+
+    Only requests read from the replica. A browser session that committed
+    changes reads from the primary for REPLICA_STICKY_SECONDS, so it sees its
+    own upload even if the replica lags. The CLI, the scheduler and ingest
+    workers act on data they may have just written, so outside a request
+    reads stay on the primary.
+
+    Returns:
+        bool: False outside requests and while the browser session is sticky to the primary
+    """
+    if has_request_context():
+        return flask_session.get(STICKY_SESSION_KEY, 0) <= time.time()
+    return False
+
+@contextmanager
+def replica_reads():
+    """
+    Send the reads of the current session to the replica within the block.
+
+    Also usable as a decorator, as ``@replica_reads()``.
+    """
+    session = db.session()
+    previous = session.info.get('replica_reads', False)
+    session.info['replica_reads'] = previous or replica_allowed()
+    try:
+        yield
+    finally:
+        session.info['replica_reads'] = previous
+
+@contextmanager
+def primary_reads():
+    """
+    Send the reads of the current session to the primary within the block.
+
+    For reads whose results are persisted, like rebuilt payloads, which must
+    not capture the state of a lagging replica.
+    """
+    session = db.session()
+    previous = session.info.get('replica_reads', False)
+    session.info['replica_reads'] = False
+    try:
+        yield
+    finally:
+        session.info['replica_reads'] = previous
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_to_primary(session):
+    """Keep the browser session that committed changes on the primary for a while."""
+    if session.info.get('wrote') and has_request_context() and current_app.config.get('REPLICA_DATABASE_URI'):
+        flask_session[STICKY_SESSION_KEY] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
@@ -0,0 +1,146 @@
+"""
+Upload retention service.
+This module purges expired uploads and their tracking data from the database and disk.
+"""
+import time
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db
+from models.job import IngestJob
+from models.tracking import UploadedFile, TrackingData
+from services.tag_dictionary import prune_tags
+from services.tracking_service import TrackingService
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+class RetentionService:
+    """
+    Service class for the upload retention policy.
+    Deletes expired uploads in bounded batches with one short transaction per batch.
+    """
+
+    @staticmethod
+    def purge_expired(retention_hours, batch_size=50, cutoff=None, row_batch_size=None):
+        """
+        Delete uploads older than the retention period.
+
+        Expired files are processed oldest first, batch_size files at a
+        time. Their tracking rows are deleted first, at most row_batch_size
+        rows per transaction, so no transaction grows with the size of the
+        uploads; the upload records then go in one short transaction. An
+        interrupted purge leaves expired uploads with part of their rows,
+        which the next run finishes. Nothing is loaded into the ORM session.
+
+        Args:
+            retention_hours (int): Age in hours after which an upload expires
+            batch_size (int): Uploads deleted per transaction
+            cutoff (datetime): Purge uploads older than this time instead
+                of applying retention_hours
+            row_batch_size (int): Tracking rows deleted per transaction,
+                RETENTION_ROW_BATCH_SIZE by default
+
+        Returns:
+            dict: Report with files, tracking_rows, tags, jobs, bytes_reclaimed,
+                batches and seconds
+        """
+        if cutoff is None:
+            cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+        batch_size = max(int(batch_size), 1)
+        if row_batch_size is None:
+            row_batch_size = current_app.config['RETENTION_ROW_BATCH_SIZE']
+        row_batch_size = max(int(row_batch_size), 1)
+        report = {'files': 0, 'tracking_rows': 0, 'tags': 0, 'jobs': 0, 'bytes_reclaimed': 0, 'batches': 0}
+        start = time.perf_counter()
+
+        while True:
+            batch = db.session.execute(
+                db.select(UploadedFile.id, UploadedFile.file_path)
+                .where(UploadedFile.uploaded_at < cutoff)
+                .order_by(UploadedFile.uploaded_at)
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                break
+
+            file_ids = [row.id for row in batch]
+            report['tracking_rows'] += RetentionService._delete_tracking_rows(file_ids, row_batch_size)
+            try:
+                report['tracking_rows'] += TrackingService.delete_records(file_ids)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+            report['files'] += len(file_ids)
+            report['batches'] += 1
+
+            # Remove the files only once their records are gone
+            for row in batch:
+                report['bytes_reclaimed'] += TrackingService.remove_upload_files(row.file_path)
+
+            if len(batch) < batch_size:
+                break
+
+        # Tags are shared between uploads, so only unreferenced ones can go
+        try:
+            report['tags'] = prune_tags()
+            db.session.commit()
+        except Exception as e:
+            # A concurrent upload may have just referenced one; the next run retries
+            db.session.rollback()
+            report['tags'] = 0
+            logger.warning(f"Could not prune tracking tags: {str(e)}")
+
+        # Finished jobs only matter while their upload is being polled
+        report['jobs'] = db.session.execute(
+            db.delete(IngestJob)
+            .where(IngestJob.status.in_(['completed', 'failed']), IngestJob.finished_at < cutoff)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+
+        report['seconds'] = round(time.perf_counter() - start, 3)
+        logger.info(
+            f"Retention purge removed {report['files']} files, {report['tracking_rows']} tracking rows, "
+            f"{report['tags']} tags and {report['jobs']} jobs in {report['batches']} batches, "
+            f"reclaiming {report['bytes_reclaimed']} bytes in {report['seconds']}s"
+        )
+        return report
+
+    @staticmethod
+    def _delete_tracking_rows(file_ids, row_batch_size):
+        """
+        Delete the tracking rows of uploads in id order, one transaction per chunk.
+
+        Each chunk is located through the (file_id, id) index, so every
+        transaction deletes and locks at most row_batch_size rows.
+
+        Args:
+            file_ids (list): IDs of the uploads whose rows are deleted
+            row_batch_size (int): Rows deleted per transaction
+
+        Returns:
+            int: Number of tracking rows deleted
+        """
+        deleted = 0
+        while True:
+            chunk = (db.select(TrackingData.id)
+                     .where(TrackingData.file_id.in_(file_ids))
+                     .order_by(TrackingData.id)
+                     .limit(row_batch_size)
+                     .scalar_subquery())
+            try:
+                count = db.session.execute(
+                    db.delete(TrackingData)
+                    .where(TrackingData.id.in_(chunk))
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            deleted += count
+            if count < row_batch_size:
+                return deleted
@@ -0,0 +1,123 @@
+"""
+Indexed search over tracking data.
+This module maintains the database search indexes and builds ranked search queries.
+"""
+import logging
+from flask import current_app
+from sqlalchemy import DDL, event, table, column, literal, literal_column, text
+from sqlalchemy.exc import OperationalError
+from models import db
+from models.tracking import TrackingData
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Columns matched by a search
+SEARCH_COLUMNS = ['placement_name', 'ad_name', 'creative_name', 'campaign_id']
+
+# SQLite FTS5 table indexing SEARCH_COLUMNS of tracking_data
+FTS_TABLE = 'tracking_data_fts'
+
+# Shortest term the trigram tokenizer can match; shorter terms fall back to LIKE
+MIN_TRIGRAM_TERM_LENGTH = 3
+
+# External-content FTS5 table kept in sync with tracking_data by triggers.
+# The trigram tokenizer matches arbitrary substrings, like the LIKE search it replaces.
+SQLITE_SEARCH_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"placement_name, ad_name, creative_name, campaign_id, "
+    f"content='tracking_data', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON tracking_data BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, placement_name, ad_name, creative_name, campaign_id) "
+    f"VALUES (new.id, new.placement_name, new.ad_name, new.creative_name, new.campaign_id); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON tracking_data BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, placement_name, ad_name, creative_name, campaign_id) "
+    f"VALUES ('delete', old.id, old.placement_name, old.ad_name, old.creative_name, old.campaign_id); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE ON tracking_data BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, placement_name, ad_name, creative_name, campaign_id) "
+    f"VALUES ('delete', old.id, old.placement_name, old.ad_name, old.creative_name, old.campaign_id); "
+    f"INSERT INTO {FTS_TABLE}(rowid, placement_name, ad_name, creative_name, campaign_id) "
+    f"VALUES (new.id, new.placement_name, new.ad_name, new.creative_name, new.campaign_id); END",
+]
+
+# Dropping tracking_data removes the triggers but not the FTS table
+event.listen(
+    TrackingData.__table__, 'after_drop',
+    DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect='sqlite')
+)
+
+def ensure_search_index():
+    """
+    Prepare the search index supported by the database.
+
+    On SQLite the FTS5 table and its triggers are created when missing and
+    filled from tracking_data. On PostgreSQL the pg_trgm GIN indexes are
+    created by the migrations; this only checks that the extension exists.
+
+    Returns:
+        str: Search strategy to use: 'fts5', 'trigram' or 'like'
+    """
+    engine = db.engine
+
+    if engine.dialect.name == 'sqlite':
+        try:
+            with engine.begin() as connection:
+                exists = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': FTS_TABLE}
+                ).first()
+                for statement in SQLITE_SEARCH_DDL:
+                    connection.exec_driver_sql(statement)
+                if not exists:
+                    connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            return 'fts5'
+        except OperationalError as e:
+            logger.warning(f"SQLite full-text search is unavailable, falling back to LIKE: {str(e)}")
+            return 'like'
+
+    if engine.dialect.name == 'postgresql':
+        with engine.connect() as connection:
+            installed = connection.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first()
+        if installed:
+            return 'trigram'
+        logger.warning("pg_trgm is not installed, run 'flask db upgrade' to enable indexed search")
+
+    return 'like'
+
+def _escape_like(term):
+    """Escape LIKE wildcards in a search term."""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search_matches(term):
+    """
+    Build a subquery of tracking data matching a search term.
+
+    Every strategy matches case-insensitive substrings of SEARCH_COLUMNS.
+    FTS5 ranks with bm25, pg_trgm with word similarity; the LIKE fallback
+    does not rank.
+
+    Args:
+        term (str): Search term
+
+    Returns:
+        Subquery: Columns id and rank, where a lower rank is more relevant
+    """
+    strategy = current_app.extensions.get('tracking_search', 'like')
+    columns = [getattr(TrackingData, name) for name in SEARCH_COLUMNS]
+
+    if strategy == 'fts5' and len(term) >= MIN_TRIGRAM_TERM_LENGTH:
+        fts = table(FTS_TABLE, column('rowid'), column('rank'))
+        phrase = '"' + term.replace('"', '""') + '"'
+        return (db.select(fts.c.rowid.label('id'), fts.c.rank.label('rank'))
+                .where(literal_column(FTS_TABLE).op('MATCH')(phrase))
+                .subquery())
+
+    if strategy == 'trigram':
+        pattern = f"%{_escape_like(term)}%"
+        similarity = db.func.greatest(*[db.func.word_similarity(term, column) for column in columns])
+        return (db.select(TrackingData.id, (-similarity).label('rank'))
+                .where(db.or_(*[column.ilike(pattern, escape='\\') for column in columns]))
+                .subquery())
+
+    return (db.select(TrackingData.id, literal(0).label('rank'))
+            .where(db.or_(*[db.func.lower(column).contains(term.lower(), autoescape=True) for column in columns]))
+            .subquery())
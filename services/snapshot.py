@@ -0,0 +1,157 @@
+"""
+Columnar snapshots of tracking data.
+This module writes the converted rows of an upload to an Arrow IPC file next to it
+and serves memory-mapped slices of that file to the read endpoints.
+"""
+import os
+import logging
+import tempfile
+import pyarrow as pa
+from models import db
+from models.tracking import TrackingData
+from services.partitioning import file_rows
+from services.replica import primary_reads
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# TrackingData columns stored in a snapshot, in order
+SNAPSHOT_COLUMNS = [
+    'id', 'placement_name', 'ad_name', 'creative_name',
+    'click_tag', 'click_tag_converted',
+    'imp_tag', 'imp_tag_converted',
+    'third_party_tracking', 'third_party_converted'
+]
+
+SNAPSHOT_SCHEMA = pa.schema(
+    [pa.field('id', pa.int64(), nullable=False)] +
+    [pa.field(name, pa.string()) for name in SNAPSHOT_COLUMNS[1:]]
+)
+
+def snapshot_path(file_path):
+    """
+    Get the snapshot location for an uploaded file.
+
+    Args:
+        file_path (str): Path of the uploaded file on disk
+
+    Returns:
+        str: Path of the Arrow IPC snapshot
+    """
+    return f"{file_path}.arrow"
+
+def build_snapshot(file_id):
+    """
+    Build the snapshot table of a file from the database.
+
+    Args:
+        file_id (int): ID of the uploaded file
+
+    Returns:
+        pyarrow.Table: Tracking rows of the file ordered by id
+    """
+    columns = [getattr(TrackingData, name) for name in SNAPSHOT_COLUMNS]
+    rows = (db.session.query(*columns)
+            .filter(file_rows(file_id))
+            .order_by(TrackingData.id)
+            .all())
+
+    values = list(zip(*rows)) if rows else [()] * len(SNAPSHOT_COLUMNS)
+    arrays = [pa.array(values[0], type=pa.int64())]
+    for column in values[1:]:
+        arrays.append(pa.array([None if value is None else str(value) for value in column], type=pa.string()))
+    return pa.Table.from_arrays(arrays, schema=SNAPSHOT_SCHEMA)
+
+def _write_table(table, path):
+    """
+    Atomically write a table as an uncompressed Arrow IPC file.
+
+    Args:
+        table (pyarrow.Table): Table to write
+        path (str): Destination path
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_snapshot(file_id, file_path):
+    """
+    Write the snapshot of a file from its rows in the current transaction.
+
+    Args:
+        file_id (int): ID of the uploaded file
+        file_path (str): Path of the uploaded file on disk
+
+    Returns:
+        pyarrow.Table: The written table
+    """
+    table = build_snapshot(file_id)
+    _write_table(table, snapshot_path(file_path))
+    logger.info(f"Wrote snapshot of file {file_id} with {table.num_rows} rows")
+    return table
+
+def remove_snapshot(file_path):
+    """
+    Remove the snapshot of a file if it exists.
+
+    Args:
+        file_path (str): Path of the uploaded file on disk
+    """
+    path = snapshot_path(file_path)
+    if os.path.exists(path):
+        os.remove(path)
+
+def read_snapshot(uploaded_file, columns=None, start=0, stop=None):
+    """
+    Read tracking rows of a file from its memory-mapped snapshot.
+
+    The IPC file is uncompressed, so opening it maps the columns without
+    copying and projections and row ranges are zero-copy slices. The
+    database stays the source of truth: a missing, unreadable or outdated
+    snapshot is rebuilt from TrackingData on the primary. A rebuild without
+    rows is served but not written, like rebuilt API payloads.
+
+    Args:
+        uploaded_file (UploadedFile): File whose rows are read
+        columns (list): Columns to return, all SNAPSHOT_COLUMNS by default
+        start (int): Index of the first row
+        stop (int): Index after the last row, or None for all remaining rows
+
+    Returns:
+        pyarrow.Table: Selected rows and columns
+    """
+    path = snapshot_path(uploaded_file.file_path)
+    table = None
+
+    try:
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        if not table.schema.equals(SNAPSHOT_SCHEMA):
+            logger.warning(f"Snapshot of file {uploaded_file.id} has an outdated schema")
+            table = None
+    except (OSError, pa.ArrowInvalid) as e:
+        logger.warning(f"Snapshot of file {uploaded_file.id} is not readable: {str(e)}")
+
+    if table is None:
+        with primary_reads():
+            table = build_snapshot(uploaded_file.id)
+        if table.num_rows == 0:
+            logger.warning(f"Not writing the rebuilt snapshot of file {uploaded_file.id}: no rows found")
+        else:
+            try:
+                _write_table(table, path)
+                logger.info(f"Rebuilt snapshot of file {uploaded_file.id}")
+            except OSError as e:
+                logger.error(f"Could not write snapshot of file {uploaded_file.id}: {str(e)}")
+
+    if columns:
+        table = table.select(columns)
+    length = None if stop is None else max(stop - start, 0)
+    return table.slice(start, length)
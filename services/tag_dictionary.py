@@ -0,0 +1,103 @@
+"""
+Tracking tag dictionary.
+This module interns tag texts into the content-addressed tracking_tags table and prunes unused ones.
+"""
+import logging
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db
+from models.tracking import TrackingData, TrackingTag, TAG_COLUMNS
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+def intern_tags(values, batch_size=1000):
+    """
+    Get the dictionary ids of tag texts, adding the missing ones.
+
+    Texts are upserted by digest in batches within the current session
+    transaction. Batches are sorted by digest so that concurrent uploads
+    lock dictionary rows in the same order. On PostgreSQL the upsert locks
+    existing rows until the transaction ends, so prune_tags cannot remove
+    a tag that an ingest in progress is about to reference.
+
+    Args:
+        values (iterable): Tag texts, may contain duplicates
+        batch_size (int): Texts upserted per statement
+
+    Returns:
+        dict: Tag text to TrackingTag id
+    """
+    digests = {}
+    for value in values:
+        if value not in digests:
+            digests[value] = TrackingTag.digest_of(value)
+
+    by_digest = sorted((digest, value) for value, digest in digests.items())
+    connection = db.session.connection()
+    ids = {}
+
+    batch_size = max(int(batch_size), 1)
+    for start in range(0, len(by_digest), batch_size):
+        batch = [{'digest': digest, 'value': value} for digest, value in by_digest[start:start + batch_size]]
+
+        if connection.dialect.name == 'postgresql':
+            statement = postgresql.insert(TrackingTag.__table__).values(batch)
+            rows = connection.execute(
+                statement.on_conflict_do_update(index_elements=['digest'], set_={'digest': statement.excluded.digest})
+                .returning(TrackingTag.__table__.c.id, TrackingTag.__table__.c.digest)
+            )
+        else:
+            connection.execute(
+                sqlite.insert(TrackingTag.__table__).values(batch).on_conflict_do_nothing(index_elements=['digest'])
+            )
+            rows = connection.execute(
+                db.select(TrackingTag.__table__.c.id, TrackingTag.__table__.c.digest)
+                .where(TrackingTag.__table__.c.digest.in_([row['digest'] for row in batch]))
+            )
+
+        ids.update({digest: tag_id for tag_id, digest in rows})
+
+    return {value: ids[digest] for value, digest in digests.items()}
+
+def intern_rows(rows, batch_size=1000):
+    """
+    Replace the tag texts of tracking records with dictionary references.
+
+    Args:
+        rows (list): Records from process_excel_file, modified in place
+        batch_size (int): Texts upserted per statement
+
+    Returns:
+        list: The same records, with <tag>_id keys instead of the TAG_COLUMNS texts
+    """
+    tag_ids = intern_tags(
+        (row[name] for row in rows for name in TAG_COLUMNS if row.get(name) is not None),
+        batch_size
+    )
+    for row in rows:
+        for name in TAG_COLUMNS:
+            value = row.pop(name, None)
+            row[f'{name}_id'] = tag_ids[value] if value is not None else None
+    return rows
+
+def prune_tags():
+    """
+    Delete dictionary entries no tracking row refers to.
+
+    Each tag is probed with one NOT EXISTS per reference column, which the
+    index on that column answers without scanning tracking_data.
+    Runs in the current session transaction; the caller commits.
+
+    Returns:
+        int: Number of tags deleted
+    """
+    references = [getattr(TrackingData, f'{name}_id') for name in TAG_COLUMNS]
+    unused = [~db.exists().where(column == TrackingTag.id) for column in references]
+
+    deleted = db.session.execute(
+        db.delete(TrackingTag)
+        .where(*unused)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    logger.info(f"Pruned {deleted} unused tracking tags")
+    return deleted
@@ -3,17 +3,59 @@ Tracking data service.
 This module handles business logic for tracking data operations.
 """
 import os
+import time
 import logging
-from datetime import datetime
+import orjson
+from datetime import datetime, timedelta
 from flask import current_app
 from werkzeug.utils import secure_filename
 from models import db
-from models.tracking import UploadedFile, TrackingData
+from models.job import IngestJob
+from models.tracking import UploadedFile, TrackingData, UploadSummary, TAG_COLUMNS, TAG_PRESENCE_COLUMNS, tag_present
 from utils import allowed_file, save_uploaded_file, validate_excel_file, process_excel_file
+from services.bulk_insert import bulk_insert
+from services.fragment_cache import fragment_cache
+from services.partitioning import file_rows
+from services.replica import replica_reads
+from services.search import search_matches
+from services.tag_dictionary import intern_rows
+from services.payload import payload_path, write_payload, remove_payload
+from services.snapshot import SNAPSHOT_COLUMNS, snapshot_path, write_snapshot, read_snapshot, remove_snapshot
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
+# Fields exposed by the tracking data API and the columns they are read from
+TRACKING_API_FIELDS = {
+    'id': TrackingData.id,
+    'placement_name': TrackingData.placement_name,
+    'ad_name': TrackingData.ad_name,
+    'creative_name': TrackingData.creative_name,
+    'click_tag': TrackingData.click_tag_converted,
+    'imp_tag': TrackingData.imp_tag_converted,
+    'third_party_tag': TrackingData.third_party_converted,
+    'has_click_tag': TrackingData.click_tag_present,
+    'has_imp_tag': TrackingData.imp_tag_present,
+    'has_third_party_tag': TrackingData.third_party_present
+}
+
+# Fields returned when the API request does not select any
+DEFAULT_API_FIELDS = ['id', 'placement_name', 'ad_name', 'creative_name', 'click_tag']
+
+# Query-string filters of the tracking data API and the columns they match
+TRACKING_API_FILTERS = {
+    'placement': TrackingData.placement_name,
+    'ad': TrackingData.ad_name,
+    'creative': TrackingData.creative_name
+}
+
+# Query-string tag presence filters of the tracking data API and the flags they match
+TRACKING_API_FLAGS = {
+    'has_click_tag': TrackingData.click_tag_present,
+    'has_imp_tag': TrackingData.imp_tag_present,
+    'has_third_party_tag': TrackingData.third_party_present
+}
+
 class TrackingService:
     """
     Service class for tracking data operations.
@@ -46,13 +88,23 @@ class TrackingService:
         result = save_uploaded_file(file, current_app.config['UPLOAD_FOLDER'], allowed_extensions)
         
         if result[0] is None:
-            return False, result[1]
+            return False, result[2]
         
-        filepath, new_filename = result
+        filepath, new_filename, checksum = result
         
         try:
+            # Reuse the results of an identical file instead of parsing it again
+            duplicate = TrackingService.find_duplicate(checksum, user_id)
+            
+            if duplicate:
+                os.remove(filepath)
+                logger.info(f"File {file.filename} matches already processed file {duplicate.id}")
+                return True, duplicate.id
+            
             # Validate Excel file
-            validation_result = validate_excel_file(filepath)
+            read_start = time.perf_counter()
+            validation_result = validate_excel_file(filepath, current_app.config['HEADER_SCAN_ROWS'])
+            read_seconds = time.perf_counter() - read_start
             
             if not validation_result[0]:
                 # If validation fails, delete the file and return error
@@ -69,51 +121,130 @@ class TrackingService:
                 file_path=filepath,
                 file_size=file_size,
                 file_type=file_type,
+                checksum=checksum,
                 uploaded_by=user_id
             )
-            db.session.add(uploaded_file)
-            db.session.commit()
             
-            # Process Excel data
+            # Process Excel data and save everything in one transaction
             df = validation_result[1]
-            tracking_data = process_excel_file(df, uploaded_file.id)
-            
-            # Save tracking data to database
-            for data in tracking_data:
-                tracking_item = TrackingData(**data)
-                db.session.add(tracking_item)
-            
-            db.session.commit()
+            row_count = TrackingService.ingest(uploaded_file, df, read_seconds=read_seconds)
             
-            logger.info(f"Successfully processed file {new_filename} with {len(tracking_data)} tracking items")
+            logger.info(f"Successfully processed file {new_filename} with {row_count} tracking items")
             return True, uploaded_file.id
             
         except Exception as e:
             logger.exception(f"Error processing file {new_filename}: {str(e)}")
+            db.session.rollback()
             
             # Clean up on error
             if os.path.exists(filepath):
                 os.remove(filepath)
-                
-            # Clean up database records if they were created
-            try:
-                if 'uploaded_file' in locals() and uploaded_file.id:
-                    TrackingData.query.filter_by(file_id=uploaded_file.id).delete()
-                    db.session.delete(uploaded_file)
-                    db.session.commit()
-            except Exception as db_error:
-                logger.error(f"Error cleaning up database records: {str(db_error)}")
-                db.session.rollback()
+            remove_snapshot(filepath)
+            remove_payload(filepath)
                 
             return False, f"Error processing file: {str(e)}"
     
     @staticmethod
-    def get_tracking_data(file_id):
+    def find_duplicate(checksum, user_id):
+        """
+        Find an already processed upload of the same user with identical contents.
+        
+        Files are only recorded once their tracking data has been saved, so
+        a match can be shown directly without parsing the new upload. Only
+        the user's own uploads that the retention purge has not reached yet
+        match, so deleting or expiring another upload never removes the
+        results a user was sent to.
+        
+        Args:
+            checksum: SHA-256 hex digest of the new upload
+            user_id: ID of the user uploading the file
+            
+        Returns:
+            UploadedFile: The most recent matching upload, or None
+        """
+        if not checksum:
+            return None
+        
+        query = UploadedFile.query.filter_by(checksum=checksum, uploaded_by=user_id)
+        
+        retention_hours = current_app.config['UPLOAD_RETENTION_HOURS']
+        if retention_hours > 0:
+            query = query.filter(UploadedFile.uploaded_at >= datetime.utcnow() - timedelta(hours=retention_hours))
+        
+        return query.order_by(UploadedFile.uploaded_at.desc()).first()
+    
+    @staticmethod
+    def ingest(uploaded_file, df, commit=True, read_seconds=0.0):
+        """
+        Persist an uploaded file record and its tracking data.
+        
+        The file record and all tracking rows are written in a single
+        transaction using the bulk insert path, together with an
+        UploadSummary of the rows, so a failed upload leaves nothing behind.
+        The caller is responsible for rolling back on error.
+        When TRACKING_SNAPSHOTS is enabled, a columnar snapshot of the rows
+        is also written next to the file for the read endpoints, and when
+        API_PAYLOADS is enabled, the compressed unpaginated API document.
+        
+        Args:
+            uploaded_file: New UploadedFile record (not yet added to the session)
+            df: Validated DataFrame returned by validate_excel_file
+            commit: Commit the transaction; pass False to add more changes to it
+            read_seconds: Time spent reading and validating the workbook, which
+                the summary's parse_seconds includes
+            
+        Returns:
+            int: Number of tracking rows inserted
+        """
+        if uploaded_file.file_size is None and os.path.exists(uploaded_file.file_path):
+            uploaded_file.file_size = os.path.getsize(uploaded_file.file_path)
+        db.session.add(uploaded_file)
+        db.session.flush()
+        
+        start = time.perf_counter()
+        tracking_data = process_excel_file(df, uploaded_file.id, current_app.config['COLUMNAR_EXCEL_PROCESSING'])
+        parse_seconds = read_seconds + time.perf_counter() - start
+        db.session.add(UploadSummary.from_rows(uploaded_file, tracking_data, len(df), parse_seconds))
+        
+        # Rows carry the upload time so that they share the file's partition
+        for row in tracking_data:
+            row['created_at'] = uploaded_file.uploaded_at
+            for flag, name in TAG_PRESENCE_COLUMNS.items():
+                row[flag] = tag_present(row.get(name))
+        intern_rows(tracking_data, current_app.config['BULK_INSERT_BATCH_SIZE'])
+        row_count = bulk_insert(TrackingData.__table__, tracking_data, current_app.config['BULK_INSERT_BATCH_SIZE'])
+        
+        if current_app.config['TRACKING_SNAPSHOTS']:
+            try:
+                write_snapshot(uploaded_file.id, uploaded_file.file_path)
+            except Exception as e:
+                # Reads rebuild missing snapshots, so this must not fail the upload
+                logger.warning(f"Could not write snapshot of file {uploaded_file.id}: {str(e)}")
+        
+        if current_app.config['API_PAYLOADS']:
+            try:
+                write_payload(uploaded_file.id, uploaded_file.file_path)
+            except Exception as e:
+                # The API rebuilds missing payloads, so this must not fail the upload
+                logger.warning(f"Could not write API payload of file {uploaded_file.id}: {str(e)}")
+        
+        if commit:
+            db.session.commit()
+        return row_count
+    
+    @staticmethod
+    @replica_reads()
+    def get_tracking_data(file_id, tags=()):
         """
         Get tracking data for a specific file.
         
+        Reads without autoflush. Only the tags named in tags are joined from
+        the tracking_tags dictionary; the others load on first access, once
+        per distinct tag.
+        
         Args:
             file_id: ID of the uploaded file
+            tags: Tag attributes from TAG_COLUMNS to load with the rows
             
         Returns:
             tuple: (success, result) where:
@@ -123,14 +254,17 @@ class TrackingService:
         if not file_id:
             return False, "No file selected"
         
-        # Get the uploaded file record
-        uploaded_file = UploadedFile.query.get(file_id)
-        
-        if not uploaded_file:
-            return False, "File not found"
+        joined = [db.joinedload(getattr(TrackingData, f'{name}_ref')) for name in TAG_COLUMNS if name in tags]
         
-        # Get tracking data for this file
-        tracking_items = TrackingData.query.filter_by(file_id=file_id).all()
+        with db.session.no_autoflush:
+            # Get the uploaded file record
+            uploaded_file = UploadedFile.query.get(file_id)
+            
+            if not uploaded_file:
+                return False, "File not found"
+            
+            # Get tracking data for this file
+            tracking_items = TrackingData.query.options(*joined).filter(file_rows(file_id)).all()
         
         if not tracking_items:
             return False, "No tracking data found for this file"
@@ -138,6 +272,177 @@ class TrackingService:
         return True, (uploaded_file, tracking_items)
     
     @staticmethod
+    @replica_reads()
+    def get_tracking_rows(uploaded_file, columns=None, start=0, stop=None):
+        """
+        Get converted tracking rows of a file as dictionaries.
+        
+        Rows are served from the file's memory-mapped snapshot when
+        TRACKING_SNAPSHOTS is enabled, otherwise straight from the database.
+        
+        Args:
+            uploaded_file: UploadedFile whose rows are read
+            columns: Columns to return, all snapshot columns by default
+            start: Index of the first row
+            stop: Index after the last row, or None for all remaining rows
+            
+        Returns:
+            list: Row dictionaries ordered by id
+        """
+        if current_app.config['TRACKING_SNAPSHOTS']:
+            return read_snapshot(uploaded_file, columns, start, stop).to_pylist()
+        
+        query = (db.session.query(*[getattr(TrackingData, name) for name in columns or SNAPSHOT_COLUMNS])
+                 .filter(file_rows(uploaded_file.id))
+                 .order_by(TrackingData.id)
+                 .offset(start))
+        if stop is not None:
+            query = query.limit(max(stop - start, 0))
+        
+        return [row._asdict() for row in query]
+    
+    @staticmethod
+    @replica_reads()
+    def get_tracking_page(file_id, fields=None, cursor=None, limit=100, filters=None):
+        """
+        Get one keyset-paginated page of tracking data for the API.
+        
+        Only the selected columns are loaded, and pages are found with
+        ``id > cursor`` rather than an OFFSET, so each page costs the same
+        however deep into the file it is.
+        
+        Args:
+            file_id: ID of the uploaded file
+            fields: Names from TRACKING_API_FIELDS to return (id is always included)
+            cursor: next_cursor of the previous page, or None for the first page
+            limit: Maximum number of rows in the page
+            filters: Case-insensitive substrings keyed by TRACKING_API_FILTERS name,
+                and booleans keyed by TRACKING_API_FLAGS name
+            
+        Returns:
+            tuple: (rows, next_cursor) where rows are dictionaries keyed by
+                field name and next_cursor is None on the last page
+        """
+        query = TrackingService._api_query(file_id, fields, filters)
+        
+        if cursor is not None:
+            query = query.where(TrackingData.id > cursor)
+        
+        # Fetch one extra row to know whether another page follows
+        rows = db.session.execute(query.limit(limit + 1)).all()
+        next_cursor = rows[limit - 1].id if len(rows) > limit else None
+        
+        return [row._asdict() for row in rows[:limit]], next_cursor
+    
+    @staticmethod
+    def stream_tracking_data(file_id, fields=None, filters=None, fmt='ndjson', batch_size=1000):
+        """
+        Encode all tracking data of a file incrementally for a streaming response.
+        
+        Rows are fetched through a server-side cursor (``yield_per``) and
+        serialized with orjson one batch at a time, so memory use does not
+        grow with the number of rows and the first bytes are sent as soon as
+        the first batch is read.
+        
+        Args:
+            file_id: ID of the uploaded file
+            fields: Names from TRACKING_API_FIELDS to return (id is always included)
+            filters: Case-insensitive substrings keyed by TRACKING_API_FILTERS name,
+                and booleans keyed by TRACKING_API_FLAGS name
+            fmt: 'ndjson' for one object per line, 'json' for a {"data": [...]} document
+            batch_size: Rows fetched and encoded per chunk
+            
+        Yields:
+            bytes: Encoded chunks
+        """
+        query = TrackingService._api_query(file_id, fields, filters).execution_options(yield_per=batch_size)
+        result = db.session.execute(query)
+        
+        if fmt == 'json':
+            yield b'{"data":['
+            separator = b''
+            for partition in result.partitions():
+                yield separator + b','.join(orjson.dumps(row._asdict()) for row in partition)
+                separator = b','
+            yield b']}'
+        else:
+            for partition in result.partitions():
+                yield b''.join(orjson.dumps(row._asdict()) + b'\n' for row in partition)
+    
+    @staticmethod
+    def _api_query(file_id, fields=None, filters=None):
+        """
+        Build the ordered tracking data query shared by the API endpoints.
+        
+        Args:
+            file_id: ID of the uploaded file
+            fields: Names from TRACKING_API_FIELDS to return (id is always included)
+            filters: Case-insensitive substrings keyed by TRACKING_API_FILTERS name,
+                and booleans keyed by TRACKING_API_FLAGS name
+            
+        Returns:
+            Select: Query selecting only the requested columns, ordered by id
+        """
+        fields = list(fields or DEFAULT_API_FIELDS)
+        if 'id' not in fields:
+            fields.insert(0, 'id')
+        
+        query = (db.select(*[TRACKING_API_FIELDS[name].label(name) for name in fields])
+                 .where(file_rows(file_id)))
+        
+        for name, term in (filters or {}).items():
+            if name in TRACKING_API_FLAGS:
+                # NOT flag matches the partial indexes of rows missing a tag
+                if term is not None:
+                    query = query.where(TRACKING_API_FLAGS[name] if term else ~TRACKING_API_FLAGS[name])
+            elif term:
+                query = query.where(db.func.lower(TRACKING_API_FILTERS[name]).contains(term.lower(), autoescape=True))
+        
+        return query.order_by(TrackingData.id)
+    
+    @staticmethod
+    def backfill_tag_flags(batch_size=1000):
+        """
+        Fill the tag presence flags of rows ingested before they existed.
+        
+        Rows are processed in id order, one batch per transaction.
+        
+        Args:
+            batch_size: Rows updated per transaction
+            
+        Returns:
+            int: Number of rows updated
+        """
+        flags = [getattr(TrackingData, flag) for flag in TAG_PRESENCE_COLUMNS]
+        tags = [getattr(TrackingData, name) for name in TAG_PRESENCE_COLUMNS.values()]
+        statement = (db.update(TrackingData.__table__)
+                     .where(TrackingData.__table__.c.id == db.bindparam('row_id'))
+                     .values({flag: db.bindparam(flag) for flag in TAG_PRESENCE_COLUMNS}))
+        
+        updated, last_id = 0, 0
+        while True:
+            rows = db.session.execute(
+                db.select(TrackingData.id, *tags)
+                .where(TrackingData.id > last_id, db.or_(*[flag.is_(None) for flag in flags]))
+                .order_by(TrackingData.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            
+            db.session.execute(statement, [
+                {'row_id': row.id, **{flag: tag_present(value) for flag, value in zip(TAG_PRESENCE_COLUMNS, row[1:])}}
+                for row in rows
+            ])
+            db.session.commit()
+            updated += len(rows)
+            last_id = rows[-1].id
+        
+        logger.info(f"Backfilled tag presence flags of {updated} tracking rows")
+        return updated
+    
+    @staticmethod
+    @replica_reads()
     def get_file_info(file_id):
         """
         Get information about an uploaded file.
@@ -177,47 +482,148 @@ class TrackingService:
         if not file_id:
             return False, "No file selected"
         
-        # Get the uploaded file record
-        uploaded_file = UploadedFile.query.get(file_id)
+        success, result = TrackingService.delete_files([file_id], user_id)
+        if not success:
+            return False, result
         
-        if not uploaded_file:
+        return True, "File deleted successfully"
+    
+    @staticmethod
+    def delete_files(file_ids, user_id=None):
+        """
+        Delete several uploaded files and their tracking data in one transaction.
+        
+        Records are removed with single DELETE statements instead of
+        session.delete(), so no tracking rows are loaded into the session.
+        
+        Args:
+            file_ids: IDs of the uploaded files
+            user_id: ID of the user requesting deletion (for permission check)
+            
+        Returns:
+            tuple: (success, result) where:
+                - If successful: (True, report) with the number of files and tracking_rows removed
+                - If failed: (False, error_message)
+        """
+        file_ids = sorted({int(file_id) for file_id in file_ids})
+        if not file_ids:
+            return False, "No file selected"
+        
+        uploads = db.session.execute(
+            db.select(UploadedFile.id, UploadedFile.file_path, UploadedFile.uploaded_by)
+            .where(UploadedFile.id.in_(file_ids))
+        ).all()
+        
+        if len(uploads) != len(file_ids):
             return False, "File not found"
         
-        # Check if the user has permission to delete this file
-        if user_id and uploaded_file.uploaded_by != user_id:
+        # Check if the user has permission to delete these files
+        if user_id and any(upload.uploaded_by != user_id for upload in uploads):
             # Check if user is an admin
             from models.user import User
             user = User.query.get(user_id)
             
-            if not user or not user.is_admin:
+            if not user or not user.is_admin():
                 return False, "You don't have permission to delete this file"
         
         try:
-            # Delete the physical file if it exists
-            if os.path.exists(uploaded_file.file_path):
-                os.remove(uploaded_file.file_path)
-                logger.info(f"Deleted physical file: {uploaded_file.file_path}")
-            
-            # Delete tracking data and file record
-            TrackingData.query.filter_by(file_id=file_id).delete()
-            db.session.delete(uploaded_file)
+            tracking_rows = TrackingService.delete_records(file_ids)
             db.session.commit()
-            
-            return True, "File deleted successfully"
-            
         except Exception as e:
-            logger.exception(f"Error deleting file {file_id}: {str(e)}")
+            logger.exception(f"Error deleting files {file_ids}: {str(e)}")
             db.session.rollback()
             return False, f"Error deleting file: {str(e)}"
+        
+        # Delete the physical files once their records are gone
+        for upload in uploads:
+            TrackingService.remove_upload_files(upload.file_path)
+        
+        logger.info(f"Deleted {len(uploads)} files and {tracking_rows} tracking rows")
+        return True, {'files': len(uploads), 'tracking_rows': tracking_rows}
+    
+    @staticmethod
+    def delete_records(file_ids):
+        """
+        Delete upload records and their tracking rows in the current transaction.
+        
+        Tracking rows are deleted explicitly, which gives their count without
+        a separate COUNT(*) and leaves nothing for the ON DELETE CASCADE of
+        PostgreSQL. Summaries and job references are handled by the foreign
+        keys on PostgreSQL; SQLite does not enforce foreign keys by default,
+        so there they are deleted explicitly too.
+        
+        Args:
+            file_ids: IDs of the uploads to delete
+            
+        Returns:
+            int: Number of tracking rows deleted
+        """
+        row_count = db.session.execute(
+            db.delete(TrackingData)
+            .where(TrackingData.file_id.in_(file_ids))
+            .execution_options(synchronize_session='evaluate')
+        ).rowcount
+        
+        if db.session.get_bind().dialect.name != 'postgresql':
+            db.session.execute(
+                db.delete(UploadSummary)
+                .where(UploadSummary.file_id.in_(file_ids))
+                .execution_options(synchronize_session='evaluate')
+            )
+            db.session.execute(
+                db.update(IngestJob)
+                .where(IngestJob.file_id.in_(file_ids))
+                .values(file_id=None)
+                .execution_options(synchronize_session='evaluate')
+            )
+        
+        # 'evaluate' marks matching objects already in the session as deleted
+        # without loading any others
+        db.session.execute(
+            db.delete(UploadedFile)
+            .where(UploadedFile.id.in_(file_ids))
+            .execution_options(synchronize_session='evaluate')
+        )
+        
+        # Other processes drop their fragments by LRU; the view never serves a deleted upload
+        for file_id in file_ids:
+            fragment_cache.invalidate(file_id)
+        
+        return row_count
+    
+    @staticmethod
+    def remove_upload_files(file_path):
+        """
+        Remove an uploaded file, its snapshot and its API payload from disk.
+        
+        Args:
+            file_path: Path of the uploaded file
+            
+        Returns:
+            int: Number of bytes freed
+        """
+        freed = 0
+        for path in (file_path, snapshot_path(file_path), payload_path(file_path)):
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+                logger.info(f"Deleted physical file: {path}")
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.error(f"Error deleting file {path}: {str(e)}")
+        return freed
     
     @staticmethod
-    def search_tracking_data(search_term, file_id=None):
+    def search_tracking_data(search_term, file_id=None, user_id=None):
         """
         Search tracking data based on a search term.
         
         Args:
             search_term: Search term to filter by
             file_id: Optional file ID to restrict search
+            user_id: Optional ID of the user whose uploads are searched
             
         Returns:
             list: Matching tracking data items
@@ -225,27 +631,59 @@ class TrackingService:
         if not search_term:
             # If no search term, return an empty list or all items based on file_id
             if file_id:
-                return TrackingData.query.filter_by(file_id=file_id).all()
+                return TrackingData.query.filter(file_rows(file_id)).all()
             return []
         
-        # Convert search term to lowercase for case-insensitive search
-        search_term = f"%{search_term.lower()}%"
-        
-        # Construct the base query
-        query = TrackingData.query
+        # Join the indexed matches, most relevant first
+        matches = search_matches(search_term)
+        query = TrackingData.query.join(matches, matches.c.id == TrackingData.id)
         
         # Add file_id filter if provided
         if file_id:
-            query = query.filter_by(file_id=file_id)
-        
-        # Add search filters for relevant fields
-        results = query.filter(
-            db.or_(
-                db.func.lower(TrackingData.placement_name).like(search_term),
-                db.func.lower(TrackingData.ad_name).like(search_term),
-                db.func.lower(TrackingData.creative_name).like(search_term),
-                db.func.lower(TrackingData.campaign_id).like(search_term)
-            )
+            query = query.filter(file_rows(file_id))
+        if user_id is not None:
+            query = (query.join(UploadedFile, UploadedFile.id == TrackingData.file_id)
+                     .filter(UploadedFile.uploaded_by == user_id))
+        
+        return query.order_by(matches.c.rank, TrackingData.id).all()
+    
+    @staticmethod
+    def search(search_term, file_id=None, page=1, per_page=50, user_id=None):
+        """
+        Get one page of ranked search results for the API.
+        
+        Args:
+            search_term: Search term matched against placement, ad, creative and campaign
+            file_id: Optional file ID to restrict search
+            user_id: Optional ID of the user whose uploads are searched
+            page: 1-based page number
+            per_page: Maximum number of results in the page
+            
+        Returns:
+            tuple: (rows, has_next) where rows are dictionaries ordered by relevance
+        """
+        matches = search_matches(search_term)
+        query = (db.select(
+                    TrackingData.id,
+                    TrackingData.file_id,
+                    TrackingData.placement_name,
+                    TrackingData.ad_name,
+                    TrackingData.creative_name,
+                    TrackingData.campaign_id,
+                    TrackingData.click_tag_converted.label('click_tag'))
+                 .join(matches, matches.c.id == TrackingData.id))
+        
+        if file_id:
+            query = query.where(file_rows(file_id))
+        if user_id is not None:
+            query = (query.join(UploadedFile, UploadedFile.id == TrackingData.file_id)
+                     .where(UploadedFile.uploaded_by == user_id))
+        
+        # Fetch one extra row to know whether another page follows
+        rows = db.session.execute(
+            query.order_by(matches.c.rank, TrackingData.id)
+            .offset((page - 1) * per_page)
+            .limit(per_page + 1)
         ).all()
         
-        return results 
\ No newline at end of file
+        return [row._asdict() for row in rows[:per_page]], len(rows) > per_page
@@ -1,6 +1,8 @@
 import os
+import io
 import tempfile
 import pytest
+from openpyxl import Workbook
 from app import create_app
 from models import db
 
@@ -48,4 +50,20 @@ def auth(client):
         def logout(self):
             return self._client.get('/logout')
     
-    return AuthActions(client) 
\ No newline at end of file
+    return AuthActions(client) 
+
+@pytest.fixture
+def tracking_workbook():
+    """An in-memory .xlsx tracking sheet with three placements, one of them incomplete."""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['Campaign: Spring Launch'])
+    sheet.append(['Placement Name', 'Ad Name', 'Creative Name', 'Click Tag', 'Impression Tag (image)'])
+    sheet.append(['Homepage', 'Ad 1', 'Creative 1',
+                  '<a href="https://ad.example.com/click?ord=[timestamp]">Click</a>',
+                  '<img src="https://ad.example.com/pixel.gif?cb=%%CACHEBUSTER%%">'])
+    sheet.append(['Sidebar', 'Ad 2', 'Creative 2', 'https://ad.example.com/click2', None])
+    sheet.append(['Footer', None, 'Creative 3', 'https://ad.example.com/click3', None])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,156 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+from utils import validate_excel_file, iter_excel_rows, find_header_row, process_excel_file
+
+HEADERS = ['Placement Name', 'Ad Name', 'Creative Name', 'Click Tag', 'Impression Tag (image)']
+
+def write_workbook(path, rows):
+    """Write rows (lists of cell values) to the first sheet of a new workbook."""
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+@pytest.fixture
+def tracking_sheet(tmp_path):
+    """A sheet with junk rows above the header and a blank row inside the data."""
+    rows = [
+        ['Campaign: Spring Launch'],
+        [],
+        ['Prepared by', 'Agency'],
+        HEADERS,
+        ['Homepage', 'Ad 1', 'Creative 1', '<a href="https://ad.example.com/click?cb=[timestamp]">x</a>', 12],
+        ['Sidebar', 'Ad 2', 'Creative 2', 'https://ad.example.com/click2', 3.5],
+        [None, None, None, None, None],
+        ['Footer', 'Ad 3', None, 'https://ad.example.com/click3', None],
+    ]
+    return write_workbook(tmp_path / 'tracking.xlsx', rows)
+
+def test_streaming_reader_matches_pandas(tracking_sheet):
+    """The single-pass reader returns the same frame as pandas with the header row."""
+    is_valid, df = validate_excel_file(tracking_sheet)
+    assert is_valid
+
+    expected = pd.read_excel(tracking_sheet, header=3)
+    expected.columns = [str(col).strip() for col in expected.columns]
+    pd.testing.assert_frame_equal(df, expected)
+
+def test_iter_excel_rows_trims_trailing_cells(tracking_sheet):
+    """Streamed rows have trailing empty cells removed."""
+    rows = list(iter_excel_rows(tracking_sheet))
+    assert rows[0] == ['Campaign: Spring Launch']
+    assert rows[1] == []
+    assert rows[3] == HEADERS
+
+def test_partial_header_match(tmp_path):
+    """Headers that only contain the required names do not match them, so the sheet is rejected."""
+    headers = ['Placement Name (site)', 'Ad Name', 'Creative Name', 'Click Tag URL']
+    path = write_workbook(tmp_path / 'partial.xlsx', [
+        ['Notes'],
+        headers,
+        ['Homepage', 'Ad 1', 'Creative 1', 'https://ad.example.com/click'],
+    ])
+    is_valid, result = validate_excel_file(path)
+    assert not is_valid
+    assert result.startswith('Missing required columns')
+
+def test_exact_header_preferred_over_partial(tmp_path):
+    """An exact header row wins over an earlier row that only matches partially."""
+    path = write_workbook(tmp_path / 'exact.xlsx', [
+        ['Placement Name (site)', 'Ad Name', 'Creative Name', 'Click Tag URL'],
+        HEADERS[:4],
+        ['Homepage', 'Ad 1', 'Creative 1', 'https://ad.example.com/click'],
+    ])
+    is_valid, df = validate_excel_file(path)
+    assert is_valid
+    assert list(df.columns) == HEADERS[:4]
+    assert len(df) == 1
+
+def test_empty_workbook(tmp_path):
+    """A workbook without content is rejected as empty."""
+    path = write_workbook(tmp_path / 'empty.xlsx', [])
+    assert validate_excel_file(path) == (False, 'File is empty')
+
+def test_missing_header_row(tmp_path):
+    """A workbook without the required headers is rejected."""
+    path = write_workbook(tmp_path / 'noheader.xlsx', [['a', 'b'], ['c', 'd']])
+    is_valid, result = validate_excel_file(path)
+    assert not is_valid
+    assert result.startswith('Required columns not found')
+
+def test_headers_without_data(tmp_path):
+    """A workbook with only the header row is rejected."""
+    path = write_workbook(tmp_path / 'headers.xlsx', [HEADERS])
+    assert validate_excel_file(path) == (False, 'File contains headers but no data')
+
+def test_find_header_row_prefers_exact_match():
+    """The vectorized matcher reports exact matches before earlier partial ones."""
+    rows = [
+        ['Report'],
+        ['Placement Name (site)', 'Ad Name', 'Creative Name', 'Click Tag URL'],
+        [None, ' placement name ', 'AD NAME', 'Creative Name', 'Click Tag'],
+    ]
+    assert find_header_row(rows, HEADERS[:4]) == (2, True)
+    assert find_header_row(rows[:2], HEADERS[:4]) == (1, False)
+    assert find_header_row(rows[:1], HEADERS[:4]) == (None, False)
+
+def test_header_outside_scan_window(tmp_path):
+    """Headers below the scan window are not searched for."""
+    rows = [[f'Note {i}'] for i in range(5)] + [HEADERS, ['Homepage', 'Ad 1', 'Creative 1', 'https://c', None]]
+    path = write_workbook(tmp_path / 'deep.xlsx', rows)
+
+    is_valid, result = validate_excel_file(path, header_scan_rows=5)
+    assert not is_valid
+    assert result.startswith('Required columns not found')
+
+    is_valid, df = validate_excel_file(path, header_scan_rows=6)
+    assert is_valid
+    assert df['Placement Name'].tolist() == ['Homepage']
+
+@pytest.fixture
+def tracking_frame():
+    """A validated sheet mixing markup, placeholders, numbers and missing values."""
+    tags = [
+        '<a href="https://ad.example.com/click?ts=[timestamp]&g=${GDPR}">Click</a>',
+        "<IMG SRC='https://ad.example.com/pixel.gif?cb=%%CACHEBUSTER%%'>",
+        '<script src="https://vendor.example.com/tag.js?c=${GDPR_CONSENT_755}"></script>',
+        ' https://ad.example.com/plain?r=[random] ',
+        '<a class="empty">No URL</a>',
+        np.nan,
+        42,
+        '',
+    ]
+    names = ['Homepage', '  Sidebar  ', np.nan, 7, 1.5, datetime.datetime(2024, 5, 1)]
+    rows = 120
+    return pd.DataFrame({
+        'Placement Name': [names[i % len(names)] for i in range(rows)],
+        'Ad Name': [names[(i * 5) % len(names)] for i in range(rows)],
+        'Creative Name': [names[(i * 7) % len(names)] for i in range(rows)],
+        'Click Tag': [tags[i % len(tags)] for i in range(rows)],
+        'Impression Tag (image)': [tags[(i * 3) % len(tags)] for i in range(rows)],
+        'Third-party vendor tracking tag': [tags[(i * 5) % len(tags)] for i in range(rows)],
+    })
+
+def test_columnar_engine_matches_row_engine(tracking_frame):
+    """Both engines of process_excel_file produce identical records."""
+    expected = process_excel_file(tracking_frame, 7)
+    assert expected
+    assert process_excel_file(tracking_frame, 7, columnar=True) == expected
+
+def test_columnar_engine_without_optional_columns(tracking_frame):
+    """Missing optional columns produce blank fields in both engines."""
+    df = tracking_frame.drop(columns=['Creative Name', 'Impression Tag (image)', 'Third-party vendor tracking tag'])
+    records = process_excel_file(df, 7, columnar=True)
+    assert records == process_excel_file(df, 7)
+    assert all(record['imp_tag'] == '' and record['imp_tag_converted'] == '' for record in records)
+
+def test_columnar_engine_converts_tags(tracking_frame):
+    """Tags are extracted from markup and placeholders standardized."""
+    record = process_excel_file(tracking_frame.head(1), 7, columnar=True)[0]
+    assert record['placement_name'] == 'Homepage'
+    assert record['click_tag_converted'] == 'https://ad.example.com/click?ts={timestamp}&g='
@@ -1,7 +1,23 @@
 import pytest
 import os
 import io
-from models.tracking import UploadedFile, TrackingData
+import json
+import gzip
+import shutil
+from models.tracking import UploadedFile, TrackingData, UploadSummary
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, text
+from app import create_app
+from config import TestingConfig
+from models import db
+from models.session import REPLICA_BIND
+from models.job import IngestJob
+from services.bulk_insert import bulk_insert, _copy_literal
+from services.db_pool import MeteredQueuePool, pool_stats
+from services.job_service import JobService
+from services.payload import payload_path
+from services.snapshot import snapshot_path, read_snapshot
+from services.tracking_service import TrackingService
 
 def test_tracking_tool_page_requires_login(client):
     """Test that the tracking tool page requires a user to be logged in."""
@@ -33,7 +49,665 @@ def test_file_upload_invalid_extension(client, auth):
     data = {'file': (io.BytesIO(b'This is a test file'), 'test.txt')}
     
     response = client.post('/tracking-tool', data=data, follow_redirects=True)
-    assert b'Excel files only' in response.data
+    assert b'Invalid file type. Please upload an Excel file' in response.data
 
-# Note: To properly test Excel uploads, we would need to create a valid Excel file
-# This is a simplified version focused on checking the UI and permissions 
\ No newline at end of file
+def test_file_upload_saves_tracking_data(app, client, auth, tracking_workbook, tmp_path):
+    """A valid upload stores the file record and its tracking rows."""
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    auth.login()
+
+    data = {'file': (io.BytesIO(tracking_workbook), 'campaign.xlsx')}
+    response = client.post('/tracking-tool', data=data)
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/tracking-data')
+
+    uploaded_file = UploadedFile.query.filter_by(original_filename='campaign.xlsx').one()
+    items = TrackingData.query.filter_by(file_id=uploaded_file.id).order_by(TrackingData.id).all()
+    assert [item.placement_name for item in items] == ['Homepage', 'Sidebar']
+    assert uploaded_file.summary.to_dict() == {
+        'file_id': uploaded_file.id, 'rows_total': 3, 'rows_inserted': 2, 'rows_skipped': 1,
+        'click_tags': 2, 'impression_tags': 1, 'third_party_tags': 0, 'distinct_placements': 2,
+        'parse_seconds': uploaded_file.summary.parse_seconds, 'byte_size': uploaded_file.file_size
+    }
+    assert uploaded_file.file_size == len(tracking_workbook)
+    assert items[0].click_tag_converted == 'https://ad.example.com/click?ord={timestamp}'
+    assert items[0].imp_tag_converted == 'https://ad.example.com/pixel.gif?cb={cachebuster}'
+    assert all(item.created_at is not None for item in items)
+
+def test_duplicate_upload_reuses_tracking_data(app, client, auth, tracking_workbook, tmp_path):
+    """Re-uploading an identical workbook shows the existing results without re-parsing."""
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    auth.login()
+
+    client.post('/tracking-tool', data={'file': (io.BytesIO(tracking_workbook), 'campaign.xlsx')})
+    response = client.post('/tracking-tool', data={'file': (io.BytesIO(tracking_workbook), 'campaign copy.xlsx')})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/tracking-data')
+
+    uploaded_file = UploadedFile.query.one()
+    assert uploaded_file.checksum is not None
+    assert TrackingData.query.count() == 2
+    assert sorted(os.listdir(tmp_path)) == [
+        uploaded_file.filename, f'{uploaded_file.filename}.arrow', f'{uploaded_file.filename}.json.gz'
+    ]
+
+@pytest.fixture
+def member(app):
+    """A regular user, logged in with auth.login('member', 'member123')."""
+    from models.user import User
+    user = User(username='member', email='member@example.com', role='user')
+    user.password = 'member123'
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def test_duplicate_upload_matches_own_unexpired_files(app, client, auth, member, tracking_workbook, tmp_path, queued_job):
+    """Identical files of other users or past retention are ingested again, and reuse records the row counts."""
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    auth.login()
+    client.post('/tracking-tool', data={'file': (io.BytesIO(tracking_workbook), 'campaign.xlsx')})
+    admin_file = UploadedFile.query.one()
+    auth.logout()
+
+    auth.login('member', 'member123')
+    client.post('/tracking-tool', data={'file': (io.BytesIO(tracking_workbook), 'campaign.xlsx')})
+    member_file = UploadedFile.query.filter_by(uploaded_by=member.id).one()
+    assert member_file.id != admin_file.id
+
+    job = queued_job(uploaded_by=member.id, checksum=member_file.checksum)
+    assert JobService.run(job.id)
+    assert job.file_id == member_file.id
+    assert (job.rows_total, job.rows_inserted, job.rows_skipped) == (3, 2, 1)
+
+    member_file.uploaded_at = datetime.utcnow() - timedelta(hours=app.config['UPLOAD_RETENTION_HOURS'] + 1)
+    db.session.commit()
+    assert TrackingService.find_duplicate(member_file.checksum, member.id) is None
+
+def test_uploads_of_other_users_are_not_found(app, client, auth, member, uploaded_rows):
+    """Only the uploader and admins can view an upload's tracking data."""
+    auth.logout()
+    auth.login('member', 'member123')
+    for url in (f'/api/tracking-data?file_id={uploaded_rows}', f'/api/tracking-data/stream?file_id={uploaded_rows}',
+                f'/api/tracking-data?file_id={uploaded_rows}&paginate=false'):
+        assert client.get(url).status_code == 404
+
+    for url in (f'/tracking-data?file_id={uploaded_rows}', '/tracking-data'):
+        assert client.get(url).headers['Location'].endswith('/tracking-tool')
+
+    UploadedFile.query.get(uploaded_rows).uploaded_by = member.id
+    db.session.commit()
+    assert client.get(f'/tracking-data?file_id={uploaded_rows}').status_code == 200
+
+def test_snapshot_serves_projected_row_ranges(app, client, auth, tracking_workbook, tmp_path):
+    """Ingest writes a columnar snapshot that is read by column and row range."""
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    auth.login()
+    client.post('/tracking-tool', data={'file': (io.BytesIO(tracking_workbook), 'campaign.xlsx')})
+
+    uploaded_file = UploadedFile.query.one()
+    assert os.path.exists(snapshot_path(uploaded_file.file_path))
+
+    table = read_snapshot(uploaded_file, columns=['placement_name', 'click_tag_converted'], start=1, stop=2)
+    assert table.to_pylist() == [{'placement_name': 'Sidebar', 'click_tag_converted': 'https://ad.example.com/click2'}]
+
+    response = client.get('/tracking-data')
+    assert b'https://ad.example.com/click?ord={timestamp}' in response.data
+
+def test_missing_snapshot_is_rebuilt(app, client, auth, tracking_workbook, tmp_path):
+    """The API rebuilds a missing snapshot from the database and delete removes it."""
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    app.config['API_PAYLOADS'] = False
+    auth.login()
+    client.post('/tracking-tool', data={'file': (io.BytesIO(tracking_workbook), 'campaign.xlsx')})
+
+    uploaded_file = UploadedFile.query.one()
+    path = snapshot_path(uploaded_file.file_path)
+    os.remove(path)
+
+    response = client.get(f'/api/tracking-data?file_id={uploaded_file.id}&paginate=false')
+    items = TrackingData.query.order_by(TrackingData.id).all()
+    assert response.json['data'] == [{
+        'id': item.id,
+        'placement_name': item.placement_name,
+        'ad_name': item.ad_name,
+        'creative_name': item.creative_name,
+        'click_tag': item.click_tag_converted
+    } for item in items]
+    assert os.path.exists(path)
+
+    assert TrackingService.delete_file(uploaded_file.id)[0]
+    assert not os.path.exists(path)
+
+@pytest.fixture
+def uploaded_rows(app, client, auth, tracking_workbook, tmp_path):
+    """Log in and upload the tracking workbook, returning the file id."""
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    auth.login()
+    client.post('/tracking-tool', data={'file': (io.BytesIO(tracking_workbook), 'campaign.xlsx')})
+    return UploadedFile.query.one().id
+
+def test_api_keyset_pagination(client, uploaded_rows):
+    """Pages follow next_cursor until the last page."""
+    pages = []
+    url = f'/api/tracking-data?file_id={uploaded_rows}&limit=1&fields=placement_name'
+    response = client.get(url).json
+    pages.append(response['data'])
+    while response['next_cursor'] is not None:
+        response = client.get(f"{url}&cursor={response['next_cursor']}").json
+        pages.append(response['data'])
+
+    assert [[set(row) for row in page] for page in pages] == [[{'id', 'placement_name'}]] * 2
+    assert [page[0]['placement_name'] for page in pages] == ['Homepage', 'Sidebar']
+
+def test_api_filters_and_fields(client, uploaded_rows):
+    """Name filters are case-insensitive substrings and unknown fields are rejected."""
+    response = client.get(f'/api/tracking-data?file_id={uploaded_rows}&placement=SIDE&fields=click_tag').json
+    assert response == {
+        'data': [{'id': response['data'][0]['id'], 'click_tag': 'https://ad.example.com/click2'}],
+        'next_cursor': None
+    }
+
+    response = client.get(f'/api/tracking-data?file_id={uploaded_rows}&fields=password')
+    assert response.status_code == 400
+
+def test_api_tag_presence_filters(app, client, uploaded_rows):
+    """Rows missing a tag are found through the presence flags, which can be backfilled."""
+    from models import db
+    url = f'/api/tracking-data?file_id={uploaded_rows}&fields=placement_name,has_imp_tag'
+    response = client.get(f'{url}&has_imp_tag=false').json
+    assert [(row['placement_name'], row['has_imp_tag']) for row in response['data']] == [('Sidebar', False)]
+    assert [row['placement_name'] for row in client.get(f'{url}&has_click_tag=true').json['data']] == ['Homepage', 'Sidebar']
+    assert client.get(f'{url}&has_third_party_tag=maybe').status_code == 400
+
+    TrackingData.query.update({'click_tag_present': None, 'imp_tag_present': None, 'third_party_present': None})
+    db.session.commit()
+    assert TrackingService.backfill_tag_flags(batch_size=1) == 2
+    rows = TrackingData.query.order_by(TrackingData.id).all()
+    assert [(row.click_tag_present, row.imp_tag_present, row.third_party_present) for row in rows] == [
+        (True, True, False), (True, False, False)
+    ]
+
+def test_api_stream_formats(client, uploaded_rows):
+    """The streaming endpoint returns the same rows as NDJSON or a chunked JSON document."""
+    page = client.get(f'/api/tracking-data?file_id={uploaded_rows}').json['data']
+
+    response = client.get(f'/api/tracking-data/stream?file_id={uploaded_rows}')
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.data.splitlines()] == page
+
+    response = client.get(f'/api/tracking-data/stream?file_id={uploaded_rows}&format=json&placement=home')
+    assert response.json == {'data': page[:1]}
+
+def test_api_search_ranks_and_paginates(client, uploaded_rows):
+    """Search matches substrings case-insensitively and pages through the results."""
+    response = client.get('/api/search?q=AD 2').json
+    assert [row['placement_name'] for row in response['data']] == ['Sidebar']
+    assert response['has_next'] is False
+
+    response = client.get('/api/search?q=creative&per_page=1').json
+    assert len(response['data']) == 1 and response['has_next'] is True
+    response = client.get('/api/search?q=creative&per_page=1&page=2').json
+    assert len(response['data']) == 1 and response['has_next'] is False
+
+    assert client.get('/api/search').status_code == 400
+
+def test_search_is_limited_to_own_uploads(app, client, auth, member, uploaded_rows):
+    """Users other than admins only find rows of their own uploads."""
+    assert len(client.get('/api/search?q=sidebar').json['data']) == 1
+    auth.logout()
+    auth.login('member', 'member123')
+    assert client.get('/api/search?q=sidebar').json['data'] == []
+    assert client.get(f'/api/search?q=sidebar&file_id={uploaded_rows}').status_code == 404
+    assert TrackingService.search_tracking_data('sidebar', user_id=member.id) == []
+
+def test_search_index_follows_deletes(app, uploaded_rows):
+    """Short terms fall back to LIKE and deleted rows leave the index."""
+    from models import db
+    assert app.extensions['tracking_search'] == 'fts5'
+    assert [item.ad_name for item in TrackingService.search_tracking_data('1', uploaded_rows)] == ['Ad 1']
+
+    TrackingData.query.filter_by(placement_name='Homepage').delete()
+    db.session.commit()
+    assert TrackingService.search_tracking_data('homepage') == []
+    assert len(TrackingService.search_tracking_data('sidebar')) == 1
+
+def test_retention_purge_deletes_expired_uploads(app, client, auth, tracking_workbook, tmp_path):
+    """The purge removes expired uploads in batches and reports what it reclaimed."""
+    from models import db
+    from services.retention_service import RetentionService
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    auth.login()
+    for name in ('old.xlsx', 'older.xlsx', 'new.xlsx'):
+        workbook = tracking_workbook if name == 'old.xlsx' else tracking_workbook + name.encode()
+        client.post('/tracking-tool', data={'file': (io.BytesIO(workbook), name)})
+
+    UploadedFile.query.filter(UploadedFile.original_filename != 'new.xlsx').update(
+        {'uploaded_at': datetime.utcnow() - timedelta(hours=48)}
+    )
+    db.session.commit()
+    expired_bytes = sum(
+        os.path.getsize(path)
+        for uploaded_file in UploadedFile.query.filter(UploadedFile.original_filename != 'new.xlsx')
+        for path in (uploaded_file.file_path, snapshot_path(uploaded_file.file_path), payload_path(uploaded_file.file_path))
+    )
+    db.session.expunge_all()
+
+    report = RetentionService.purge_expired(24, batch_size=1, row_batch_size=1)
+    assert {key: report[key] for key in ('files', 'tracking_rows', 'batches', 'bytes_reclaimed')} == {
+        'files': 2, 'tracking_rows': 4, 'batches': 2, 'bytes_reclaimed': expired_bytes
+    }
+    remaining = UploadedFile.query.one()
+    assert remaining.original_filename == 'new.xlsx'
+    assert {item.file_id for item in TrackingData.query} == {remaining.id}
+    assert sorted(os.listdir(tmp_path)) == [remaining.filename, f'{remaining.filename}.arrow', f'{remaining.filename}.json.gz']
+    assert len(TrackingService.search_tracking_data('sidebar')) == 1
+
+def test_partition_key_filter_selects_file_rows(app, client, auth, tracking_workbook, tmp_path):
+    """Rows share their file's upload time, so the partition key filter keeps every row."""
+    app.config.update(UPLOAD_FOLDER=str(tmp_path), TRACKING_SNAPSHOTS=False, TRACKING_PARTITIONS=True)
+    auth.login()
+    for name in ('first.xlsx', 'second.xlsx'):
+        workbook = tracking_workbook if name == 'first.xlsx' else tracking_workbook + name.encode()
+        client.post('/tracking-tool', data={'file': (io.BytesIO(workbook), name)})
+
+    for uploaded_file in UploadedFile.query:
+        items = TrackingData.query.filter_by(file_id=uploaded_file.id).all()
+        assert {item.created_at for item in items} == {uploaded_file.uploaded_at}
+
+        page = client.get(f'/api/tracking-data?file_id={uploaded_file.id}').json['data']
+        assert [row['id'] for row in page] == [item.id for item in items]
+
+    assert str(TrackingService._api_query(1)).count('uploaded_files.uploaded_at') == 1
+
+def test_admin_deletes_files_without_loading_rows(app, client, auth, member, tracking_workbook, tmp_path):
+    """Admins delete several uploads in one request without hydrating their tracking rows."""
+    from sqlalchemy import event
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    auth.login()
+    for name in ('a.xlsx', 'b.xlsx', 'c.xlsx'):
+        client.post('/tracking-tool', data={'file': (io.BytesIO(tracking_workbook + name.encode()), name)})
+    uploads = {upload.original_filename: upload.id for upload in UploadedFile.query}
+
+    response = client.get('/admin/files')
+    assert response.status_code == 200
+    assert b'c.xlsx' in response.data
+
+    # Pages list the newest uploads first and join their uploaders
+    app.config['ADMIN_FILES_PER_PAGE'] = 2
+    UploadedFile.query.filter_by(original_filename='a.xlsx').update({'uploaded_by': member.id})
+    db.session.commit()
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get('/admin/files?page=2')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert b'a.xlsx' in response.data and b'c.xlsx' not in response.data
+    assert b'member' in response.data
+    # Only the logged-in user is loaded on its own
+    assert sum('FROM users' in statement for statement in statements) == 1
+
+    loaded = []
+    listener = lambda target, context: loaded.append(target)
+    event.listen(TrackingData, 'load', listener)
+    try:
+        response = client.post('/admin/files/delete', data={'file_ids': [uploads['a.xlsx'], uploads['b.xlsx']]},
+                               headers={'Accept': 'application/json'})
+    finally:
+        event.remove(TrackingData, 'load', listener)
+
+    assert response.json == {'files': 2, 'tracking_rows': 4}
+    assert loaded == []
+    assert [upload.original_filename for upload in UploadedFile.query] == ['c.xlsx']
+    assert {item.file_id for item in TrackingData.query} == {uploads['c.xlsx']}
+    assert [summary.file_id for summary in UploadSummary.query] == [uploads['c.xlsx']]
+    assert len(os.listdir(tmp_path)) == 3
+
+    response = client.post('/admin/files/delete', data={'file_ids': [uploads['a.xlsx']]}, follow_redirects=True)
+    assert b'File not found' in response.data
+
+def test_tags_are_stored_once(app, client, auth, tracking_workbook, tmp_path):
+    """Uploads share dictionary tags, which are pruned once no row refers to them."""
+    from models import db
+    from models.tracking import TrackingTag
+    from services.tag_dictionary import intern_tags, prune_tags
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    auth.login()
+    for name in ('first.xlsx', 'second.xlsx'):
+        client.post('/tracking-tool', data={'file': (io.BytesIO(tracking_workbook + name.encode()), name)})
+
+    first, second = [upload.id for upload in UploadedFile.query.order_by(UploadedFile.id)]
+    tag_count = TrackingTag.query.count()
+    assert tag_count == 6
+    assert intern_tags(['https://ad.example.com/click2']) == {
+        'https://ad.example.com/click2': TrackingTag.query.filter_by(value='https://ad.example.com/click2').one().id
+    }
+    assert TrackingTag.query.count() == tag_count
+
+    rows = TrackingData.query.filter_by(placement_name='Homepage').order_by(TrackingData.id).all()
+    assert rows[0].click_tag_converted_id == rows[1].click_tag_converted_id
+    assert rows[0].imp_tag_converted == 'https://ad.example.com/pixel.gif?cb={cachebuster}'
+    assert rows[0].third_party_tracking_id == rows[1].third_party_tracking_id
+
+    assert TrackingService.delete_file(first)[0]
+    assert prune_tags() == 0
+    assert TrackingService.delete_file(second)[0]
+    assert prune_tags() == tag_count
+    db.session.commit()
+
+def test_hot_queries_use_indexes(app):
+    """None of the audited hot queries needs a full table scan."""
+    from services.query_audit import audit_queries
+    results = audit_queries()
+    assert results
+    assert [(result['name'], result['seq_scans']) for result in results if result['seq_scans']] == []
+
+def test_bulk_insert_batches(app):
+    """bulk_insert writes every row across several batches and applies column defaults."""
+    from models import db
+    uploaded_file = UploadedFile(filename='f.xlsx', original_filename='f.xlsx', file_path='/tmp/f.xlsx')
+    db.session.add(uploaded_file)
+    db.session.flush()
+
+    rows = [{'file_id': uploaded_file.id, 'placement_name': f'Placement {i}', 'ad_name': ''} for i in range(25)]
+    assert bulk_insert(TrackingData.__table__, rows, batch_size=10) == 25
+    db.session.commit()
+
+    items = TrackingData.query.filter_by(file_id=uploaded_file.id).all()
+    assert len(items) == 25
+    assert all(item.created_at is not None and item.ad_name == '' for item in items)
+
+def test_copy_literal_distinguishes_null_and_empty():
+    """COPY encoding keeps NULLs and empty strings apart and escapes quotes."""
+    assert _copy_literal(None) == ''
+    assert _copy_literal('') == '""'
+    assert _copy_literal('say "hi", ok') == '"say ""hi"", ok"'
+    assert _copy_literal(True) == 't'
+    assert _copy_literal(12) == '12'
+
+@pytest.fixture
+def queued_job(app, tracking_workbook, tmp_path):
+    """Factory for jobs queued on a saved copy of the tracking workbook."""
+    from models import db
+
+    def make_job(content=tracking_workbook, **fields):
+        path = tmp_path / f"upload_{IngestJob.query.count()}.xlsx"
+        path.write_bytes(content)
+        job = IngestJob(filename=path.name, original_filename='campaign.xlsx',
+                        file_path=str(path), file_type='excel', **fields)
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    return make_job
+
+def test_async_upload_returns_job_id(app, client, auth, tracking_workbook, tmp_path):
+    """In asynchronous mode the upload answers with a job that reports its progress."""
+    app.config.update(UPLOAD_FOLDER=str(tmp_path), INGEST_ASYNC=True, INGEST_WORKERS=0)
+    auth.login()
+
+    data = {'file': (io.BytesIO(tracking_workbook), 'campaign.xlsx')}
+    response = client.post('/tracking-tool', data=data, headers={'Accept': 'application/json'})
+    assert response.status_code == 202
+
+    job = client.get(response.json['status_url']).json
+    assert job['status'] == 'completed'
+    assert (job['rows_total'], job['rows_inserted'], job['rows_skipped']) == (3, 2, 1)
+    assert TrackingData.query.filter_by(file_id=job['file_id']).count() == 2
+
+    response = client.get(job['result_url'])
+    assert response.status_code == 200
+
+def test_unknown_job_is_not_found(client, auth):
+    """Polling a job that does not exist returns 404."""
+    auth.login()
+    response = client.get('/api/jobs/missing')
+    assert response.status_code == 404
+
+def test_job_runs_once(queued_job):
+    """A job can only be claimed by one run."""
+    job = queued_job()
+    assert JobService.run(job.id)
+    assert not JobService.run(job.id)
+    assert job.attempts == 1
+
+def test_invalid_job_file_fails(queued_job):
+    """Validation errors are recorded on the job and the file is removed."""
+    job = queued_job(content=b'not a workbook')
+    assert not JobService.run(job.id)
+    assert job.status == 'failed'
+    assert job.error.startswith('Invalid Excel file')
+    assert not os.path.exists(job.file_path)
+
+def test_recover_resubmits_stale_jobs(app, queued_job):
+    """Abandoned running jobs are retried until they reach the attempt limit."""
+    app.config['INGEST_WORKERS'] = 0
+    stale = datetime.utcnow() - timedelta(hours=1)
+    retried = queued_job(status='running', attempts=1, updated_at=stale, lease_expires_at=stale)
+    exhausted = queued_job(status='running', attempts=3, updated_at=stale)
+    leased = queued_job(status='running', attempts=1, updated_at=stale,
+                        lease_expires_at=datetime.utcnow() + timedelta(minutes=5))
+    orphaned = queued_job(updated_at=stale)
+    waiting = queued_job()
+
+    assert JobService.recover() == 2
+    assert retried.status == orphaned.status == 'completed'
+    assert retried.attempts == 2
+    assert exhausted.status == 'failed'
+    assert leased.status == 'running'
+    assert waiting.status == 'queued'
+
+def test_reclaimed_job_commits_nothing(app, queued_job, monkeypatch):
+    """A run whose lease was reclaimed by recovery rolls back its ingest."""
+    job = queued_job()
+    monkeypatch.setattr(JobService, 'hold_lease', staticmethod(lambda job_id, owner: False))
+    assert not JobService.run(job.id)
+    assert UploadedFile.query.count() == 0
+    assert db.session.get(IngestJob, job.id).status == 'running'
+
+    # Failing a reclaimed job leaves the job and its file to the run that took over
+    job.lease_owner = 'other worker'
+    db.session.commit()
+    assert not JobService._fail(job, 'failed', 'worker')
+    assert job.status == 'running'
+    assert os.path.exists(job.file_path)
+
+def test_db_pool_metrics(client, auth, tmp_path):
+    """Metered pools count checkouts, and admins can read the pool status."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=MeteredQueuePool, pool_size=2, max_overflow=0)
+    for _ in range(3):
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+
+    stats = pool_stats(engine)
+    assert stats['pool'] == 'MeteredQueuePool'
+    assert (stats['checkouts'], stats['timeouts'], stats['size'], stats['checked_out']) == (3, 0, 2, 0)
+    assert stats['wait_ms_max'] >= stats['wait_ms_avg'] > 0
+    engine.dispose()
+
+    auth.login()
+    response = client.get('/api/admin/db-pool')
+    assert response.status_code == 200
+    assert response.get_json()['pool'] == 'StaticPool'
+
+def test_reads_use_replica_after_sticky_window(monkeypatch, tracking_workbook, tmp_path):
+    """GET requests read from the replica, except for the browser session that just uploaded."""
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'primary.db'}")
+    monkeypatch.setattr(TestingConfig, 'REPLICA_DATABASE_URI', f"sqlite:///{tmp_path / 'replica.db'}")
+    app = create_app('testing')
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    app.config['TRACKING_SNAPSHOTS'] = False
+
+    # The replica is a copy of the primary taken before the upload, like a lagging replica
+    shutil.copy(tmp_path / 'primary.db', tmp_path / 'replica.db')
+
+    uploader, reader = app.test_client(), app.test_client()
+    for client in (uploader, reader):
+        client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    uploader.post('/tracking-tool', data={'file': (io.BytesIO(tracking_workbook), 'campaign.xlsx')})
+    with app.app_context():
+        file_id = UploadedFile.query.filter_by(original_filename='campaign.xlsx').one().id
+        # Outside a request the service reads from the primary
+        assert TrackingService.get_file_info(file_id)[0]
+
+    query = f'/api/tracking-data?file_id={file_id}&paginate=false'
+    assert len(uploader.get(query).get_json()['data']) == 2
+    # The lagging replica does not know the upload yet
+    assert reader.get(query).status_code == 404
+
+    with app.app_context():
+        db.engines[REPLICA_BIND].dispose()
+        db.engines[None].dispose()
+
+def test_snapshot_rebuild_reads_the_primary(monkeypatch, tracking_workbook, tmp_path):
+    """Snapshots rebuilt under replica reads come from the primary, and empty rebuilds are not written."""
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'primary.db'}")
+    monkeypatch.setattr(TestingConfig, 'REPLICA_DATABASE_URI', f"sqlite:///{tmp_path / 'replica.db'}")
+    app = create_app('testing')
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+
+    # The replica is a copy of the primary taken before the upload, like a lagging replica
+    shutil.copy(tmp_path / 'primary.db', tmp_path / 'replica.db')
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    client.post('/tracking-tool', data={'file': (io.BytesIO(tracking_workbook), 'campaign.xlsx')})
+
+    with app.test_request_context('/tracking-data'):
+        uploaded_file = UploadedFile.query.filter_by(original_filename='campaign.xlsx').one()
+        path = snapshot_path(uploaded_file.file_path)
+        os.remove(path)
+        assert len(TrackingService.get_tracking_rows(uploaded_file)) == 2
+        assert read_snapshot(uploaded_file).num_rows == 2
+
+        os.remove(path)
+        TrackingData.query.delete()
+        db.session.commit()
+        assert TrackingService.get_tracking_rows(uploaded_file) == []
+        assert not os.path.exists(path)
+
+        db.session.remove()
+        db.engines[REPLICA_BIND].dispose()
+        db.engines[None].dispose()
+
+def test_read_only_views_and_deferred_tags(app, client, uploaded_rows):
+    """Read views use a read-only session, and get_tracking_data joins only the requested tags."""
+    from models import db
+    with app.test_request_context(f'/api/tracking-data?file_id={uploaded_rows}'):
+        app.preprocess_request()
+        assert db.session.info['read_only'] and not db.session.autoflush
+    assert client.get(f'/api/tracking-data?file_id={uploaded_rows}').status_code == 200
+    assert db.session.autoflush and not db.session.info['read_only']
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        db.session.expunge_all()
+        success, (uploaded_file, items) = TrackingService.get_tracking_data(uploaded_rows, tags=['click_tag_converted'])
+        assert success and len(items) == 2
+        assert [statement.count('JOIN tracking_tags') for statement in statements] == [0, 1]
+        assert items[1].click_tag_converted == 'https://ad.example.com/click2'
+        assert len(statements) == 2
+
+        # Queries that do not ask for tags never join them
+        assert TrackingData.query.filter_by(file_id=uploaded_rows).count() == 2
+        assert 'tracking_tags' not in statements[-1]
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+def test_conditional_get_skips_tracking_rows(app, client, uploaded_rows):
+    """Matching If-None-Match requests get 304 without reading tracking_data."""
+    from models import db
+    url = f'/api/tracking-data?file_id={uploaded_rows}&fields=placement_name'
+    response = client.get(url)
+    etag = response.headers['ETag']
+    assert 'Accept-Encoding' in response.vary
+    assert response.headers['Cache-Control'] == 'private, max-age=300'
+    assert client.get(f'{url}&limit=1').headers['ETag'] != etag
+
+    client.get('/tracking-data')
+    page = client.get('/tracking-data')
+    assert page.status_code == 200 and page.headers['Cache-Control'] == 'private, no-cache'
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304 and response.data == b''
+        assert 'Accept-Encoding' in response.vary
+        assert client.get('/tracking-data', headers={'If-None-Match': page.headers['ETag']}).status_code == 304
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert statements and not any('FROM tracking_data' in statement for statement in statements)
+
+def test_api_serves_payload_written_at_ingest(app, client, uploaded_rows):
+    """The unpaginated document is written at ingest, sent gzip-encoded when accepted and removed on delete."""
+    uploaded_file = UploadedFile.query.one()
+    path = payload_path(uploaded_file.file_path)
+    assert os.path.exists(path)
+
+    url = f'/api/tracking-data?file_id={uploaded_rows}&paginate=false'
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    plain = client.get(url)
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+    assert json.loads(gzip.decompress(compressed.data)) == plain.json
+    assert [row['click_tag'] for row in plain.json['data']] == [
+        'https://ad.example.com/click?ord={timestamp}', 'https://ad.example.com/click2'
+    ]
+
+    assert TrackingService.delete_file(uploaded_rows)[0]
+    assert not os.path.exists(path)
+
+def test_tracking_tables_fragment_cache(app, client, uploaded_rows, monkeypatch):
+    """Repeat views reuse the rendered tables until the upload is deleted, and the LRU stays bounded."""
+    from services.fragment_cache import FragmentCache, fragment_cache
+    fragment_cache.clear()
+    first = client.get(f'/tracking-data?file_id={uploaded_rows}')
+    monkeypatch.setattr(TrackingService, 'get_tracking_rows', lambda *args: pytest.fail('rows were read'))
+    second = client.get(f'/tracking-data?file_id={uploaded_rows}')
+    assert first.status_code == second.status_code == 200
+    assert b'https://ad.example.com/click2' in second.data and b'admin' in second.data
+    assert client.get('/api/admin/fragment-cache').json['hits'] == 1
+
+    assert TrackingService.delete_file(uploaded_rows)[0]
+    assert fragment_cache.stats()['entries'] == 0
+
+    cache = FragmentCache(maxbytes=10)
+    cache.put(1, 'v1', 'a' * 6)
+    cache.put(2, 'v1', 'b' * 6)
+    assert cache.get(1, 'v1') is None and cache.get(2, 'v1') == 'b' * 6
+    assert cache.stats()['evictions'] == 1 and cache.stats()['bytes'] == 6
+
+def test_empty_tracking_tables_are_not_cached(app, client, uploaded_rows, monkeypatch):
+    """An upload read without rows is rendered but not cached."""
+    from services.fragment_cache import fragment_cache
+    fragment_cache.clear()
+    monkeypatch.setattr(TrackingService, 'get_tracking_rows', lambda *args: [])
+    response = client.get(f'/tracking-data?file_id={uploaded_rows}')
+    assert b'No tracking data found' in response.data
+    assert fragment_cache.stats()['entries'] == 0
+
+def test_failed_job_and_empty_rebuild_leave_no_payload(app, client, uploaded_rows, queued_job):
+    """Failed jobs remove all upload files, and a rebuild without rows writes no payload."""
+    from models import db
+    from services.payload import ensure_payload
+    job = queued_job(status='running', lease_owner='worker')
+    for path in (snapshot_path(job.file_path), payload_path(job.file_path)):
+        open(path, 'wb').close()
+    assert JobService._fail(job, 'failed', 'worker')
+    assert job.status == 'failed'
+    assert not any(os.path.exists(path) for path in (job.file_path, payload_path(job.file_path)))
+
+    uploaded_file = db.session.get(UploadedFile, uploaded_rows)
+    os.remove(payload_path(uploaded_file.file_path))
+    TrackingData.query.delete()
+    db.session.commit()
+    assert ensure_payload(uploaded_file) is None
+    assert not os.path.exists(payload_path(uploaded_file.file_path))
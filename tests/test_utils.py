@@ -0,0 +1,112 @@
+import io
+import json
+import os
+import hashlib
+import pytest
+from werkzeug.datastructures import FileStorage
+from utils import UrlNormalizer, MacroRewriter, clean_url, replace_placeholders, save_uploaded_file
+
+def test_clean_url_extracts_href_before_src():
+    """href wins over src even when the src attribute comes first."""
+    tag = '<a data-src="https://cdn.example.com/img.png" href="https://ad.example.com/click">x</a>'
+    assert clean_url(tag) == 'https://ad.example.com/click'
+
+def test_clean_url_extracts_script_src():
+    """Script tags are reduced to their src URL with GDPR macros removed."""
+    tag = '<SCRIPT SRC="https://vendor.example.com/t.js?g=${GDPR}&c=${GDPR_CONSENT_755}"></SCRIPT>'
+    assert clean_url(tag) == 'https://vendor.example.com/t.js?g=&c='
+
+def test_clean_url_leaves_plain_urls():
+    """Plain URLs are only stripped."""
+    assert clean_url('  https://ad.example.com/click?id=1  ') == 'https://ad.example.com/click?id=1'
+
+def test_normalizer_memoizes_repeated_tags():
+    """Repeated raw tags are served from the memo."""
+    normalizer = UrlNormalizer(maxsize=8)
+    tag = '<img src="https://ad.example.com/pixel.gif">'
+    assert normalizer.normalize(tag) == 'https://ad.example.com/pixel.gif'
+    assert normalizer.normalize(tag) == 'https://ad.example.com/pixel.gif'
+
+    stats = normalizer.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 1, 1)
+    assert stats['hit_rate'] == pytest.approx(0.5)
+
+def test_normalizer_evicts_least_recently_used():
+    """The memo never grows beyond its maximum size."""
+    normalizer = UrlNormalizer(maxsize=2)
+    normalizer.normalize('https://a.example.com')
+    normalizer.normalize('https://b.example.com')
+    normalizer.normalize('https://a.example.com')
+    normalizer.normalize('https://c.example.com')
+    assert normalizer.stats()['size'] == 2
+
+    normalizer.normalize('https://a.example.com')
+    assert normalizer.hits == 2
+    normalizer.normalize('https://b.example.com')
+    assert normalizer.misses == 4
+
+    normalizer.clear()
+    assert normalizer.stats()['size'] == 0
+    assert normalizer.hits == normalizer.misses == 0
+
+def test_replace_placeholders_rewrites_all_macros():
+    """All built-in macros are rewritten in one pass."""
+    url = 'https://ad.example.com/i?ord=[timestamp]&r=[random]&cb=${CACHEBUSTER}&t=%TIMESTAMP%'
+    assert replace_placeholders(url) == 'https://ad.example.com/i?ord={timestamp}&r={random}&cb={cachebuster}&t={timestamp}'
+
+def test_longest_macro_wins():
+    """%%CACHEBUSTER%% is rewritten as a whole rather than around %CACHEBUSTER%."""
+    assert replace_placeholders('cb=%%CACHEBUSTER%%;x=%CACHEBUSTER%') == 'cb={cachebuster};x={cachebuster}'
+
+def test_macro_rules_file_hot_reload(tmp_path):
+    """Rules from the file extend the built-ins and are reloaded when it changes."""
+    rules_path = tmp_path / 'macro_rules.json'
+    rules_path.write_text(json.dumps({'[CB]': '{cachebuster}'}))
+
+    rewriter = MacroRewriter()
+    rewriter.configure(str(rules_path))
+    assert rewriter.rewrite('a=[CB]&b=[random]') == 'a={cachebuster}&b={random}'
+    assert not rewriter.reload_if_changed()
+
+    rules_path.write_text(json.dumps({'[CB]': '{cb}', '__ORD__': '{timestamp}'}))
+    mtime = os.path.getmtime(rules_path) + 10
+    os.utime(rules_path, (mtime, mtime))
+    assert rewriter.reload_if_changed()
+    assert rewriter.rewrite('a=[CB]&o=__ORD__') == 'a={cb}&o={timestamp}'
+
+def test_invalid_macro_rules_file_keeps_rules(tmp_path):
+    """A broken rules file leaves the active rules in place."""
+    rules_path = tmp_path / 'macro_rules.json'
+    rules_path.write_text('{not json')
+
+    rewriter = MacroRewriter()
+    rewriter.configure(str(rules_path))
+    assert rewriter.rewrite('[timestamp]') == '{timestamp}'
+
+def test_macro_rules_skip_empty_macros(tmp_path):
+    """Empty and whitespace-only macros in the rules file are ignored."""
+    rules_path = tmp_path / 'macros.json'
+    rules_path.write_text(json.dumps({'': 'X', '  ': 'Y', '[cb]': '{cachebuster}'}))
+
+    rewriter = MacroRewriter()
+    rewriter.configure(str(rules_path))
+    assert '' not in rewriter.rules and '  ' not in rewriter.rules
+    assert rewriter.rewrite('https://ad.example.com/c?r=[cb]') == 'https://ad.example.com/c?r={cachebuster}'
+
+def test_save_uploaded_file_hashes_and_keeps_names_unique(tmp_path):
+    """Uploads are hashed while saved and never overwrite each other."""
+    content = b'workbook bytes' * 10000
+    saved = [
+        save_uploaded_file(FileStorage(io.BytesIO(content), 'campaign.xlsx'), str(tmp_path), {'xlsx'})
+        for _ in range(2)
+    ]
+
+    assert saved[0][0] != saved[1][0]
+    for filepath, filename, checksum in saved:
+        assert filename.endswith('_campaign.xlsx')
+        assert checksum == hashlib.sha256(content).hexdigest()
+        with open(filepath, 'rb') as f:
+            assert f.read() == content
+
+    invalid = FileStorage(io.BytesIO(content), 'campaign.txt')
+    assert save_uploaded_file(invalid, str(tmp_path), {'xlsx'}) == (None, None, 'Invalid file type')
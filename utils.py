@@ -3,16 +3,24 @@ Utility functions for the Tracking Tool application.
 This module contains helper functions for file handling, Excel processing, and data manipulation.
 """
 import os
+import json
+import hashlib
+import numpy as np
 import pandas as pd
 import secrets
 import logging
 import re
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from werkzeug.utils import secure_filename
 
 # Configure logger for this module
 logger = logging.getLogger(__name__)
 
+# Bytes read from an upload stream at a time while saving and hashing it
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
 def allowed_file(filename, allowed_extensions):
     """
     Check if a file has an allowed extension.
@@ -28,7 +36,12 @@ def allowed_file(filename, allowed_extensions):
 
 def save_uploaded_file(file, upload_folder, allowed_extensions):
     """
-    Save an uploaded file with a secure filename.
+    Save an uploaded file with a unique secure filename, hashing it on the way.
+    
+    The upload is streamed to disk in chunks while its SHA-256 digest is
+    computed, so identical workbooks can be recognized without reading the
+    file a second time. A random token in the filename keeps uploads landing
+    in the same second from overwriting each other.
     
     Args:
         file (FileStorage): The uploaded file object
@@ -36,105 +49,302 @@ def save_uploaded_file(file, upload_folder, allowed_extensions):
         allowed_extensions (set): Set of allowed file extensions
         
     Returns:
-        tuple: (filepath, filename) if successful, (None, error_message) if failed
+        tuple: (filepath, filename, checksum) if successful, (None, None, error_message) if failed
     """
     if not file or not allowed_file(file.filename, allowed_extensions):
-        return None, "Invalid file type"
+        return None, None, "Invalid file type"
     
     filename = secure_filename(file.filename)
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    new_filename = f"{timestamp}_{filename}"
-    filepath = os.path.join(upload_folder, new_filename)
+    filepath = None
     
     try:
-        file.save(filepath)
+        while True:
+            new_filename = f"{timestamp}_{secrets.token_hex(4)}_{filename}"
+            filepath = os.path.join(upload_folder, new_filename)
+            try:
+                output = open(filepath, 'xb')
+                break
+            except FileExistsError:
+                continue
+        
+        digest = hashlib.sha256()
+        with output:
+            for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                output.write(chunk)
+        
         logger.info(f"File saved successfully: {filepath}")
-        return filepath, new_filename
+        return filepath, new_filename, digest.hexdigest()
     except Exception as e:
         logger.error(f"Error saving file {filename}: {str(e)}")
-        return None, str(e)
+        if filepath and os.path.exists(filepath):
+            os.remove(filepath)
+        return None, None, str(e)
+
+# Columns that must be present in every uploaded tracking sheet
+REQUIRED_COLUMNS = ['Placement Name', 'Ad Name', 'Creative Name', 'Click Tag']
+
+# Extensions that can be streamed through openpyxl's read-only mode
+STREAMABLE_EXCEL_EXTENSIONS = {'xlsx', 'xlsm'}
+
+# Number of non-empty rows searched for the header row by default
+DEFAULT_HEADER_SCAN_ROWS = 100
+
+def _convert_cell(cell):
+    """
+    Convert an openpyxl cell to the value pandas would produce for it.
+    
+    Mirrors pandas' openpyxl reader so that frames built from streamed rows
+    are identical to those returned by ``pd.read_excel``.
+    
+    Args:
+        cell: openpyxl cell (read-only or regular)
+        
+    Returns:
+        object: Converted cell value ('' for empty cells)
+    """
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+    
+    if cell.value is None:
+        return ""
+    elif cell.data_type == TYPE_ERROR:
+        return float('nan')
+    elif cell.data_type == TYPE_NUMERIC:
+        val = int(cell.value)
+        if val == cell.value:
+            return val
+        return float(cell.value)
+    
+    return cell.value
+
+def iter_excel_rows(filepath):
+    """
+    Stream the rows of the first worksheet of an .xlsx workbook.
+    
+    The workbook is opened in openpyxl read-only mode so rows are parsed
+    lazily from the sheet XML instead of being materialized up front.
+    
+    Args:
+        filepath (str): Path to the Excel file
+        
+    Yields:
+        list: Converted cell values of each row, with trailing empty cells trimmed
+    """
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(filepath, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        for row in sheet.rows:
+            values = [_convert_cell(cell) for cell in row]
+            while values and values[-1] == "":
+                values.pop()
+            yield values
+    finally:
+        workbook.close()
+
+def _row_is_empty(values):
+    """Return True if a streamed row has no usable cell values."""
+    return all(val == "" or (isinstance(val, float) and val != val) for val in values)
 
-def validate_excel_file(filepath):
+def find_header_row(rows, required_columns):
+    """
+    Find the header row within a window of rows using vectorized matching.
+    
+    Each row of the window is viewed as a single NUL-separated string, so the
+    relaxed (substring) pass is one broadcast search over rows x required
+    columns instead of nested loops over every cell. Exact matches are a subset
+    of relaxed ones, so the exact (case-insensitive) pass is evaluated in the
+    same step, restricted to the candidate rows. An exact match anywhere in the
+    window wins over an earlier relaxed match.
+    
+    Args:
+        rows (list): Window of rows, each a list of cell values
+        required_columns (list): Header names that must all be present
+        
+    Returns:
+        tuple: (position, exact) where position is the index of the header row
+               within rows (None if not found) and exact tells which pass matched
+    """
+    if not rows:
+        return None, False
+    
+    cells = pd.DataFrame(rows, dtype=object).to_numpy()
+    cells[pd.isna(cells)] = ""
+    cells = cells.astype(str)
+    nrows, ncols = cells.shape
+    
+    # One spare character per cell guarantees a NUL between adjacent cells,
+    # so a match can never span two cells of the joined row
+    width = cells.dtype.itemsize // np.dtype('U1').itemsize + 1
+    lines = np.ascontiguousarray(cells.astype(f'U{width}')).view(f'U{width * ncols}').reshape(nrows)
+    lines = np.char.lower(lines)
+    
+    required = np.array([col.lower() for col in required_columns])
+    relaxed = (np.char.find(lines[np.newaxis, :], required[:, np.newaxis]) >= 0).all(axis=0)
+    candidates = np.flatnonzero(relaxed)
+    if not candidates.size:
+        return None, False
+    
+    # Shape (required, candidates, columns)
+    candidate_cells = np.char.lower(np.char.strip(cells[candidates]))
+    exact = (candidate_cells[np.newaxis, :, :] == required[:, np.newaxis, np.newaxis]).any(axis=2).all(axis=0)
+    
+    if exact.any():
+        return int(candidates[exact.argmax()]), True
+    return int(candidates[0]), False
+
+def _frame_from_rows(data, header_row):
+    """
+    Build a DataFrame from streamed rows exactly as ``pd.read_excel`` would.
+    
+    Args:
+        data (list): All rows of the sheet as returned by iter_excel_rows
+        header_row (int): Index of the header row within data
+        
+    Returns:
+        pandas.DataFrame: Parsed data with the header row as column names
+    """
+    from pandas.io.parsers import TextParser
+    
+    # Pad rows to a common width, like pandas does for ragged sheets
+    max_width = max(len(row) for row in data)
+    data = [row + [""] * (max_width - len(row)) for row in data]
+    
+    parser = TextParser(data, header=header_row, skip_blank_lines=False)
+    return parser.read()
+
+def _read_excel_streaming(filepath, required_columns, header_scan_rows):
+    """
+    Locate the header row and collect data rows in a single pass over the workbook.
+    
+    The first header_scan_rows non-empty rows form the search window; once it
+    is full the header row is located with find_header_row and the remaining
+    rows are collected without further checks. If the window holds no header
+    the rest of the workbook is not read.
+    
+    Args:
+        filepath (str): Path to an .xlsx file
+        required_columns (list): Header names that identify the header row
+        header_scan_rows (int): Number of non-empty rows searched for the header
+        
+    Returns:
+        tuple: (header_row, DataFrame) where header_row is None if no header
+               row was found and the DataFrame is None if the sheet is empty
+    """
+    data = []
+    window = []
+    window_positions = []
+    header_row = None
+    last_row_with_data = -1
+    
+    def search_window():
+        position, exact = find_header_row(window, required_columns)
+        if position is None:
+            return None
+        row = window_positions[position]
+        if exact:
+            logger.info(f"Found header row at index {row}")
+        else:
+            logger.info(f"Found header row with partial match at index {row}")
+        return row
+    
+    for idx, values in enumerate(iter_excel_rows(filepath)):
+        data.append(values)
+        if not values:
+            continue
+        last_row_with_data = idx
+        if header_row is not None or _row_is_empty(values):
+            continue
+        window.append(values)
+        window_positions.append(idx)
+        if len(window) >= header_scan_rows:
+            header_row = search_window()
+            if header_row is None:
+                break
+    else:
+        if window and header_row is None:
+            header_row = search_window()
+    
+    if not window:
+        return None, None
+    
+    if header_row is None:
+        return None, pd.DataFrame()
+    
+    # Trim trailing empty rows, matching pandas' sheet reader
+    data = data[:last_row_with_data + 1]
+    return header_row, _frame_from_rows(data, header_row)
+
+def _read_excel_legacy(filepath, required_columns, header_scan_rows):
+    """
+    Locate the header row and load data using pandas for non-streamable formats.
+    
+    Args:
+        filepath (str): Path to the Excel file
+        required_columns (list): Header names that identify the header row
+        header_scan_rows (int): Number of non-empty rows searched for the header
+        
+    Returns:
+        tuple: (header_row, DataFrame) with the same semantics as _read_excel_streaming
+    """
+    df_no_header = pd.read_excel(filepath, header=None)
+    
+    # Remove completely empty rows
+    df_no_header = df_no_header.dropna(how='all')
+    
+    if df_no_header.empty:
+        return None, None
+    
+    logger.debug(f"Excel file shape after removing empty rows: {df_no_header.shape}")
+    
+    window = df_no_header.head(header_scan_rows)
+    position, exact = find_header_row(window.values.tolist(), required_columns)
+    if position is None:
+        return None, pd.DataFrame()
+    
+    header_row = window.index[position]
+    logger.info(f"Found header row at index {header_row} (exact={exact})")
+    logger.info(f"Reading Excel with header at row {header_row}")
+    return header_row, pd.read_excel(filepath, header=header_row)
+
+def validate_excel_file(filepath, header_scan_rows=DEFAULT_HEADER_SCAN_ROWS):
     """
     Validate that the Excel file has the required columns.
     
+    .xlsx workbooks are streamed once with openpyxl in read-only mode; the
+    header row is located while the rows are read, so the file is never
+    parsed twice. Legacy .xls files fall back to pandas.
+    
     Args:
         filepath (str): Path to the Excel file
+        header_scan_rows (int): Number of non-empty rows searched for the header row
         
     Returns:
         tuple: (is_valid, result) where:
                - If valid: (True, pandas.DataFrame)
                - If invalid: (False, error_message)
     """
-    required_columns = ['Placement Name', 'Ad Name', 'Creative Name', 'Click Tag']
+    required_columns = REQUIRED_COLUMNS
     
     try:
-        # Try to read without header first to find header row
         logger.info(f"Reading Excel file: {filepath}")
-        df_no_header = pd.read_excel(filepath, header=None)
-        
-        # Remove completely empty rows
-        df_no_header = df_no_header.dropna(how='all')
+        extension = filepath.rsplit('.', 1)[-1].lower()
+        if extension in STREAMABLE_EXCEL_EXTENSIONS:
+            header_row, df = _read_excel_streaming(filepath, required_columns, header_scan_rows)
+        else:
+            header_row, df = _read_excel_legacy(filepath, required_columns, header_scan_rows)
         
-        if df_no_header.empty:
+        if df is None:
             logger.warning("File is empty after removing empty rows")
             return False, "File is empty"
-            
-        logger.debug(f"Excel file shape after removing empty rows: {df_no_header.shape}")
-        
-        # Find the row containing the required headers
-        header_row = None
-        for idx, row in df_no_header.iterrows():
-            # Convert row values to strings for comparison
-            row_values = [str(val).strip() if pd.notnull(val) else "" for val in row]
-            logger.debug(f"Checking row {idx} for headers")
-            
-            # Check if all required columns are in this row
-            matches = []
-            for col in required_columns:
-                found = False
-                for val in row_values:
-                    if val and col.lower() == val.lower():
-                        found = True
-                        break
-                matches.append(found)
-            
-            if all(matches):
-                header_row = idx
-                logger.info(f"Found header row at index {header_row}")
-                break
-        
-        if header_row is None:
-            # Try a more relaxed search that checks for substring matches
-            logger.info("Exact match failed, trying partial match...")
-            
-            for idx, row in df_no_header.iterrows():
-                # Convert row values to strings for comparison
-                row_values = [str(val).strip() if pd.notnull(val) else "" for val in row]
-                
-                # Check if all required columns are substrings of any value in this row
-                matches = []
-                for col in required_columns:
-                    found = False
-                    for val in row_values:
-                        if val and col.lower() in val.lower():
-                            found = True
-                            break
-                    matches.append(found)
-                
-                if all(matches):
-                    header_row = idx
-                    logger.info(f"Found header row with partial match at index {header_row}")
-                    break
         
         if header_row is None:
             logger.warning(f"Required columns not found: {', '.join(required_columns)}")
             return False, f"Required columns not found: {', '.join(required_columns)}"
         
-        # Re-read the file with the correct header row
-        logger.info(f"Reading Excel with header at row {header_row}")
-        df = pd.read_excel(filepath, header=header_row)
-        
         # Display the actual column names found
         logger.debug(f"Columns found in Excel: {list(df.columns)}")
         
@@ -159,37 +369,103 @@ def validate_excel_file(filepath):
         logger.exception(f"Error validating Excel file: {str(e)}")
         return False, f"Error validating Excel file: {str(e)}"
 
-def process_excel_file(df, uploaded_file_id):
+# Patterns used to extract URLs from HTML tracking tags
+HREF_PATTERN = re.compile(r'href=["\']([^"\']+)["\']', re.IGNORECASE)
+SRC_PATTERN = re.compile(r'src=["\']([^"\']+)["\']', re.IGNORECASE)
+GDPR_CONSENT_PATTERN = re.compile(r'\$\{GDPR_CONSENT_\d+\}')
+
+# Opening <a>, <img> or <script> tag
+HTML_TAG_PATTERN = re.compile(r'<(?:a|img|script) ', re.IGNORECASE | re.ASCII)
+
+# href and src attributes in one scan; the lookahead reports overlapping
+# candidates so the first href and first src are found exactly as two
+# separate searches would find them
+URL_ATTRIBUTE_PATTERN = re.compile(r'(?=(href|src)=["\']([^"\']+)["\'])', re.IGNORECASE)
+
+# Number of distinct raw tags remembered by the URL normalizer
+URL_CACHE_SIZE = 4096
+
+# Built-in placeholder replacements for ad tracking; a rules file can add
+# or override entries (see MacroRewriter)
+PLACEHOLDER_REPLACEMENTS = {
+    "[timestamp]": "{timestamp}",
+    "[random]": "{random}",
+    "[CACHEBUSTER]": "{cachebuster}",
+    "%CACHEBUSTER%": "{cachebuster}",
+    "[cachebuster]": "{cachebuster}",
+    "%%CACHEBUSTER%%": "{cachebuster}",
+    "${CACHEBUSTER}": "{cachebuster}",
+    "${timestamp}": "{timestamp}",
+    "${TIMESTAMP}": "{timestamp}",
+    "%timestamp%": "{timestamp}",
+    "%TIMESTAMP%": "{timestamp}",
+    "[TIMESTAMP]": "{timestamp}",
+}
+
+# Column name variations to handle different file formats
+TRACKING_COLUMN_ALIASES = {
+    'placement': ['placement name', 'placement'],
+    'ad': ['ad name', 'ad'],
+    'creative': ['creative name', 'creative'],
+    'click': ['click tag', 'click url', 'click tracking url'],
+    'imp': ['impression tag', 'impression tag (image)', 'impression url', 'imp tag', 'imp url', 'image tag'],
+    'third_party': ['3rd party tracking', 'third-party vendor tracking tag', 'third party tracking', 'third-party tracking'],
+}
+
+# Keys of the records produced by process_excel_file, in insertion order
+TRACKING_RECORD_KEYS = [
+    'file_id', 'placement_name', 'ad_name', 'creative_name',
+    'click_tag', 'click_tag_converted', 'imp_tag', 'imp_tag_converted',
+    'third_party_tracking', 'third_party_converted',
+]
+
+def _resolve_tracking_columns(df):
+    """
+    Map each tracking field to the actual DataFrame column holding it.
+    
+    Args:
+        df (pandas.DataFrame): DataFrame containing the Excel data
+        
+    Returns:
+        dict: Field name to column name (None if the sheet has no such column)
+    """
+    # Normalize column names for consistent access
+    norm_columns = {col.strip().lower(): col for col in df.columns}
+    
+    # Find the actual column names from normalized options
+    return {
+        field: next((norm_columns[col] for col in aliases if col in norm_columns), None)
+        for field, aliases in TRACKING_COLUMN_ALIASES.items()
+    }
+
+def process_excel_file(df, uploaded_file_id, columnar=False):
     """
     Process Excel data and prepare tracking data for database insertion.
     
     Args:
         df (pandas.DataFrame): DataFrame containing the Excel data
         uploaded_file_id (int): ID of the uploaded file record
+        columnar (bool): Use the vectorized column-at-a-time engine instead
+            of iterating rows; both produce identical records
         
     Returns:
         list: List of dictionaries containing processed tracking data
     """
-    tracking_data = []
+    # Pick up edits to the macro rules file without restarting workers
+    macro_rewriter.reload_if_changed()
     
-    # Normalize column names for consistent access
-    norm_columns = {col.strip().lower(): col for col in df.columns}
+    columns = _resolve_tracking_columns(df)
+    if columnar:
+        return _process_excel_columnar(df, uploaded_file_id, columns)
     
-    # Column name variations to handle different file formats
-    placement_cols = ['placement name', 'placement']
-    ad_cols = ['ad name', 'ad']
-    creative_cols = ['creative name', 'creative']
-    click_cols = ['click tag', 'click url', 'click tracking url']
-    imp_cols = ['impression tag', 'impression tag (image)', 'impression url', 'imp tag', 'imp url', 'image tag']
-    third_party_cols = ['3rd party tracking', 'third-party vendor tracking tag', 'third party tracking', 'third-party tracking']
+    tracking_data = []
     
-    # Find the actual column names from normalized options
-    placement_col = next((norm_columns[col] for col in placement_cols if col in norm_columns), None)
-    ad_col = next((norm_columns[col] for col in ad_cols if col in norm_columns), None)
-    creative_col = next((norm_columns[col] for col in creative_cols if col in norm_columns), None)
-    click_col = next((norm_columns[col] for col in click_cols if col in norm_columns), None)
-    imp_col = next((norm_columns[col] for col in imp_cols if col in norm_columns), None)
-    third_party_col = next((norm_columns[col] for col in third_party_cols if col in norm_columns), None)
+    placement_col = columns['placement']
+    ad_col = columns['ad']
+    creative_col = columns['creative']
+    click_col = columns['click']
+    imp_col = columns['imp']
+    third_party_col = columns['third_party']
     
     # Process each row in the dataframe
     for _, row in df.iterrows():
@@ -236,8 +512,233 @@ def process_excel_file(df, uploaded_file_id):
         logger.debug(f"Processed row: {placement_name} - {ad_name}")
     
     logger.info(f"Processed {len(tracking_data)} rows of tracking data")
+    logger.debug(f"URL normalizer stats: {url_normalizer.stats()}")
     return tracking_data
 
+def _column_values(df, values, col):
+    """
+    Return the values of a column from the row-interleaved array of a DataFrame.
+    
+    Args:
+        df (pandas.DataFrame): Source DataFrame
+        values (numpy.ndarray): df.values, i.e. the values iterrows yields
+        col (str): Column name
+        
+    Returns:
+        pandas.Series: Column values with the dtype seen by row iteration
+    """
+    loc = df.columns.get_loc(col)
+    if not isinstance(loc, int):
+        raise ValueError(f"Column '{col}' appears more than once")
+    return pd.Series(values[:, loc], dtype=object)
+
+def _column_text(column, keep):
+    """
+    Convert the kept values of a column to stripped strings ('' for missing values).
+    
+    Args:
+        column (pandas.Series): Column values, or None if the column is absent
+        keep (numpy.ndarray): Boolean mask of rows to keep
+        
+    Returns:
+        pandas.Series: Object Series of strings for the kept rows
+    """
+    if column is None:
+        return pd.Series([""] * int(keep.sum()), dtype=object)
+    
+    column = column[keep].reset_index(drop=True)
+    present = column.notna()
+    text = pd.Series("", index=column.index, dtype=object)
+    text[present] = column[present].astype(str).str.strip()
+    return text
+
+def _convert_tag_column(tags):
+    """
+    Clean a column of tracking tags and standardize their placeholders.
+    
+    Vectorized equivalent of applying clean_url and replace_placeholders to
+    every non-empty tag. Agency sheets repeat the same tags across many
+    placements, so the string operations run over the distinct tags only.
+    
+    Args:
+        tags (pandas.Series): Stripped tag strings
+        
+    Returns:
+        pandas.Series: Converted tag strings
+    """
+    codes, uniques = pd.factorize(tags)
+    urls = pd.Series(uniques, dtype=object).str.strip()
+    
+    # Extract URL from HTML tags if present
+    is_html = urls.str.contains(HTML_TAG_PATTERN)
+    href = urls.str.extract(HREF_PATTERN, expand=False)
+    src = urls.str.extract(SRC_PATTERN, expand=False)
+    extracted = href.fillna(src)
+    urls = urls.mask(is_html & extracted.notna(), extracted)
+    
+    # Remove GDPR-related parameters
+    urls = urls.str.replace('${GDPR}', '', regex=False)
+    urls = urls.str.replace(GDPR_CONSENT_PATTERN, '', regex=True)
+    
+    urls = macro_rewriter.rewrite_series(urls)
+    
+    return pd.Series(urls.to_numpy()[codes], dtype=object)
+
+def _process_excel_columnar(df, uploaded_file_id, columns):
+    """
+    Column-at-a-time implementation of process_excel_file.
+    
+    Rows missing required fields are dropped with a vectorized mask, the three
+    tag columns are converted with pandas string operations and the records
+    are assembled in bulk.
+    
+    Args:
+        df (pandas.DataFrame): DataFrame containing the Excel data
+        uploaded_file_id (int): ID of the uploaded file record
+        columns (dict): Field name to column name, from _resolve_tracking_columns
+        
+    Returns:
+        list: List of dictionaries containing processed tracking data
+    """
+    # Use the same interleaved values iterrows would yield
+    values = df.values
+    fields = {
+        field: _column_values(df, values, col) if col is not None else None
+        for field, col in columns.items()
+    }
+    
+    # Skip rows with missing essential data
+    placement, ad, click = fields['placement'], fields['ad'], fields['click']
+    if placement is None or ad is None or click is None:
+        raise KeyError("Required tracking columns are missing")
+    skipped = (placement.isna() | ad.isna() | click.isna()).to_numpy()
+    for value in placement[skipped]:
+        logger.warning(f"Skipping row with missing data: {value if not pd.isna(value) else 'N/A'}")
+    keep = ~skipped
+    
+    text = {field: _column_text(column, keep) for field, column in fields.items()}
+    converted = {field: _convert_tag_column(text[field]) for field in ('click', 'imp', 'third_party')}
+    
+    record_columns = [
+        text['placement'], text['ad'], text['creative'],
+        text['click'], converted['click'],
+        text['imp'], converted['imp'],
+        text['third_party'], converted['third_party'],
+    ]
+    record_columns = [column.tolist() for column in record_columns]
+    tracking_data = [
+        dict(zip(TRACKING_RECORD_KEYS, (uploaded_file_id,) + row))
+        for row in zip(*record_columns)
+    ]
+    
+    logger.info(f"Processed {len(tracking_data)} rows of tracking data")
+    return tracking_data
+
+class UrlNormalizer:
+    """
+    Memoizing normalizer for tracking tag URLs.
+    
+    Agency sheets repeat the same click and impression tags across hundreds
+    of placements, so normalized URLs are kept in a bounded LRU memo keyed on
+    the raw tag string. Repeated tags are converted with a single dict lookup.
+    
+    Attributes:
+        maxsize (int): Maximum number of memoized tags
+        hits (int): Number of conversions served from the memo
+        misses (int): Number of conversions that had to be computed
+    """
+    
+    def __init__(self, maxsize=URL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def normalize(self, tag):
+        """
+        Return the cleaned URL for a raw tag, using the memo when possible.
+        
+        Args:
+            tag (str): Raw tag or URL
+            
+        Returns:
+            str: Cleaned URL
+        """
+        with self._lock:
+            url = self._cache.get(tag)
+            if url is not None:
+                self._cache.move_to_end(tag)
+                self.hits += 1
+                return url
+        
+        url = self._normalize(tag)
+        
+        with self._lock:
+            self.misses += 1
+            self._cache[tag] = url
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return url
+    
+    @staticmethod
+    def _normalize(url):
+        """
+        Clean a URL without consulting the memo.
+        
+        Args:
+            url (str): The URL to clean
+            
+        Returns:
+            str: Cleaned URL
+        """
+        url = url.strip()
+        
+        # Extract URL from HTML tags if present, preferring href over src
+        if HTML_TAG_PATTERN.search(url):
+            src = None
+            for match in URL_ATTRIBUTE_PATTERN.finditer(url):
+                if match.group(1).lower() == 'href':
+                    src = match.group(2)
+                    break
+                if src is None:
+                    src = match.group(2)
+            if src is not None:
+                url = src
+        
+        # Remove GDPR-related parameters
+        url = url.replace('${GDPR}', '')
+        url = GDPR_CONSENT_PATTERN.sub('', url)
+        
+        return url
+    
+    def stats(self):
+        """
+        Get memo statistics.
+        
+        Returns:
+            dict: Hits, misses, hit rate and current/maximum size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._cache),
+                'maxsize': self.maxsize,
+            }
+    
+    def clear(self):
+        """Empty the memo and reset its counters."""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+# Module-level normalizer shared by all conversions in this process
+url_normalizer = UrlNormalizer()
+
 def clean_url(url):
     """
     Clean a URL by removing extra whitespace and handling encoding issues.
@@ -248,25 +749,133 @@ def clean_url(url):
     Returns:
         str: Cleaned URL
     """
-    url = url.strip()
+    return url_normalizer.normalize(url)
+
+class MacroRewriter:
+    """
+    Single-pass rewriter for ad-server macros in tracking URLs.
     
-    # Extract URL from HTML tags if present
-    if '<a ' in url.lower() or '<img ' in url.lower() or '<script ' in url.lower():
-        # Extract from href attribute
-        href_match = re.search(r'href=["\']([^"\']+)["\']', url, re.IGNORECASE)
-        if href_match:
-            url = href_match.group(1)
-        else:
-            # Extract from src attribute
-            src_match = re.search(r'src=["\']([^"\']+)["\']', url, re.IGNORECASE)
-            if src_match:
-                url = src_match.group(1)
+    All rules are compiled into one alternation regex, longest macro first,
+    so every macro in a URL is rewritten in a single scan and a macro never
+    has a shorter one (e.g. %CACHEBUSTER% inside %%CACHEBUSTER%%) replaced
+    out from under it. Rules can be extended from a JSON file mapping macros
+    to replacements; the file is re-read whenever its modification time
+    changes, so running workers pick up new rules without a restart.
     
-    # Remove GDPR-related parameters
-    url = url.replace('${GDPR}', '')
-    url = re.sub(r'\$\{GDPR_CONSENT_\d+\}', '', url)
+    Attributes:
+        path (str): Optional path of the JSON rules file
+    """
+    
+    def __init__(self, rules=None, path=None):
+        self.path = path
+        self._mtime = None
+        self._state = (None, {})
+        self.load(rules if rules is not None else PLACEHOLDER_REPLACEMENTS)
+    
+    @property
+    def rules(self):
+        """dict: Active macro to replacement mapping."""
+        return dict(self._state[1])
+    
+    def load(self, rules):
+        """
+        Compile a rule table and make it active.
+        
+        Empty or whitespace-only macros are skipped: an empty alternative
+        would match at every position of every URL.
+        
+        Args:
+            rules (dict): Macro to replacement mapping
+        """
+        rules = dict(rules)
+        for macro in [macro for macro in rules if not macro.strip()]:
+            logger.warning(f"Skipping macro rule with an empty macro: {macro!r}")
+            del rules[macro]
+        pattern = None
+        if rules:
+            alternatives = sorted(rules, key=len, reverse=True)
+            pattern = re.compile('|'.join(re.escape(macro) for macro in alternatives))
+        # Swap pattern and rules together so concurrent rewrites see a consistent table
+        self._state = (pattern, rules)
+    
+    def configure(self, path):
+        """
+        Set the rules file and load it.
+        
+        Args:
+            path (str): Path of the JSON rules file, or None for built-in rules only
+        """
+        self.path = path
+        self._mtime = None
+        if not path:
+            self.load(PLACEHOLDER_REPLACEMENTS)
+            return
+        self.reload_if_changed()
+    
+    def reload_if_changed(self):
+        """
+        Reload the rules file if it changed since it was last loaded.
+        
+        Rules from the file are merged over the built-in ones. If the file
+        cannot be read or parsed the previously active rules are kept.
+        
+        Returns:
+            bool: True if the rules were reloaded
+        """
+        if not self.path:
+            return False
+        
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return False
+            with open(self.path, encoding='utf-8') as rules_file:
+                file_rules = json.load(rules_file)
+            if not isinstance(file_rules, dict):
+                raise ValueError("rules file must contain a JSON object")
+        except Exception as e:
+            logger.error(f"Error loading macro rules from {self.path}: {str(e)}")
+            return False
+        
+        rules = dict(PLACEHOLDER_REPLACEMENTS)
+        rules.update({str(macro): str(replacement) for macro, replacement in file_rules.items()})
+        self.load(rules)
+        self._mtime = mtime
+        logger.info(f"Loaded {len(file_rules)} macro rules from {self.path}")
+        return True
+    
+    def rewrite(self, url):
+        """
+        Rewrite all macros in a URL.
+        
+        Args:
+            url (str): The URL containing macros
+            
+        Returns:
+            str: URL with standardized macros
+        """
+        pattern, rules = self._state
+        if pattern is None:
+            return url
+        return pattern.sub(lambda match: rules[match.group(0)], url)
     
-    return url
+    def rewrite_series(self, urls):
+        """
+        Rewrite all macros in every URL of a pandas Series.
+        
+        Args:
+            urls (pandas.Series): URLs containing macros
+            
+        Returns:
+            pandas.Series: URLs with standardized macros
+        """
+        pattern, rules = self._state
+        if pattern is None:
+            return urls
+        return urls.str.replace(pattern, lambda match: rules[match.group(0)], regex=True)
+
+# Module-level rewriter shared by all conversions in this process
+macro_rewriter = MacroRewriter()
 
 def replace_placeholders(url):
     """
@@ -278,23 +887,4 @@ def replace_placeholders(url):
     Returns:
         str: URL with standardized placeholders
     """
-    # Common placeholder replacements for ad tracking
-    replacements = {
-        "[timestamp]": "{timestamp}",
-        "[random]": "{random}",
-        "[CACHEBUSTER]": "{cachebuster}",
-        "%CACHEBUSTER%": "{cachebuster}",
-        "[cachebuster]": "{cachebuster}",
-        "%%CACHEBUSTER%%": "{cachebuster}",
-        "${CACHEBUSTER}": "{cachebuster}",
-        "${timestamp}": "{timestamp}",
-        "${TIMESTAMP}": "{timestamp}",
-        "%timestamp%": "{timestamp}",
-        "%TIMESTAMP%": "{timestamp}",
-        "[TIMESTAMP]": "{timestamp}",
-    }
-    
-    for old, new in replacements.items():
-        url = url.replace(old, new)
-    
-    return url 
\ No newline at end of file
+    return macro_rewriter.rewrite(url)